@@ -0,0 +1,136 @@
+"""Compare the size and speed of pickled and wire format cache entries.
+
+`addresses_us_per_entry` is the time to load an A or AAAA entry and get its
+addresses, as `socket.getaddrinfo` does on a cache hit.
+
+Run from the repository root with::
+
+    python -m benchmarks.serialization [--entries N]
+
+The results are written to stdout as JSON.
+"""
+import argparse
+import json
+import sys
+import time
+
+try:
+    # Python 3 backport to Python 2.7
+    from pickle4 import pickle as pickle
+except ImportError:  # pragma: no cover
+    import pickle
+
+from dns.message import from_wire, make_query
+from dns.rdatatype import A, AAAA, CNAME, NS
+from dns.resolver import Answer
+
+from dns_cache import wire
+from dns_cache.resolver import NXAnswer, _answer_addresses
+
+from tests.stub_server import StubServer
+
+
+def _pickle_dumps(value):
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+FORMATS = [
+    ("pickle", _pickle_dumps, pickle.loads),
+    ("wire", wire.dumps, wire.loads),
+]
+
+
+def create_answers(count):
+    """Return `count` answers of a typical mix of responses."""
+    server = StubServer()
+    server.add_zone("example.")
+    server.add("ns1.example.", 300, A, "192.0.2.53")
+    server.add("ns2.example.", 300, A, "192.0.2.54")
+
+    questions = []
+    for i in range(count):
+        name = "host{}.example.".format(i)
+        kind = i % 5
+        if kind == 0:
+            server.add(name, 300, A, "192.0.2.{}".format(i % 250))
+            questions.append((name, A))
+        elif kind == 1:
+            server.add(name, 300, A, *["198.51.100.{}".format(j) for j in range(4)])
+            questions.append((name, A))
+        elif kind == 2:
+            server.add(name, 300, AAAA, "2001:db8::{:x}".format(i))
+            questions.append((name, AAAA))
+        elif kind == 3:
+            server.add("www." + name, 300, CNAME, name)
+            server.add(name, 300, A, "192.0.2.{}".format(i % 250))
+            questions.append(("www." + name, A))
+        else:
+            server.add(name, 300, NS, "ns1.example.", "ns2.example.")
+            questions.append((name, NS))
+
+    answers = []
+    for i, (name, rdtype) in enumerate(questions):
+        query = make_query(name, rdtype)
+        if i % 10 == 9:
+            query = make_query("missing" + name, rdtype)
+        # Use a parsed response, as received from a nameserver
+        response = from_wire(server.respond(query).to_wire())
+        question = response.question[0]
+        if response.rcode():
+            answer = NXAnswer(
+                question.name, rdtype, question.rdclass, response,
+                raise_on_no_answer=False,
+            )
+        else:
+            answer = Answer(question.name, rdtype, question.rdclass, response)
+        answers.append(answer)
+
+    return answers
+
+
+def run(answers):
+    results = []
+    for name, dumps, loads in FORMATS:
+        start = time.perf_counter()
+        entries = [dumps(answer) for answer in answers]
+        dumps_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for entry in entries:
+            loads(entry)
+        loads_time = time.perf_counter() - start
+
+        address_entries = [
+            entry for answer, entry in zip(answers, entries)
+            if answer.rdtype in (A, AAAA) and not isinstance(answer, NXAnswer)
+        ]
+        start = time.perf_counter()
+        for entry in address_entries:
+            _answer_addresses(loads(entry))
+        addresses_time = time.perf_counter() - start
+
+        size = sum(len(entry) for entry in entries)
+        results.append({
+            "format": name,
+            "entries": len(entries),
+            "total_bytes": size,
+            "bytes_per_entry": size / len(entries),
+            "dumps_us_per_entry": dumps_time * 1e6 / len(entries),
+            "loads_us_per_entry": loads_time * 1e6 / len(entries),
+            "addresses_us_per_entry": addresses_time * 1e6 / len(address_entries),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    results = run(create_answers(args.entries))
+    json.dump({"benchmark": "serialization", "results": results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+"""Benchmark the resolvers and cache backends against a local stub nameserver.
+
+Run from the repository root with::
+
+    python -m benchmarks.suite [--entries N] [--threads N] [--only NAME ...]
+
+The results are written as JSON, to stdout or `--output`, as a list of
+records with `group`, `name`, `metric`, `value` and `unit`, so that runs
+can be compared to track regressions.  Backends whose dependencies are not
+installed are listed in `skipped`.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from dns.message import from_wire, make_query
+from dns.rdataclass import IN
+from dns.rdatatype import A
+from dns.resolver import (
+    NXDOMAIN,
+    Answer,
+    Cache,
+    LRUCache,
+    Resolver as DNSPythonResolver,
+    override_system_resolver,
+    restore_system_resolver,
+)
+from dns.version import version as dnspython_version
+
+import dns_cache
+from dns_cache.getaddrinfo import GetAddrInfoCache
+from dns_cache.stats import StatsCache, StatsResolver
+from dns_cache.resolver import (
+    AggressiveCachingResolver,
+    CoalescingResolver,
+    ExceptionCachingResolver,
+)
+
+from benchmarks import serialization
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+ZONE = "bench."
+
+
+class _StatsResolver(StatsResolver, dns_cache.Resolver):
+    pass
+
+
+def _host(i):
+    return "host{}.{}".format(i, ZONE)
+
+
+def _address(i):
+    return "10.{}.{}.{}".format(i // 65536 % 256, i // 256 % 256, i % 256)
+
+
+class Backend(object):
+    """How to create, save and reopen one cache backend."""
+
+    def __init__(self, name, create, save=None, hosts_file=False):
+        self.name = name
+        self._create = create
+        self._save = save
+        self.hosts_file = hosts_file
+
+    @property
+    def persistent(self):
+        return self._save is not None
+
+    def create(self, directory):
+        return self._create(directory)
+
+    def save(self, cache):
+        self._save(cache)
+
+
+def _pickle_save(cache):
+    cache.__del__()
+
+
+def _journal_save(cache):
+    cache.compact()
+    cache.close()
+
+
+def _data_close(cache):
+    cache.data.close()
+
+
+def _stash_save(cache):
+    cache.data.flush()
+
+
+def _backends():
+    backends = [
+        Backend("Cache", lambda directory: Cache()),
+        Backend("LRUCache", lambda directory: LRUCache(max_size=1000000)),
+    ]
+    skipped = []
+
+    from dns_cache.sharded import ShardedCache
+    backends.append(Backend("ShardedCache", lambda directory: ShardedCache()))
+
+    from dns_cache.pickle import (
+        JournaledPickableCache,
+        PickableCache,
+        PickableLRUCache,
+    )
+    for cls in (PickableCache, PickableLRUCache):
+        for wire in (False, True):
+            backends.append(Backend(
+                cls.__name__ + ("[wire]" if wire else ""),
+                lambda directory, cls=cls, wire=wire: cls(
+                    filename=os.path.join(directory, "dns.pickle"), wire=wire
+                ),
+                _pickle_save,
+            ))
+    backends.append(Backend(
+        "JournaledPickableCache",
+        lambda directory: JournaledPickableCache(
+            filename=os.path.join(directory, "dns.pickle")
+        ),
+        _journal_save,
+    ))
+
+    from dns_cache.mmap import MmapCache
+    backends.append(Backend(
+        "MmapCache",
+        lambda directory: MmapCache(filename=os.path.join(directory, "dns.mmap")),
+        _data_close,
+    ))
+
+    try:
+        from dns_cache.diskcache import DiskCache
+    except ImportError:
+        skipped.append("DiskCache")
+    else:
+        for wire in (False, True):
+            backends.append(Backend(
+                "DiskCache" + ("[wire]" if wire else ""),
+                lambda directory, wire=wire: DiskCache(
+                    directory=os.path.join(directory, "diskcache"), wire=wire
+                ),
+                _data_close,
+            ))
+
+    try:
+        from dns_cache.sqlitedict import SqliteDictCache
+    except ImportError:
+        skipped.append("SqliteDictCache")
+    else:
+        for wire in (False, True):
+            backends.append(Backend(
+                "SqliteDictCache" + ("[wire]" if wire else ""),
+                lambda directory, wire=wire: SqliteDictCache(
+                    filename=os.path.join(directory, "dns.sqlite"), wire=wire
+                ),
+                _data_close,
+            ))
+        backends.append(Backend(
+            "SqliteDictCache[binary_keys]",
+            lambda directory: SqliteDictCache(
+                filename=os.path.join(directory, "dns.sqlite"), binary_keys=True
+            ),
+            _data_close,
+        ))
+
+    try:
+        from dns_cache.stash import StashCache
+    except ImportError:
+        skipped.append("StashCache")
+    else:
+        backends.append(Backend(
+            "StashCache",
+            lambda directory: StashCache(
+                filename=os.path.join(directory, "dns.stash")
+            ),
+            _stash_save,
+        ))
+
+    from dns_cache.hosts import HostsCache, IndexedHostsCache
+    for cls in (HostsCache, IndexedHostsCache):
+        backends.append(Backend(
+            cls.__name__,
+            lambda directory, cls=cls: cls(filename=os.path.join(directory, "hosts")),
+            hosts_file=True,
+        ))
+
+    return backends, skipped
+
+
+class Suite(object):
+    def __init__(self, entries=1000, threads=8, only=None):
+        self.entries = entries
+        self.threads = threads
+        self.only = only
+        self.results = []
+
+        self.server = StubServer()
+        self.server.add_zone(ZONE)
+        for i in range(entries):
+            self.server.add(_host(i), 300, A, _address(i))
+
+    def record(self, group, name, metric, value, unit):
+        self.results.append({
+            "group": group,
+            "name": name,
+            "metric": metric,
+            "value": value,
+            "unit": unit,
+        })
+
+    def selected(self, name):
+        return not self.only or name in self.only
+
+    def _answers(self):
+        answers = []
+        for i in range(self.entries):
+            query = make_query(_host(i), A)
+            response = self.server.respond(query)
+            question = response.question[0]
+            answers.append(Answer(question.name, A, IN, response))
+        return answers
+
+    def _responses(self):
+        return [
+            self.server.respond(make_query(_host(i), A)).to_wire()
+            for i in range(self.entries)
+        ]
+
+    def _write_hosts(self, directory):
+        with open(os.path.join(directory, "hosts"), "w") as f:
+            for i in range(self.entries):
+                f.write("{} {}\n".format(_address(i), _host(i).rstrip(".")))
+
+    def _timed_resolve(self, resolver, names):
+        start = time.perf_counter()
+        for name in names:
+            resolver.resolve(name)
+        return (time.perf_counter() - start) * 1e6 / len(names)
+
+    def _throughput(self, resolver, names):
+        per_thread = max(1, len(names) // self.threads)
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(per_thread):
+                    resolver.resolve(names[(offset + i) % len(names)])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=worker, args=(i * per_thread, ))
+            for i in range(self.threads)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        if errors:
+            raise errors[0]
+        return per_thread * self.threads / elapsed
+
+    def _disk_usage(self, directory):
+        total = 0
+        for path, dirs, files in os.walk(directory):
+            for filename in files:
+                stat = os.stat(os.path.join(path, filename))
+                # Allocated size, as some files are sparse
+                total += getattr(stat, "st_blocks", stat.st_size // 512) * 512
+        return total
+
+    def _memory_per_entry(self, backend, directory, responses):
+        """Return the cache, and the memory retained for each entry put."""
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            cache = backend.create(directory)
+            for wire in responses:
+                response = from_wire(wire)
+                question = response.question[0]
+                answer = Answer(question.name, A, IN, response)
+                cache.put((answer.qname, answer.rdtype, answer.rdclass), answer)
+            del response, answer
+            gc.collect()
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        return cache, (after - before) / len(responses)
+
+    def run_backend(self, backend, answers):
+        group = "backend"
+        name = backend.name
+        names = [_host(i) for i in range(self.entries)]
+        directory = tempfile.mkdtemp()
+        try:
+            if backend.hosts_file:
+                self._write_hosts(directory)
+
+            start = time.perf_counter()
+            cache = backend.create(directory)
+            if backend.hosts_file:
+                # Loaded on the first get
+                cache.get((answers[0].qname, A, IN))
+            self.record(
+                group, name, "startup", (time.perf_counter() - start) * 1e3, "ms"
+            )
+
+            resolver = get_stub_resolver(dns_cache.Resolver, self.server, cache=cache)
+            if not backend.hosts_file:
+                self.record(
+                    group, name, "miss_latency",
+                    self._timed_resolve(resolver, names), "us",
+                )
+            self.record(
+                group, name, "hit_latency",
+                self._timed_resolve(resolver, names), "us",
+            )
+            self.record(
+                group, name, "hit_throughput",
+                self._throughput(resolver, names), "queries/s",
+            )
+
+            if backend.persistent:
+                start = time.perf_counter()
+                backend.save(cache)
+                self.record(
+                    group, name, "save", (time.perf_counter() - start) * 1e3, "ms"
+                )
+                del resolver, cache
+                gc.collect()
+
+                self.record(
+                    group, name, "disk_bytes_per_entry",
+                    self._disk_usage(directory) / self.entries, "bytes",
+                )
+
+                start = time.perf_counter()
+                cache = backend.create(directory)
+                cache.get((answers[0].qname, A, IN))
+                self.record(
+                    group, name, "load", (time.perf_counter() - start) * 1e3, "ms"
+                )
+                backend.save(cache)
+            del cache
+            gc.collect()
+
+            if not backend.hosts_file:
+                memory_directory = os.path.join(directory, "memory")
+                os.mkdir(memory_directory)
+                cache, memory = self._memory_per_entry(
+                    backend, memory_directory, self._responses()
+                )
+                self.record(group, name, "memory_bytes_per_entry", memory, "bytes")
+                if backend.persistent:
+                    backend.save(cache)
+                del cache
+                gc.collect()
+        finally:
+            shutil.rmtree(directory)
+
+    def run_resolver(self, cls, cache_cls=Cache, name=None):
+        group = "resolver"
+        if name is None:
+            name = cls.__name__
+            if cls.__module__ != "dns.resolver":
+                name = "{}.{}".format(cls.__module__, name)
+        names = [_host(i) for i in range(self.entries)]
+        missing = ["missing{}.{}".format(i, ZONE) for i in range(min(100, self.entries))]
+
+        resolver = get_stub_resolver(cls, self.server, cache=cache_cls())
+        self.record(
+            group, name, "miss_latency", self._timed_resolve(resolver, names), "us"
+        )
+        self.record(
+            group, name, "hit_latency", self._timed_resolve(resolver, names), "us"
+        )
+        self.record(
+            group, name, "hit_throughput", self._throughput(resolver, names),
+            "queries/s",
+        )
+
+        for i in range(2):
+            start = time.perf_counter()
+            for missing_name in missing:
+                try:
+                    resolver.resolve(missing_name)
+                except NXDOMAIN:
+                    pass
+            elapsed = (time.perf_counter() - start) * 1e6 / len(missing)
+        self.record(group, name, "nxdomain_repeat_latency", elapsed, "us")
+
+        override_system_resolver(resolver)
+        try:
+            start = time.perf_counter()
+            for host in names:
+                socket.getaddrinfo(host, 80, socket.AF_INET, socket.SOCK_STREAM)
+            elapsed = (time.perf_counter() - start) * 1e6 / len(names)
+
+            GetAddrInfoCache(resolver, size=len(names)).install()
+            for host in names:
+                socket.getaddrinfo(host, 80, socket.AF_INET, socket.SOCK_STREAM)
+            start = time.perf_counter()
+            for host in names:
+                socket.getaddrinfo(host, 80, socket.AF_INET, socket.SOCK_STREAM)
+            cached_elapsed = (time.perf_counter() - start) * 1e6 / len(names)
+        finally:
+            restore_system_resolver()
+        self.record(group, name, "getaddrinfo_hit_latency", elapsed, "us")
+        self.record(
+            group, name, "getaddrinfo_cached_hit_latency", cached_elapsed, "us"
+        )
+
+    def run_serialization(self):
+        answers = serialization.create_answers(self.entries)
+        for result in serialization.run(answers):
+            for metric, unit in [
+                ("bytes_per_entry", "bytes"),
+                ("dumps_us_per_entry", "us"),
+                ("loads_us_per_entry", "us"),
+                ("addresses_us_per_entry", "us"),
+            ]:
+                self.record(
+                    "serialization", result["format"], metric, result[metric], unit
+                )
+
+    def run(self):
+        backends, skipped = _backends()
+        self.server.start()
+        try:
+            answers = self._answers()
+            for backend in backends:
+                if self.selected(backend.name):
+                    self.run_backend(backend, answers)
+
+            for cls in (
+                DNSPythonResolver,
+                AggressiveCachingResolver,
+                ExceptionCachingResolver,
+                CoalescingResolver,
+                dns_cache.Resolver,
+            ):
+                if self.selected(cls.__name__):
+                    self.run_resolver(cls)
+
+            # The overhead of recording stats
+            if self.selected("StatsResolver"):
+                self.run_resolver(
+                    _StatsResolver, StatsCache, "dns_cache.Resolver+stats"
+                )
+
+            if self.selected("serialization"):
+                self.run_serialization()
+        finally:
+            self.server.stop()
+
+        return {
+            "python": platform.python_version(),
+            "dnspython": dnspython_version,
+            "entries": self.entries,
+            "threads": self.threads,
+            "skipped": skipped,
+            "results": self.results,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument(
+        "--only", nargs="*",
+        help="names of backends, resolver classes or 'serialization' to run",
+    )
+    parser.add_argument("--output", help="file to write, instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = Suite(args.entries, args.threads, args.only).run()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,19 +7,33 @@ from dns.resolver import override_system_resolver as upstream_override_system_re
 
 from .expiration import _NO_EXPIRY as NO_EXPIRY
 from .expiration import FIVE_MINS, MinExpirationCache, NoExpirationCache
+from .getaddrinfo import DEFAULT_SIZE as DEFAULT_GETADDRINFO_CACHE_SIZE
+from .getaddrinfo import GetAddrInfoCache
 from .persistence import _LayeredCache
 from .pickle import PickableCache
-from .resolver import AggressiveCachingResolver, ExceptionCachingResolver
+from .resolver import (
+    AggressiveCachingResolver,
+    BulkResolver,
+    CoalescingResolver,
+    ExceptionCachingResolver,
+    HostAnswersResolver,
+)
 
 try:
-    from .hosts import HostsCache
+    from .hosts import HostsCache, IndexedHostsCache
 except ImportError:
-    HostsCache = None
+    HostsCache = IndexedHostsCache = None
 
 __version__ = "0.3.0"
 
 
-class Resolver(AggressiveCachingResolver, ExceptionCachingResolver):
+class Resolver(
+    BulkResolver,
+    HostAnswersResolver,
+    CoalescingResolver,
+    AggressiveCachingResolver,
+    ExceptionCachingResolver,
+):
     pass
 
 
@@ -32,7 +46,8 @@ class NoExpirationPickableCache(NoExpirationCache, PickableCache):
 
 
 def override_system_resolver(
-    resolver=None, cache=None, directory=None, min_ttl=FIVE_MINS
+    resolver=None, cache=None, directory=None, min_ttl=FIVE_MINS,
+    getaddrinfo_cache_size=DEFAULT_GETADDRINFO_CACHE_SIZE,
 ):
     if not cache:
         if directory:  # pragma: no cover
@@ -56,8 +71,8 @@ def override_system_resolver(
             else:
                 cache = MinExpirationCache(min_ttl=min_ttl)
 
-        if HostsCache:
-            cache = _LayeredCache(HostsCache(filename=None), cache)
+        if IndexedHostsCache:
+            cache = _LayeredCache(IndexedHostsCache(filename=None), cache)
 
     if not resolver:
         resolver = Resolver(configure=False)
@@ -73,6 +88,12 @@ def override_system_resolver(
 
     upstream_override_system_resolver(resolver)
 
+    if getaddrinfo_cache_size:
+        resolver.getaddrinfo_cache = GetAddrInfoCache(
+            resolver, size=getaddrinfo_cache_size
+        )
+        resolver.getaddrinfo_cache.install()
+
     if hasattr(cache, "__del__"):
         atexit.register(cache.__del__)
 
@@ -0,0 +1,106 @@
+import asyncio
+
+from dns.asyncresolver import Resolver as AsyncResolver
+from dns.exception import DNSException
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+from dns.resolver import NoMetaqueries
+
+from .resolver import (
+    AggressiveCachingResolverBase,
+    BulkResolverBase,
+    ExceptionCachingResolverBase,
+)
+
+
+class AggressiveCachingResolver(AggressiveCachingResolverBase, AsyncResolver):
+    async def resolve(self, qname, rdtype=A, rdclass=IN,
+                      tcp=False, source=None, raise_on_no_answer=True,
+                      source_port=0, lifetime=None, search=None, backend=None):
+        assert self.cache
+
+        answer = self._get_uncached_answer(qname, rdtype, rdclass)
+        if answer is not None:
+            return answer
+
+        answer = await super(AggressiveCachingResolver, self).resolve(
+            qname, rdtype, rdclass, tcp, source,
+            raise_on_no_answer, source_port, lifetime, search, backend,
+        )
+        self._cache_answer(answer, raise_on_no_answer)
+
+        return answer
+
+
+class ExceptionCachingResolver(ExceptionCachingResolverBase, AsyncResolver):
+    async def resolve(self, qname, rdtype=A, rdclass=IN,
+                      tcp=False, source=None, raise_on_no_answer=True,
+                      source_port=0, lifetime=None, search=None, backend=None):
+        assert self.cache
+
+        if isinstance(qname, str):
+            qname = from_text(qname)
+
+        self._raise_cached_exception(qname, rdtype, rdclass)
+
+        try:
+            return await super(ExceptionCachingResolver, self).resolve(
+                qname, rdtype, rdclass, tcp, source,
+                raise_on_no_answer, source_port, lifetime, search, backend,
+            )
+        except NoMetaqueries:
+            raise
+        except DNSException as e:
+            self._cache_exception(e, qname, rdtype, rdclass)
+            raise
+
+
+class BulkResolver(BulkResolverBase, AsyncResolver):
+    async def _lookup(self, qname, rdtype, rdclass, kwargs):
+        try:
+            return qname, await self.resolve(qname, rdtype, rdclass, **kwargs)
+        except Exception as e:
+            return qname, e
+
+    async def resolve_many(self, qnames, rdtype=A, rdclass=IN, concurrency=None,
+                           **kwargs):
+        """Yield (qname, answer or exception) for each of `qnames`.
+
+        Names in the cache are yielded in the order given, while up to
+        `concurrency` others are looked up at a time, and yielded as they
+        complete.
+        """
+        concurrency = concurrency or self.concurrency
+        pending = set()
+
+        try:
+            for qname in qnames:
+                if self._is_cached(qname, rdtype, rdclass):
+                    yield await self._lookup(qname, rdtype, rdclass, kwargs)
+                    continue
+
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        yield task.result()
+
+                pending.add(asyncio.ensure_future(
+                    self._lookup(qname, rdtype, rdclass, kwargs)
+                ))
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+class Resolver(BulkResolver, AggressiveCachingResolver, ExceptionCachingResolver):
+    pass
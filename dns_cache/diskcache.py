@@ -1,21 +1,75 @@
 from __future__ import absolute_import
 
+import os
+import time
+
 import diskcache as dc
 
 from dns.resolver import Cache, LRUCache
 
+from peak.util.proxies import ObjectWrapper
+
+from .eviction import EvictionPolicyCacheBase
+from .expiration import ExpiringStoreCacheBase
+from .wire import WireValueDict
+
+EXPIRE_TIMES_FLAG = "dns_cache_expire_times"
+
+
+class ExpireTimeDict(ObjectWrapper):
+    """Wrap a `diskcache.Cache`, storing the expiration of each value as its
+    expire time, so `diskcache` treats expired entries as missing, and its
+    `expire` removes them, without loading them.
+    """
+
+    def __setitem__(self, key, value):
+        self.__subject__.set(key, value, expire=value.expiration - time.time())
+
+    def set_expire_times(self):
+        """Set the expire time of entries stored without one, by earlier
+        versions, removing those expired, and return how many were updated.
+
+        This is only done once for each directory, recorded by a flag file
+        in it, as it loads every entry.
+        """
+        subject = self.__subject__
+        flag = os.path.join(subject.directory, EXPIRE_TIMES_FLAG)
+        if os.path.exists(flag):
+            return 0
+        now = time.time()
+        count = 0
+        for key in list(subject.iterkeys()):
+            expiration = getattr(subject.get(key), "expiration", None)
+            if expiration is None:
+                continue
+            if expiration <= now:
+                subject.delete(key)
+            else:
+                subject.touch(key, expire=expiration - now)
+            count += 1
+        open(flag, "w").close()
+        return count
+
 
 class DiskCacheBase(object):
-    def __init__(self, directory, *args, **kwargs):
+
+    _expiring_store = False
+
+    def __init__(self, directory, wire=False, *args, **kwargs):
         super(DiskCacheBase, self).__init__(*args, **kwargs)
         self.data = dc.Cache(directory)
+        if wire:
+            self.data = WireValueDict(self.data)
+        if self._expiring_store:
+            self.data = ExpireTimeDict(self.data)
+            self.data.set_expire_times()
 
 
-class DiskCache(DiskCacheBase, Cache):
+class DiskCache(ExpiringStoreCacheBase, DiskCacheBase, Cache):
     def __init__(self, *args, **kwargs):
         super(DiskCache, self).__init__(*args, **kwargs)
 
 
-class DiskLRUCache(DiskCacheBase, LRUCache):
+class DiskLRUCache(EvictionPolicyCacheBase, DiskCacheBase, LRUCache):
     def __init__(self, *args, **kwargs):
         super(DiskLRUCache, self).__init__(*args, **kwargs)
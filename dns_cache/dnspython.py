@@ -24,6 +24,12 @@ except ImportError:  # pragma: no cover
     RdataClass = RdataType = FakeMake
 
 
+# Set by Answer from the response
+_MATERIALIZED_ATTRIBUTES = frozenset(
+    ["response", "nameserver", "port", "chaining_result"]
+)
+
+
 def create_rdata(address, rdtype=A, rdclass=IN):
     cls = get_rdata_class(rdclass=rdclass, rdtype=rdtype)
     rdata = cls(rdclass=rdclass, rdtype=rdtype, address=address)
@@ -60,3 +66,43 @@ def create_answer(name, rrset):
 
     answer = Answer(name, rdtype, rdclass, response)
     return answer
+
+
+def create_chained_answer(qname, rdtype, rdclass, rrsets):
+    """Create an answer for `qname` from a CNAME or DNAME chain of rrsets."""
+    query = make_query(qname, rdtype, rdclass)
+    response = make_response(query)
+    response.answer = list(rrsets)
+    response.index = dict(
+        ((ANSWER, rrset.name, rrset.rdclass, rrset.rdtype, rrset.covers, None), rrset)
+        for rrset in rrsets
+    )
+
+    return Answer(qname, RdataType.make(rdtype), RdataClass.make(rdclass), response)
+
+
+class InjectedAnswer(Answer):
+    """Answer of an authority or additional rrset of a response, which only
+    creates its query and response messages when they are used."""
+
+    def __init__(self, rrset, expiration):
+        self.qname = rrset.name
+        self.rdtype = RdataType.make(rrset.rdtype)
+        self.rdclass = RdataClass.make(rrset.rdclass)
+        self.canonical_name = rrset.name
+        self.rrset = rrset
+        self.expiration = expiration
+
+    def _materialize(self):
+        expiration = self.expiration
+        self.__dict__.update(vars(create_answer(self.qname, self.rrset)))
+        self.expiration = expiration
+
+    def __getattr__(self, attr):
+        if attr.startswith("__") or "rrset" not in self.__dict__:
+            raise AttributeError(attr)
+        if attr in _MATERIALIZED_ATTRIBUTES and "response" not in self.__dict__:
+            self._materialize()
+            if attr in self.__dict__:
+                return self.__dict__[attr]
+        return super(InjectedAnswer, self).__getattr__(attr)
@@ -0,0 +1,366 @@
+"""Scan resistant eviction policies for the LRU caches.
+
+A scan over many names which are looked up once, such as a batch job,
+evicts every entry of an LRU cache.  `EvictionPolicyCacheBase` adds a
+`policy` argument to the LRU caches, which chooses the entries to evict:
+
+- `"lru"`, the default, evicts the least recently used entries.
+- `"tinylfu"`, `TinyLFUPolicy`, is W-TinyLFU: new entries are kept in a
+  small LRU window, and then only kept if they are looked up more often
+  than the entry they would replace, as estimated by a frequency sketch.
+- `"arc"`, `ARCPolicy`, is the Adaptive Replacement Cache, which keeps
+  entries seen once apart from entries seen again, and adapts their sizes
+  using the keys recently evicted from each.
+
+The policies only keep keys, in memory, and the entries remain in the
+data store of the cache.
+"""
+import collections
+
+from dns.resolver import LRUCache
+
+DEFAULT_POLICY = "lru"
+
+# Multipliers for the index of each row of the sketch
+_SKETCH_SEEDS = (
+    0x9E3779B97F4A7C15,
+    0xC2B2AE3D27D4EB4F,
+    0x165667B19E3779F9,
+    0xD6E8FEB86659FD93,
+)
+_SKETCH_MAX_COUNT = 15
+_SKETCH_MIN_WIDTH = 16
+
+
+def _move_to_end(ordered, key):
+    # OrderedDict.move_to_end is not available on Python 2.7
+    del ordered[key]
+    ordered[key] = None
+
+
+class FrequencySketch(object):
+    """Count-min sketch of the frequency of keys, in four bit counters.
+
+    The counters are halved after `10 * size` increments, so that keys
+    which are no longer looked up are forgotten.
+    """
+
+    def __init__(self, size):
+        width = _SKETCH_MIN_WIDTH
+        while width < size:
+            width <<= 1
+        self._mask = width - 1
+        self._rows = [bytearray(width) for seed in _SKETCH_SEEDS]
+        self.sample_size = 10 * width
+        self._additions = 0
+
+    def _indexes(self, key):
+        h = hash(key)
+        mask = self._mask
+        return [((h * seed) >> 24) & mask for seed in _SKETCH_SEEDS]
+
+    def increment(self, key):
+        added = False
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < _SKETCH_MAX_COUNT:
+                row[index] += 1
+                added = True
+        if added:
+            self._additions += 1
+            if self._additions >= self.sample_size:
+                self._reset()
+
+    def _reset(self):
+        for i, row in enumerate(self._rows):
+            self._rows[i] = bytearray(count >> 1 for count in row)
+        self._additions //= 2
+
+    def frequency(self, key):
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+
+class TinyLFUPolicy(object):
+    """W-TinyLFU eviction.
+
+    New keys enter an LRU window of 1% of the keys.  Keys leaving the
+    window are kept in the main segments if the sketch estimates them to be
+    more frequent than the next key to be evicted from the main segments,
+    which are split into a probation segment and a protected segment of
+    keys looked up again, of 80% of the main keys.
+    """
+
+    window_ratio = 0.01
+    protected_ratio = 0.8
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.window_size = max(1, int(max_size * self.window_ratio))
+        self.main_size = max(0, max_size - self.window_size)
+        self.protected_size = int(self.main_size * self.protected_ratio)
+        self.sketch = FrequencySketch(max_size)
+        self._window = collections.OrderedDict()
+        self._probation = collections.OrderedDict()
+        self._protected = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._window) + len(self._probation) + len(self._protected)
+
+    def __contains__(self, key):
+        return key in self._window or key in self._probation or key in self._protected
+
+    def hit(self, key):
+        self.sketch.increment(key)
+        if key in self._window:
+            _move_to_end(self._window, key)
+        elif key in self._protected:
+            _move_to_end(self._protected, key)
+        elif key in self._probation:
+            del self._probation[key]
+            self._protected[key] = None
+            if len(self._protected) > self.protected_size:
+                demoted, _ = self._protected.popitem(last=False)
+                self._probation[demoted] = None
+
+    def miss(self, key):
+        self.sketch.increment(key)
+        self.remove(key)
+
+    def insert(self, key):
+        """Add `key`, returning the keys to evict."""
+        self.sketch.increment(key)
+        self._window[key] = None
+        if len(self._window) <= self.window_size:
+            return []
+
+        candidate, _ = self._window.popitem(last=False)
+        if len(self._probation) + len(self._protected) < self.main_size:
+            self._probation[candidate] = None
+            return []
+
+        main = self._probation or self._protected
+        if not main:
+            return [candidate]
+        victim = next(iter(main))
+        if self.sketch.frequency(candidate) > self.sketch.frequency(victim):
+            del main[victim]
+            self._probation[candidate] = None
+            return [victim]
+        return [candidate]
+
+    def evict(self):
+        """Remove and return the key to evict first, such as to free memory,
+        or None if there are no keys."""
+        for segment in (self._probation, self._window, self._protected):
+            if segment:
+                key, _ = segment.popitem(last=False)
+                return key
+        return None
+
+    def remove(self, key):
+        self._window.pop(key, None)
+        self._probation.pop(key, None)
+        self._protected.pop(key, None)
+
+    def clear(self):
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+
+
+class ARCPolicy(object):
+    """Adaptive Replacement Cache eviction.
+
+    Keys seen once are kept in `t1`, and keys seen again in `t2`.  The keys
+    evicted from each are remembered in `b1` and `b2`, and a miss of one of
+    them moves the target size `p` of `t1` towards the list it was in.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.p = 0
+        self.t1 = collections.OrderedDict()
+        self.t2 = collections.OrderedDict()
+        self.b1 = collections.OrderedDict()
+        self.b2 = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.t1) + len(self.t2)
+
+    def __contains__(self, key):
+        return key in self.t1 or key in self.t2
+
+    def hit(self, key):
+        if key in self.t1:
+            del self.t1[key]
+            self.t2[key] = None
+        elif key in self.t2:
+            _move_to_end(self.t2, key)
+
+    def miss(self, key):
+        self.remove(key)
+
+    def _replace(self, in_b2):
+        if self.t1 and (len(self.t1) > self.p or (in_b2 and len(self.t1) == self.p)):
+            victim, _ = self.t1.popitem(last=False)
+            self.b1[victim] = None
+        elif self.t2:
+            victim, _ = self.t2.popitem(last=False)
+            self.b2[victim] = None
+        else:  # pragma: no cover
+            victim, _ = self.t1.popitem(last=False)
+            self.b1[victim] = None
+        return victim
+
+    def insert(self, key):
+        """Add `key`, returning the keys to evict."""
+        c = self.max_size
+        victims = []
+        if key in self.b1:
+            self.p = min(c, self.p + max(len(self.b2) // len(self.b1), 1))
+            del self.b1[key]
+            if len(self) >= c:
+                victims.append(self._replace(False))
+            self.t2[key] = None
+            return victims
+        if key in self.b2:
+            self.p = max(0, self.p - max(len(self.b1) // len(self.b2), 1))
+            del self.b2[key]
+            if len(self) >= c:
+                victims.append(self._replace(True))
+            self.t2[key] = None
+            return victims
+
+        if len(self.t1) + len(self.b1) >= c:
+            if len(self.t1) < c:
+                self.b1.popitem(last=False)
+                if len(self) >= c:
+                    victims.append(self._replace(False))
+            else:
+                victim, _ = self.t1.popitem(last=False)
+                victims.append(victim)
+        else:
+            total = len(self) + len(self.b1) + len(self.b2)
+            if total >= c:
+                if total >= 2 * c and self.b2:
+                    self.b2.popitem(last=False)
+                if len(self) >= c:
+                    victims.append(self._replace(False))
+        self.t1[key] = None
+        return victims
+
+    def evict(self):
+        """Remove and return the key to evict first, such as to free memory,
+        or None if there are no keys."""
+        if not self:
+            return None
+        return self._replace(False)
+
+    def remove(self, key):
+        self.t1.pop(key, None)
+        self.t2.pop(key, None)
+
+    def clear(self):
+        self.p = 0
+        self.t1.clear()
+        self.t2.clear()
+        self.b1.clear()
+        self.b2.clear()
+
+
+POLICIES = {
+    "lru": None,
+    "tinylfu": TinyLFUPolicy,
+    "arc": ARCPolicy,
+}
+
+
+def _policy_class(policy):
+    if policy is None or isinstance(policy, type):
+        return policy
+    try:
+        return POLICIES[policy.lower()]
+    except KeyError:
+        raise ValueError("Unknown eviction policy {!r}".format(policy))
+
+
+class EvictionPolicyCacheBase(object):
+    """Evict the entries chosen by `policy`, of an LRU cache.
+
+    The policy is given as a name in `POLICIES` or a policy class, and is
+    created with the keys of any entries loaded by the cache, oldest first.
+    """
+
+    _policy = None
+
+    def __init__(self, *args, **kwargs):
+        policy_cls = _policy_class(kwargs.pop("policy", DEFAULT_POLICY))
+        super(EvictionPolicyCacheBase, self).__init__(*args, **kwargs)
+        # Set after loading any saved state, which may have another policy
+        self._policy_cls = policy_cls
+        self._create_policy()
+
+    def _create_policy(self):
+        if self._policy_cls is None:
+            self._policy = None
+            return
+
+        policy = self._policy_cls(self.max_size)
+        victims = []
+        with self.lock:
+            node = self.sentinel.prev
+            while node is not self.sentinel:
+                victims += policy.insert(node.key)
+                node = node.prev
+            self._policy = policy
+        for victim in victims:
+            super(EvictionPolicyCacheBase, self).flush(victim)
+
+    @property
+    def policy(self):
+        return self._policy
+
+    def set_max_size(self, max_size):
+        super(EvictionPolicyCacheBase, self).set_max_size(max_size)
+        if self._policy is not None:
+            self._create_policy()
+
+    def get(self, key):
+        value = super(EvictionPolicyCacheBase, self).get(key)
+        policy = self._policy
+        if policy is not None:
+            with self.lock:
+                if value is None:
+                    policy.miss(key)
+                else:
+                    policy.hit(key)
+        return value
+
+    def put(self, key, value):
+        policy = self._policy
+        if policy is None:
+            return super(EvictionPolicyCacheBase, self).put(key, value)
+
+        with self.lock:
+            if key in policy:
+                policy.hit(key)
+                victims = []
+            else:
+                victims = policy.insert(key)
+        for victim in victims:
+            super(EvictionPolicyCacheBase, self).flush(victim)
+        super(EvictionPolicyCacheBase, self).put(key, value)
+
+    def flush(self, key=None):
+        super(EvictionPolicyCacheBase, self).flush(key)
+        policy = self._policy
+        if policy is not None:
+            with self.lock:
+                if key is None:
+                    policy.clear()
+                else:
+                    policy.remove(key)
+
+
+class PolicyLRUCache(EvictionPolicyCacheBase, LRUCache):
+    def __init__(self, *args, **kwargs):
+        super(PolicyLRUCache, self).__init__(*args, **kwargs)
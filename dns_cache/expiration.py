@@ -1,7 +1,13 @@
+import heapq
+import itertools
 import time
 
 from dns.resolver import Cache, LRUCache
 
+from peak.util.proxies import ObjectWrapper
+
+from .eviction import EvictionPolicyCacheBase
+
 FIVE_MINS = 60 * 5
 TEN_MINS = 60 * 10
 SECONDS_PER_DAY = 60 * 60 * 24
@@ -11,6 +17,8 @@ _NO_EXPIRY = SECONDS_PER_WEEK
 
 MIN_TTL = FIVE_MINS
 
+DEFAULT_CLEAN_BATCH = 1000
+
 
 class MinExpirationCacheBase(object):
     def __init__(self, min_ttl=None, *args, **kwargs):
@@ -27,16 +35,320 @@ class MinExpirationCacheBase(object):
         super(MinExpirationCacheBase, self).put(key, value)
 
 
+class ExpiryHeapCacheBase(object):
+    """Remove expired entries of a `dns.resolver.Cache` using a heap of
+    expirations, instead of scanning all entries every `cleaning_interval`.
+
+    Each lookup removes up to `clean_batch` entries which have expired, so
+    the work done is proportional to the number of expired entries.  The
+    heap is created from the entries on first use, such as when loaded.
+    """
+
+    clean_batch = DEFAULT_CLEAN_BATCH
+
+    _expiry_heap = None
+
+    def _create_expiry_heap(self):
+        self._expirations = dict(
+            (key, value.expiration) for key, value in self.data.items()
+        )
+        self._compact_expiry_heap()
+
+    def _compact_expiry_heap(self):
+        self._expiry_counter = itertools.count()
+        self._expiry_heap = [
+            (expiration, next(self._expiry_counter), key)
+            for key, expiration in self._expirations.items()
+        ]
+        heapq.heapify(self._expiry_heap)
+
+    def _schedule_expiry(self, key, expiration):
+        if self._expiry_heap is None:
+            self._create_expiry_heap()
+        elif self._expirations.get(key) != expiration:
+            self._expirations[key] = expiration
+            heapq.heappush(
+                self._expiry_heap, (expiration, next(self._expiry_counter), key)
+            )
+            # Drop the entries of keys put again, once they dominate
+            if len(self._expiry_heap) > 2 * len(self._expirations) + self.clean_batch:
+                self._compact_expiry_heap()
+
+    def _maybe_clean(self):
+        heap = self._expiry_heap
+        if heap is None:
+            self._create_expiry_heap()
+            heap = self._expiry_heap
+        now = time.time()
+        if not heap or heap[0][0] > now:
+            return
+
+        data = self.data
+        expirations = self._expirations
+        for i in range(self.clean_batch):
+            if not heap or heap[0][0] > now:
+                break
+            expiration, _, key = heapq.heappop(heap)
+            if expirations.get(key) != expiration:
+                # Put again with another expiration, which is also in the heap
+                continue
+            del expirations[key]
+            value = data.get(key)
+            if value is None:
+                continue
+            if value.expiration <= now:
+                del data[key]
+            else:
+                # The expiration was changed after it was put
+                self._schedule_expiry(key, value.expiration)
+
+    def put(self, key, value):
+        super(ExpiryHeapCacheBase, self).put(key, value)
+        with self.lock:
+            self._schedule_expiry(key, value.expiration)
+
+    def flush(self, key=None):
+        super(ExpiryHeapCacheBase, self).flush(key)
+        if key is None:
+            with self.lock:
+                self._create_expiry_heap()
+
+
+class ExpiryHeapCache(ExpiryHeapCacheBase, Cache):
+    pass
+
+
+class ExpiringStoreCacheBase(object):
+    """Remove expired entries of a `dns.resolver.Cache` using `expire` of its
+    store, which keeps the expiration of each entry apart from its value,
+    instead of loading every entry every `cleaning_interval`.
+
+    The store only returns entries which have not expired, so lookups of
+    expired entries are misses without loading their value.
+    """
+
+    _expiring_store = True
+
+    def _maybe_clean(self):
+        now = time.time()
+        if self.next_cleaning <= now:
+            # Write any puts pending with write-behind, so they are purged too
+            flush_pending = getattr(self, "flush_pending", None)
+            if flush_pending:
+                flush_pending()
+            self.data.expire(now)
+            self.next_cleaning = time.time() + self.cleaning_interval
+
+    def flush(self, key=None):
+        with self.lock:
+            if key is not None:
+                # Expired entries are not `in` the store
+                try:
+                    del self.data[key]
+                except KeyError:
+                    pass
+            else:
+                # Clear the store, instead of replacing it with a dict
+                self.data.clear()
+                self.next_cleaning = time.time() + self.cleaning_interval
+
+
+class ExpiringValueDict(ObjectWrapper):
+    """Wrap a dict-like store, storing each value serialized with `encode`,
+    in a tuple after its expiration.
+
+    Lookups of expired entries and `expire` only read the expiration, and
+    do not `decode` the value.  Values stored by earlier versions, without
+    the expiration, are also loaded.
+    """
+
+    _encode = None
+    _decode = None
+
+    def __init__(self, subject, encode, decode):
+        super(ExpiringValueDict, self).__init__(subject)
+        self._encode = encode
+        self._decode = decode
+
+    def _load(self, item):
+        if isinstance(item, (tuple, list)):
+            return self._decode(item[1])
+        if isinstance(item, (bytes, bytearray)):
+            return self._decode(item)
+        return item
+
+    def _expiration(self, item):
+        if isinstance(item, (tuple, list)):
+            return item[0]
+        return self._load(item).expiration
+
+    def __getitem__(self, key):
+        item = self.__subject__[key]
+        if self._expiration(item) <= time.time():
+            raise KeyError(key)
+        return self._load(item)
+
+    def __setitem__(self, key, value):
+        self.__subject__[key] = (value.expiration, self._encode(value))
+
+    def __contains__(self, key):
+        item = self.__subject__.get(key)
+        return item is not None and self._expiration(item) > time.time()
+
+    def get(self, key, default=None):
+        item = self.__subject__.get(key)
+        if item is None or self._expiration(item) <= time.time():
+            return default
+        return self._load(item)
+
+    def items(self):
+        for key, item in self.__subject__.items():
+            yield key, self._load(item)
+
+    def values(self):
+        for item in self.__subject__.values():
+            yield self._load(item)
+
+    def expire(self, now=None):
+        """Remove the entries expired at `now`, returning how many were removed."""
+        if now is None:
+            now = time.time()
+        expired = [
+            key
+            for key, item in self.__subject__.items()
+            if self._expiration(item) <= now
+        ]
+        for key in expired:
+            del self.__subject__[key]
+        return len(expired)
+
+
 class NoExpirationCacheBase(MinExpirationCacheBase):
-    def __init__(self, min_ttl=_NO_EXPIRY):
-        super(NoExpirationCacheBase, self).__init__(min_ttl)
+    def __init__(self, min_ttl=_NO_EXPIRY, *args, **kwargs):
+        super(NoExpirationCacheBase, self).__init__(min_ttl, *args, **kwargs)
 
     def _maybe_clean(self):
         """Avoid the _maybe_clean phase of dns.resolver.Cache."""
         pass
 
 
-class MinExpirationCache(MinExpirationCacheBase, Cache):
+class StaleEntry(object):
+    """Entry of `StaleCacheBase`, retaining `answer` until `expiration`."""
+
+    def __init__(self, answer, expiration):
+        self.answer = answer
+        self.expiration = expiration
+
+
+class StaleCacheBase(object):
+    """Retain entries after they expire, so they can be served stale.
+
+    Entries are kept for the larger of `stale_ttl` and `serve_stale_ttl`
+    beyond their expiration, stored as a `StaleEntry`, so the expiration of
+    the answer is unchanged.  `get` only returns fresh entries, while
+    `get_stale` also returns entries which have expired but are still
+    retained.
+
+    Place after MinExpirationCacheBase, so that `min_ttl` is applied to the
+    fresh expiration.
+    """
+
+    def __init__(
+        self, stale_ttl=FIVE_MINS, serve_stale_ttl=SECONDS_PER_DAY, *args, **kwargs
+    ):
+        super(StaleCacheBase, self).__init__(*args, **kwargs)
+        self.stale_ttl = stale_ttl
+        self.serve_stale_ttl = serve_stale_ttl
+
+    def put(self, key, value):
+        if not isinstance(value, StaleEntry):
+            value = StaleEntry(
+                value,
+                value.expiration + max(self.stale_ttl, self.serve_stale_ttl),
+            )
+        super(StaleCacheBase, self).put(key, value)
+
+    def get(self, key):
+        value = self.get_stale(key)
+        if value is not None and value.expiration <= time.time():
+            return None
+        return value
+
+    def get_stale(self, key):
+        entry = super(StaleCacheBase, self).get(key)
+        if entry is None:
+            return None
+        return entry.answer
+
+
+class PrefetchCacheBase(object):
+    """Track hits on entries, so popular entries can be refreshed early.
+
+    An entry is due to be prefetched once `prefetch_fraction` of its
+    lifetime has passed, if it has been hit at least `prefetch_min_hits`
+    times since it was put.  `claim_prefetch` returns True only once for
+    each due entry, until it is put again.
+    """
+
+    def __init__(self, prefetch_fraction=0.9, prefetch_min_hits=2, *args, **kwargs):
+        super(PrefetchCacheBase, self).__init__(*args, **kwargs)
+        self.prefetch_fraction = prefetch_fraction
+        self.prefetch_min_hits = prefetch_min_hits
+        self._prefetch_hits = {}
+
+    def put(self, key, value):
+        super(PrefetchCacheBase, self).put(key, value)
+        # AggressiveCachingResolver puts answers again on hits, which may
+        # also extend their expiration, so identify them by the response
+        response_id = getattr(getattr(value, "response", None), "id", None)
+        hits = self._prefetch_hits.get(key)
+        if hits is None or hits[2] != response_id:
+            self._prefetch_hits[key] = [time.time(), 0, response_id]
+            self._prune_prefetch_hits()
+
+    def _prune_prefetch_hits(self):
+        # Drop the hits of entries evicted or removed as expired, once they
+        # dominate, which takes time proportional to the puts since the last
+        if len(self._prefetch_hits) > 2 * len(self.data) + 1:
+            data = self.data
+            self._prefetch_hits = dict(
+                (key, hits)
+                for key, hits in list(self._prefetch_hits.items())
+                if key in data
+            )
+
+    def get(self, key):
+        value = super(PrefetchCacheBase, self).get(key)
+        if value is None:
+            self._prefetch_hits.pop(key, None)
+        else:
+            hits = self._prefetch_hits.get(key)
+            if hits is not None:
+                hits[1] += 1
+        return value
+
+    def flush(self, key=None):
+        super(PrefetchCacheBase, self).flush(key)
+        if key is None:
+            self._prefetch_hits = {}
+        else:
+            self._prefetch_hits.pop(key, None)
+
+    def claim_prefetch(self, key, value):
+        hits = self._prefetch_hits.get(key)
+        if hits is None or hits[1] < self.prefetch_min_hits:
+            return False
+
+        put_time = hits[0]
+        due = put_time + (value.expiration - put_time) * self.prefetch_fraction
+        if due > time.time():
+            return False
+
+        # Only one caller gets the entry
+        return self._prefetch_hits.pop(key, None) is not None
+
+
+class MinExpirationCache(MinExpirationCacheBase, ExpiryHeapCacheBase, Cache):
     def __init__(self, cleaning_interval=None, min_ttl=None, *args, **kwargs):
         if not min_ttl:
             min_ttl = MIN_TTL
@@ -51,9 +363,45 @@ class NoExpirationCache(NoExpirationCacheBase, Cache):
     pass
 
 
-class MinExpirationLRUCache(MinExpirationCacheBase, LRUCache):
+class MinExpirationLRUCache(MinExpirationCacheBase, EvictionPolicyCacheBase, LRUCache):
+    pass
+
+
+class NoExpirationLRUCache(NoExpirationCacheBase, EvictionPolicyCacheBase, LRUCache):
     pass
 
 
-class NoExpirationLRUCache(NoExpirationCacheBase, LRUCache):
+class StaleCache(MinExpirationCacheBase, StaleCacheBase, ExpiryHeapCacheBase, Cache):
+    def __init__(self, cleaning_interval=None, min_ttl=None, *args, **kwargs):
+        if not min_ttl:
+            min_ttl = MIN_TTL
+        if not cleaning_interval:
+            cleaning_interval = max(MIN_TTL, min_ttl)
+        super(StaleCache, self).__init__(
+            cleaning_interval=cleaning_interval, min_ttl=min_ttl, *args, **kwargs
+        )
+
+
+class StaleLRUCache(
+    MinExpirationCacheBase, StaleCacheBase, EvictionPolicyCacheBase, LRUCache
+):
+    pass
+
+
+class PrefetchCache(
+    MinExpirationCacheBase, PrefetchCacheBase, ExpiryHeapCacheBase, Cache
+):
+    def __init__(self, cleaning_interval=None, min_ttl=None, *args, **kwargs):
+        if not min_ttl:
+            min_ttl = MIN_TTL
+        if not cleaning_interval:
+            cleaning_interval = max(MIN_TTL, min_ttl)
+        super(PrefetchCache, self).__init__(
+            cleaning_interval=cleaning_interval, min_ttl=min_ttl, *args, **kwargs
+        )
+
+
+class PrefetchLRUCache(
+    MinExpirationCacheBase, PrefetchCacheBase, EvictionPolicyCacheBase, LRUCache
+):
     pass
@@ -0,0 +1,194 @@
+"""Cache of `socket.getaddrinfo` results, in front of the patched resolver.
+
+`socket.getaddrinfo`, as patched by `override_system_resolver`, resolves
+the name and builds the address tuples on every call.  `GetAddrInfoCache`
+keeps the tuples for each host, family, type, proto and flags, so that
+repeated connections to the same host only cost a dictionary lookup.
+
+Results are kept until the earliest expiration of the cached answers they
+were built from, and at most `max_age` seconds, so that flushed answers and
+changed hosts files are seen soon after.  Results are only kept when the
+answers are in the resolver cache, and failures are not kept.
+"""
+import collections
+import socket
+import time
+
+try:
+    import threading as _threading
+except ImportError:  # pragma: no cover
+    import dummy_threading as _threading
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A, AAAA
+from dns.resolver import LRUCacheNode
+
+from .expiration import StaleEntry
+
+DEFAULT_SIZE = 1024
+DEFAULT_MAX_AGE = 10
+
+_FAMILY_RDTYPES = {
+    socket.AF_INET: [A],
+    socket.AF_INET6: [AAAA],
+    socket.AF_UNSPEC: [AAAA, A],
+}
+
+
+def _port_number(port):
+    """Return the port as an int, or None if it is a service name."""
+    if port is None:
+        return 0
+    if isinstance(port, int):
+        return port
+    try:
+        if port.isdigit():
+            return int(port)
+    except AttributeError:  # pragma: no cover
+        pass
+    return None
+
+
+def _peek(cache, key):
+    """Return the answer stored for `key`, without the side effects of
+    `cache.get`, such as counting a hit, moving it in the LRU order or
+    prefetching it.
+    """
+    # The read-only layer of dns_cache.persistence._LayeredCache, and L1 of
+    # dns_cache.tiered.TieredCache, where answers just resolved are put
+    layers = (
+        getattr(cache, "_read_only_cache", None),
+        getattr(cache, "l1", None),
+        cache,
+    )
+    for layer in layers:
+        data = getattr(layer, "data", None)
+        if data is None:
+            continue
+        value = data.get(key)
+        if isinstance(value, LRUCacheNode):
+            value = value.value
+        if isinstance(value, StaleEntry):
+            value = value.answer
+        if value is not None:
+            return value
+    return None
+
+
+def _with_port(results, port):
+    return [
+        (family, type, proto, canonname, (sockaddr[0], port) + tuple(sockaddr[2:]))
+        for family, type, proto, canonname, sockaddr in results
+    ]
+
+
+class GetAddrInfoCache(object):
+    """Keep up to `size` results of `getaddrinfo`, which defaults to the
+    current `socket.getaddrinfo`.
+
+    Results for numeric ports are shared by all ports of the host.
+    """
+
+    def __init__(
+        self, resolver, getaddrinfo=None, size=DEFAULT_SIZE, max_age=DEFAULT_MAX_AGE
+    ):
+        self.resolver = resolver
+        self.size = size
+        self.max_age = max_age
+        self._getaddrinfo = getaddrinfo or socket.getaddrinfo
+        self._results = collections.OrderedDict()
+        self._lock = _threading.Lock()
+        self._replaced = None
+
+    def _expiration(self, host, family):
+        """Return the earliest expiration of the cached answers for `host`."""
+        cache = self.resolver.cache
+        rdtypes = _FAMILY_RDTYPES.get(family)
+        if not cache or not rdtypes:
+            return None
+
+        try:
+            name = from_text(host, None)
+            get_qnames_to_try = getattr(self.resolver, "_get_qnames_to_try", None)
+            if get_qnames_to_try:
+                # As resolve_name, which tries the first name first
+                qname = get_qnames_to_try(name, None)[0]
+            else:  # pragma: no cover
+                qname = from_text(host)
+        except Exception:
+            return None
+
+        expirations = []
+        for rdtype in rdtypes:
+            value = _peek(cache, (qname, rdtype, IN))
+            expiration = getattr(value, "expiration", None)
+            if expiration is not None:
+                expirations.append(expiration)
+
+        if not expirations:
+            return None
+        return min(min(expirations), time.time() + self.max_age)
+
+    def getaddrinfo(self, host=None, port=None, family=0, type=0, proto=0, flags=0):
+        if host is None or flags & socket.AI_NUMERICHOST:
+            return self._getaddrinfo(host, port, family, type, proto, flags)
+
+        port_number = _port_number(port)
+        if port_number is None:
+            key = (host, family, type, proto, flags, port)
+        else:
+            key = (host, family, type, proto, flags, None)
+
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._results[key]
+                entry = None
+
+        if entry is not None:
+            results = entry[1]
+        else:
+            results = self._getaddrinfo(
+                host, port if port_number is None else 0, family, type, proto, flags
+            )
+            expiration = self._expiration(host, family)
+            if expiration is not None:
+                with self._lock:
+                    self._results.pop(key, None)
+                    self._results[key] = (expiration, results)
+                    while len(self._results) > self.size:
+                        self._results.popitem(last=False)
+
+        if port_number is None:
+            return list(results)
+        return _with_port(results, port_number)
+
+    def gethostbyname(self, name):
+        results = self.getaddrinfo(
+            name, 0, socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP
+        )
+        return results[0][4][0]
+
+    def flush(self):
+        with self._lock:
+            self._results.clear()
+
+    def install(self):
+        """Replace `socket.getaddrinfo` and `socket.gethostbyname`.
+
+        `uninstall`, or `dns.resolver.restore_system_resolver`, restores them.
+        """
+        if self._replaced is None:
+            self._replaced = (socket.getaddrinfo, socket.gethostbyname)
+        socket.getaddrinfo = self.getaddrinfo
+        socket.gethostbyname = self.gethostbyname
+
+    def uninstall(self):
+        """Restore the functions replaced by `install`, if still installed."""
+        if self._replaced is None:
+            return
+        if socket.getaddrinfo == self.getaddrinfo:
+            socket.getaddrinfo, socket.gethostbyname = self._replaced
+        self._replaced = None
+        self.flush()
@@ -1,18 +1,30 @@
 from __future__ import absolute_import
 
+import io
+import os
 import os.path
 import sys
+import time
 from datetime import timedelta
 
+try:
+    import threading as _threading
+except ImportError:  # pragma: no cover
+    import dummy_threading as _threading
+
 from dns.name import from_text
 from dns.rdataclass import IN
 from dns.rdatatype import A, AAAA
 
 from dns.resolver import Cache
+from dns.rrset import RRset
 
-from reconfigure.configs import HostsConfig
+try:
+    from reconfigure.configs import HostsConfig
+except ImportError:  # pragma: no cover
+    HostsConfig = None
 
-from .dnspython import create_answer, create_simple_rrset
+from .dnspython import create_answer, create_rdata, create_simple_rrset
 from .expiration import NoExpirationCacheBase
 from .persistence import _DeserializeOnGetCacheBase
 
@@ -92,6 +104,9 @@ def _convert_entries(entries, expiration=None):
 
 
 def loads(filename=None):
+    if not HostsConfig:  # pragma: no cover
+        raise ImportError("reconfigure is required by HostsCache")
+
     if not filename:
         filename = guess_hosts_path()
 
@@ -123,3 +138,180 @@ class HostsCacheBase(_DeserializeOnGetCacheBase, NoExpirationCacheBase):
 class HostsCache(HostsCacheBase, Cache):
     def __init__(self, *args, **kwargs):
         super(HostsCache, self).__init__(*args, **kwargs)
+
+
+DEFAULT_CHECK_INTERVAL = 1
+
+
+def parse_hosts(filename):
+    """Return the addresses of each name in a hosts file.
+
+    The result is {rdtype: {name: address or [address, ...]}}, with
+    lowercase names without the final dot, and addresses in the order of
+    the file.  A list is only used for names with several addresses.
+    """
+    index = {A: {}, AAAA: {}}
+    with io.open(filename, encoding="utf-8", errors="replace") as f:
+        data = f.read()
+
+    for line in data.lower().splitlines():
+        if "#" in line:
+            line = line[:line.index("#")]
+        fields = line.split()
+        if len(fields) < 2:
+            continue
+
+        address = fields[0]
+        if ":" in address:
+            if "%" in address:
+                # Scoped addresses can not be used in answers
+                continue
+            names = index[AAAA]
+        elif "." in address:
+            names = index[A]
+        else:
+            continue
+
+        for name in fields[1:]:
+            if name[-1] == ".":
+                name = name.rstrip(".")
+            addresses = names.get(name)
+            if addresses is None:
+                names[name] = address
+            elif isinstance(addresses, list):
+                if address not in addresses:
+                    addresses.append(address)
+            elif addresses != address:
+                names[name] = [addresses, address]
+
+    return index
+
+
+def _file_state(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+class IndexedHostsCacheBase(NoExpirationCacheBase):
+    """Answer from hosts files, creating answers only for names looked up.
+
+    The files are parsed into an index of names and addresses on the first
+    `get`.  At most every `check_interval` seconds, the modification time
+    and size of each file is checked, and a changed file is parsed again,
+    dropping the answers created for names it had or has.  When a name is
+    in several files, the first file with the name is used.
+    """
+
+    def __init__(
+        self,
+        filename=None,
+        check_interval=DEFAULT_CHECK_INTERVAL,
+        *args,
+        **kwargs
+    ):
+        super(IndexedHostsCacheBase, self).__init__(*args, **kwargs)
+        if filename and not isinstance(filename, (list, tuple)):
+            filename = [filename]
+        self.filenames = filename
+        self.check_interval = check_interval
+        self._reload_lock = _threading.Lock()
+        self._next_check = 0
+        self._file_states = {}
+        self._indexes = {}
+        self._created = {}
+
+    def _maybe_reload(self):
+        now = time.time()
+        if now < self._next_check:
+            return
+
+        with self._reload_lock:
+            if now < self._next_check:
+                return
+            if not self.filenames:
+                self.filenames = [guess_hosts_path()]
+
+            for filename in self.filenames:
+                state = _file_state(filename)
+                if filename in self._indexes and state == self._file_states[filename]:
+                    continue
+
+                old_index = self._indexes.get(filename)
+                if state is None:
+                    index = {A: {}, AAAA: {}}
+                else:
+                    index = parse_hosts(filename)
+                self._indexes[filename] = index
+                self._file_states[filename] = state
+                if old_index is not None:
+                    self._drop_created(old_index, index)
+
+            self._next_check = now + self.check_interval
+
+    def _drop_created(self, old_index, index):
+        for name in list(self._created):
+            if any(
+                name in names
+                for changed_index in (old_index, index)
+                for names in changed_index.values()
+            ):
+                for key in self._created.pop(name):
+                    super(IndexedHostsCacheBase, self).flush(key)
+
+    def _lookup(self, name, rdtype):
+        for filename in self.filenames:
+            index = self._indexes.get(filename)
+            if index is None:
+                continue
+            addresses = index[rdtype].get(name)
+            if addresses is not None:
+                if not isinstance(addresses, list):
+                    addresses = [addresses]
+                return addresses
+        return None
+
+    def _create_answer(self, key):
+        qname, rdtype, rdclass = key
+        if rdclass != IN or rdtype not in (A, AAAA):
+            return None
+
+        name = qname.to_text(omit_final_dot=True).lower()
+        addresses = self._lookup(name, rdtype)
+        if not addresses:
+            return None
+
+        rrset = RRset(qname, rdclass, rdtype)
+        rrset.ttl = int(_year_in_seconds)
+        for address in addresses:
+            try:
+                rrset.add(create_rdata(address, rdtype, rdclass))
+            except Exception:
+                # Invalid addresses are ignored
+                continue
+        if not rrset:
+            return None
+
+        answer = create_answer(qname, rrset)
+        super(IndexedHostsCacheBase, self).put(key, answer)
+        self._created.setdefault(name, set()).add(key)
+        return answer
+
+    def get(self, key):
+        self._maybe_reload()
+        value = super(IndexedHostsCacheBase, self).get(key)
+        if value is None:
+            value = self._create_answer(key)
+        return value
+
+    def flush(self, key=None):
+        super(IndexedHostsCacheBase, self).flush(key)
+        if key is None:
+            self._created = {}
+
+
+class IndexedHostsCache(IndexedHostsCacheBase, Cache):
+    def __init__(self, *args, **kwargs):
+        super(IndexedHostsCache, self).__init__(*args, **kwargs)
@@ -1,4 +1,24 @@
-from dns.name import from_text
+import struct
+
+from dns.name import Name, from_text
+
+from peak.util.proxies import ObjectWrapper
+
+try:
+    text_type = unicode  # Python 2
+except NameError:
+    text_type = str
+
+# Decoded keys are kept for the keys seen most recently, such as by
+# repeated iteration of a store, as hashing the bytes is far cheaper than
+# creating the name.  Encoding is not memoized, as hashing a name costs
+# about as much as encoding it.
+DECODE_MEMO_SIZE = 4096
+
+_TYPE_CLASS = struct.Struct("!HH")
+_ROOT_LABEL = b"\x00"
+
+_decode_memo = {}
 
 
 def key_encode(key):
@@ -11,6 +31,56 @@ def key_decode(key):
     return (from_text(name, None), int(rdtype), int(rdclass))
 
 
+def binary_key_encode(key):
+    """Encode the key as the lowercased wire format name, followed by the
+    rdtype and rdclass as 16 bit integers.
+
+    Keys already encoded, such as by `key_encode`, are returned unchanged.
+    """
+    if not isinstance(key, tuple):
+        return key
+    name, rdtype, rdclass = key
+    if not isinstance(name, Name):
+        name = from_text(name)
+    return name.to_digestable() + _TYPE_CLASS.pack(rdtype, rdclass)
+
+
+def binary_key_decode(key):
+    """Decode a key encoded by `binary_key_encode`, or by `key_encode`.
+
+    Binary keys always contain the zero length of the root label, which the
+    names formatted by `key_encode` never contain, so keys without it are
+    decoded as string keys, which are `str` on Python 2.
+    """
+    if isinstance(key, text_type):
+        return key_decode(key)
+    if not isinstance(key, bytes):
+        key = bytes(key)
+
+    decoded = _decode_memo.get(key)
+    if decoded is not None:
+        return decoded
+    if _ROOT_LABEL not in key:
+        return key_decode(key.decode("ascii"))
+
+    lengths = bytearray(key)
+    labels = []
+    i = 0
+    while True:
+        length = lengths[i]
+        labels.append(key[i + 1:i + 1 + length])
+        i += 1 + length
+        if not length:
+            break
+    rdtype, rdclass = _TYPE_CLASS.unpack_from(key, i)
+    decoded = (Name(labels), rdtype, rdclass)
+
+    if len(_decode_memo) >= DECODE_MEMO_SIZE:
+        _decode_memo.clear()
+    _decode_memo[key] = decoded
+    return decoded
+
+
 class KeyTransformDictBase(object):
     def __contains__(self, key):
         if isinstance(key, tuple):
@@ -46,9 +116,11 @@ class KeyTransformDictBase(object):
         super(KeyTransformDictBase, self).__delitem__(key)
 
     def keys(self):
+        key_decode = self.key_decode
         return (key_decode(key) for key in super(KeyTransformDictBase, self).keys())
 
     def items(self):
+        key_decode = self.key_decode
         for key, value in super(KeyTransformDictBase, self).items():
             yield key_decode(key), value
 
@@ -60,3 +132,60 @@ class StringKeyDictBase(KeyTransformDictBase):
 
 class StringKeyDict(StringKeyDictBase, dict):
     pass
+
+
+class BinaryKeyDictBase(KeyTransformDictBase):
+    key_encode = staticmethod(binary_key_encode)
+    key_decode = staticmethod(binary_key_decode)
+
+
+class BinaryKeyDict(BinaryKeyDictBase, dict):
+    pass
+
+
+class StringKeyFallbackDict(ObjectWrapper):
+    """Wrap a store with binary keys, moving entries stored under the string
+    keys of `key_encode`, by earlier versions, to their binary keys when they
+    are looked up.
+
+    The store must accept keys already encoded, as `binary_key_encode` does.
+    """
+
+    def _move(self, key):
+        subject = self.__subject__
+        string_key = key_encode(key)
+        value = subject.get(string_key)
+        if value is not None:
+            subject[key] = value
+            try:
+                del subject[string_key]
+            except KeyError:
+                pass
+        return value
+
+    def get(self, key, default=None):
+        value = self.__subject__.get(key)
+        if value is None and isinstance(key, tuple):
+            value = self._move(key)
+        if value is None:
+            return default
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        if key in self.__subject__:
+            return True
+        return isinstance(key, tuple) and key_encode(key) in self.__subject__
+
+    def __delitem__(self, key):
+        try:
+            del self.__subject__[key]
+        except KeyError:
+            if not isinstance(key, tuple):
+                raise
+            del self.__subject__[key_encode(key)]
@@ -0,0 +1,210 @@
+"""LRU caches bounded by the estimated memory of their entries.
+
+`LRUCache` bounds the number of entries, however one answer may use a few
+kilobytes, and another with large TXT or DNSKEY rrsets over a hundred.
+`MemoryBoundedCacheBase` estimates the size of each entry when it is put,
+and evicts the least recently used entries to keep the total under
+`max_bytes`, or those chosen by the eviction `policy` of the cache.
+`usage()` and `current_bytes` report the estimated total.
+
+Sizes are estimated from the wire format of the response and the number of
+records, with figures measured with `tracemalloc` on CPython 3, so are
+approximate.  An answer cached under several keys, such as an answer
+injected for each name of a CNAME chain, is counted once.
+"""
+from dns.exception import DNSException
+from dns.resolver import Answer, LRUCache
+
+from .eviction import EvictionPolicyCacheBase
+from .expiration import StaleEntry
+from .pickle import PickableLRUCacheBase
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Estimated bytes used by a parsed answer, besides its records
+_ANSWER_SIZE = 2400
+# Estimated bytes used by each parsed record, besides its wire format
+_RDATA_SIZE = 200
+# Estimated bytes used by an answer kept in the wire format, besides it
+_WIRE_ANSWER_SIZE = 600
+# Estimated bytes used by an exception, besides any responses it holds
+_EXCEPTION_SIZE = 1000
+# Estimated bytes used by the key, the LRU node and the dict slot
+_ENTRY_SIZE = 300
+
+
+def _estimate_response_size(response):
+    try:
+        wire_size = len(response.to_wire())
+    except Exception:
+        wire_size = 512
+    rdatas = sum(
+        len(rrset)
+        for section in (response.answer, response.authority, response.additional)
+        for rrset in section
+    )
+    return _ANSWER_SIZE + wire_size + rdatas * _RDATA_SIZE
+
+
+def estimate_size(value):
+    """Return the estimated bytes used by a cached value."""
+    if isinstance(value, StaleEntry):
+        value = value.answer
+    wire = getattr(value, "__dict__", {}).get("_response_wire")
+    if wire is not None:
+        return _WIRE_ANSWER_SIZE + len(wire)
+    if isinstance(value, Answer):
+        return _estimate_response_size(value.response)
+    if isinstance(value, DNSException):
+        responses = getattr(value, "kwargs", {}).get("responses") or {}
+        return _EXCEPTION_SIZE + sum(
+            _estimate_response_size(response) for response in responses.values()
+        )
+    return _EXCEPTION_SIZE
+
+
+class _SizedData(dict):
+    """Dict of LRU nodes, keeping the estimated bytes of the entries.
+
+    Values shared by several nodes are counted once.
+    """
+
+    def __init__(self, estimate, data=None):
+        super(_SizedData, self).__init__()
+        self._estimate = estimate
+        self.bytes = 0
+        # id of value -> [estimated bytes, number of nodes]
+        self._values = {}
+        for key, node in (data or {}).items():
+            self[key] = node
+
+    def _add(self, node):
+        value_id = id(node.value)
+        entry = self._values.get(value_id)
+        if entry is None:
+            entry = self._values[value_id] = [self._estimate(node.value), 0]
+            self.bytes += entry[0]
+        entry[1] += 1
+        self.bytes += _ENTRY_SIZE
+
+    def _remove(self, node):
+        value_id = id(node.value)
+        entry = self._values[value_id]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._values[value_id]
+            self.bytes -= entry[0]
+        self.bytes -= _ENTRY_SIZE
+
+    def __setitem__(self, key, node):
+        old = self.get(key)
+        if old is not None:
+            self._remove(old)
+        super(_SizedData, self).__setitem__(key, node)
+        self._add(node)
+
+    def __delitem__(self, key):
+        node = self[key]
+        super(_SizedData, self).__delitem__(key)
+        self._remove(node)
+
+    def pop(self, key, *default):
+        if key not in self:
+            return super(_SizedData, self).pop(key, *default)
+        node = self[key]
+        del self[key]
+        return node
+
+    def clear(self):
+        super(_SizedData, self).clear()
+        self._values.clear()
+        self.bytes = 0
+
+
+class MemoryBoundedCacheBase(object):
+    """Evict the least recently used entries to keep the estimated bytes of
+    the entries under `max_bytes`, as well as the entries under `max_size`.
+
+    With `EvictionPolicyCacheBase`, the entries are those chosen by its
+    policy.  An entry larger than `max_bytes` is not kept.
+    """
+
+    def __init__(
+        self, max_bytes=DEFAULT_MAX_BYTES, estimate=estimate_size, *args, **kwargs
+    ):
+        super(MemoryBoundedCacheBase, self).__init__(*args, **kwargs)
+        self.max_bytes = max_bytes
+        self._estimate = estimate
+        self._wrap_data()
+
+    def _wrap_data(self):
+        with self.lock:
+            if not isinstance(self.data, _SizedData):
+                self.data = _SizedData(self._estimate, self.data)
+            self._evict()
+
+    def _evict(self):
+        data = self.data
+        policy = getattr(self, "_policy", None)
+        while data.bytes > self.max_bytes and data:
+            node = None
+            if policy is not None:
+                key = policy.evict()
+                if key is not None:
+                    node = data.get(key)
+                    if node is None:
+                        # Such as removed by the LRU cache
+                        continue
+            if node is None:
+                node = self.sentinel.prev
+                if policy is not None:
+                    policy.remove(node.key)
+            node.unlink()
+            del data[node.key]
+
+    @property
+    def current_bytes(self):
+        return self.data.bytes
+
+    def usage(self):
+        """Return the number of entries, and their estimated bytes."""
+        with self.lock:
+            return {
+                "entries": len(self.data),
+                "bytes": self.data.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def set_max_bytes(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def put(self, key, value):
+        super(MemoryBoundedCacheBase, self).put(key, value)
+        with self.lock:
+            self._evict()
+
+    def flush(self, key=None):
+        super(MemoryBoundedCacheBase, self).flush(key)
+        if key is None:
+            # The whole cache is flushed by replacing the data with a dict
+            self._wrap_data()
+
+
+class MemoryBoundedLRUCache(
+    MemoryBoundedCacheBase, EvictionPolicyCacheBase, LRUCache
+):
+    def __init__(self, *args, **kwargs):
+        super(MemoryBoundedLRUCache, self).__init__(*args, **kwargs)
+
+
+class MemoryBoundedPickableLRUCache(
+    MemoryBoundedCacheBase, EvictionPolicyCacheBase, PickableLRUCacheBase, LRUCache
+):
+    def __init__(self, *args, **kwargs):
+        super(MemoryBoundedPickableLRUCache, self).__init__(*args, **kwargs)
+
+    def __setstate__(self, odict):
+        super(MemoryBoundedPickableLRUCache, self).__setstate__(odict)
+        self._wrap_data()
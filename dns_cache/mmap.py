@@ -0,0 +1,327 @@
+from __future__ import absolute_import
+
+import functools
+import mmap
+import os
+import struct
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+try:
+    import threading as _threading
+except ImportError:  # pragma: no cover
+    import dummy_threading as _threading
+
+try:
+    # Python 3 backport to Python 2.7
+    from pickle4 import pickle as pickle
+except ImportError:  # pragma: no cover
+    import pickle
+
+from dns.resolver import Cache
+
+from .key_transform import key_decode, key_encode
+from .wire import dumps, loads
+
+DEFAULT_SLOTS = 16384
+DEFAULT_SLOT_SIZE = 4096
+DEFAULT_PROBES = 8
+
+_MAGIC = b"DNSCACHE"
+_VERSION = 1
+_FILE_HEADER = struct.Struct("<8sIII")
+_FILE_HEADER_SIZE = 64
+# sequence, expiration, key length, value length
+_SLOT_HEADER = struct.Struct("<IdHI")
+_SEQUENCE = struct.Struct("<I")
+
+_READ_RETRIES = 100
+
+
+class SharedMemoryDict(object):
+    """Fixed-slot hash table in a memory-mapped file.
+
+    Processes mapping the same file share the entries.  Writers are
+    serialised with a lock on the file, while readers do not lock, and
+    instead retry when the slot sequence number shows it was changed
+    during the read.  Each key may be stored in one of `probes` slots;
+    when all are used, the entry expiring first is replaced.
+    """
+
+    def __init__(
+        self,
+        filename,
+        slots=DEFAULT_SLOTS,
+        slot_size=DEFAULT_SLOT_SIZE,
+        probes=DEFAULT_PROBES,
+        serializer=functools.partial(pickle.dumps, protocol=pickle.HIGHEST_PROTOCOL),
+        deserializer=pickle.loads,
+    ):
+        self.filename = filename
+        self.probes = probes
+        self._serializer = serializer
+        self._deserializer = deserializer
+        self._lock = _threading.Lock()
+
+        self._fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock_file()
+        try:
+            header = os.read(self._fd, _FILE_HEADER.size)
+            if len(header) == _FILE_HEADER.size:
+                magic, version, slots, slot_size = _FILE_HEADER.unpack(header)
+                if magic != _MAGIC or version != _VERSION:
+                    raise ValueError("{} is not a DNS cache".format(filename))
+            else:
+                size = _FILE_HEADER_SIZE + slots * slot_size
+                os.ftruncate(self._fd, size)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(
+                    self._fd, _FILE_HEADER.pack(_MAGIC, _VERSION, slots, slot_size)
+                )
+        finally:
+            self._unlock_file()
+
+        self.slots = slots
+        self.slot_size = slot_size
+        self._map = mmap.mmap(self._fd, _FILE_HEADER_SIZE + slots * slot_size)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+            self._map = None
+
+    def _lock_file(self):
+        self._lock.acquire()
+        if fcntl:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+
+    def _unlock_file(self):
+        if fcntl:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+    def _offset(self, slot):
+        return _FILE_HEADER_SIZE + slot * self.slot_size
+
+    def _candidates(self, encoded_key):
+        start = zlib.crc32(encoded_key) & 0xFFFFFFFF
+        return [(start + i) % self.slots for i in range(self.probes)]
+
+    def _read_header(self, slot):
+        offset = self._offset(slot)
+        return _SLOT_HEADER.unpack_from(self._map, offset)
+
+    def _read(self, slot, encoded_key=None):
+        """Return (expiration, key, value bytes) of a slot, or None if empty.
+
+        When `encoded_key` is given, the value is only read if it matches.
+        """
+        offset = self._offset(slot)
+        data_offset = offset + _SLOT_HEADER.size
+        for i in range(_READ_RETRIES):
+            sequence, expiration, key_length, value_length = _SLOT_HEADER.unpack_from(
+                self._map, offset
+            )
+            if sequence % 2:
+                continue
+
+            if not key_length:
+                result = None
+            else:
+                key = self._map[data_offset:data_offset + key_length]
+                if encoded_key is not None and key != encoded_key:
+                    result = None
+                else:
+                    value_offset = data_offset + key_length
+                    value = self._map[value_offset:value_offset + value_length]
+                    result = (expiration, key, value)
+
+            if _SEQUENCE.unpack_from(self._map, offset)[0] == sequence:
+                return result
+
+        return None
+
+    def _write(self, slot, expiration, encoded_key, value):
+        offset = self._offset(slot)
+        sequence = _SEQUENCE.unpack_from(self._map, offset)[0]
+        _SEQUENCE.pack_into(self._map, offset, sequence + 1)
+
+        data_offset = offset + _SLOT_HEADER.size
+        if encoded_key:
+            self._map[data_offset:data_offset + len(encoded_key)] = encoded_key
+            value_offset = data_offset + len(encoded_key)
+            self._map[value_offset:value_offset + len(value)] = value
+
+        _SLOT_HEADER.pack_into(
+            self._map, offset, sequence + 1, expiration, len(encoded_key), len(value)
+        )
+        _SEQUENCE.pack_into(self._map, offset, sequence + 2)
+
+    def _find(self, encoded_key):
+        for slot in self._candidates(encoded_key):
+            entry = self._read(slot, encoded_key)
+            if entry is not None:
+                return slot, entry
+        return None, None
+
+    def _encode_key(self, key):
+        if isinstance(key, tuple):
+            key = key_encode(key)
+        return key.encode("utf-8")
+
+    def get(self, key, default=None):
+        slot, entry = self._find(self._encode_key(key))
+        if entry is None:
+            return default
+        return self._deserializer(entry[2])
+
+    def __getitem__(self, key):
+        slot, entry = self._find(self._encode_key(key))
+        if entry is None:
+            raise KeyError(key)
+        return self._deserializer(entry[2])
+
+    def __contains__(self, key):
+        slot, entry = self._find(self._encode_key(key))
+        return entry is not None
+
+    def __setitem__(self, key, value):
+        encoded_key = self._encode_key(key)
+        data = self._serializer(value)
+        expiration = getattr(value, "expiration", None) or 0.0
+
+        self._lock_file()
+        try:
+            if _SLOT_HEADER.size + len(encoded_key) + len(data) > self.slot_size:
+                # Too large to share; remove any older entry for the key
+                slot, entry = self._find(encoded_key)
+                if entry is not None:
+                    self._write(slot, 0.0, b"", b"")
+                return
+
+            target = None
+            earliest = None
+            for slot in self._candidates(encoded_key):
+                slot_expiration, key_length = self._read_header(slot)[1:3]
+                if not key_length:
+                    if target is None:
+                        target = slot
+                    continue
+                if self._read(slot, encoded_key) is not None:
+                    target = slot
+                    break
+                if earliest is None or slot_expiration < earliest[0]:
+                    earliest = (slot_expiration, slot)
+
+            if target is None:
+                target = earliest[1]
+
+            self._write(target, expiration, encoded_key, data)
+        finally:
+            self._unlock_file()
+
+    def __delitem__(self, key):
+        encoded_key = self._encode_key(key)
+        self._lock_file()
+        try:
+            slot, entry = self._find(encoded_key)
+            if entry is None:
+                raise KeyError(key)
+            self._write(slot, 0.0, b"", b"")
+        finally:
+            self._unlock_file()
+
+    def _entries(self):
+        for slot in range(self.slots):
+            entry = self._read(slot)
+            if entry is not None:
+                yield entry
+
+    def __len__(self):
+        return sum(1 for slot in range(self.slots) if self._read_header(slot)[2])
+
+    def __iter__(self):
+        return self.keys()
+
+    def keys(self):
+        for expiration, key, value in self._entries():
+            yield key_decode(key.decode("utf-8"))
+
+    def items(self):
+        for expiration, key, value in self._entries():
+            yield key_decode(key.decode("utf-8")), self._deserializer(value)
+
+    def clear(self):
+        self._lock_file()
+        try:
+            for slot in range(self.slots):
+                if self._read_header(slot)[2]:
+                    self._write(slot, 0.0, b"", b"")
+        finally:
+            self._unlock_file()
+
+    def purge(self, now=None):
+        """Remove expired entries, without deserializing them."""
+        if now is None:
+            now = time.time()
+        self._lock_file()
+        try:
+            for slot in range(self.slots):
+                expiration, key_length = self._read_header(slot)[1:3]
+                if key_length and expiration <= now:
+                    self._write(slot, 0.0, b"", b"")
+        finally:
+            self._unlock_file()
+
+
+class MmapCacheBase(object):
+    def __init__(
+        self,
+        filename,
+        slots=DEFAULT_SLOTS,
+        slot_size=DEFAULT_SLOT_SIZE,
+        probes=DEFAULT_PROBES,
+        serializer=None,
+        deserializer=None,
+        wire=False,
+        *args,
+        **kwargs
+    ):
+        super(MmapCacheBase, self).__init__(*args, **kwargs)
+        if wire:
+            serializer = serializer or dumps
+            deserializer = deserializer or loads
+        serializers = {}
+        if serializer:
+            serializers["serializer"] = serializer
+        if deserializer:
+            serializers["deserializer"] = deserializer
+        self.data = SharedMemoryDict(
+            filename, slots=slots, slot_size=slot_size, probes=probes, **serializers
+        )
+
+    def _maybe_clean(self):
+        now = time.time()
+        if self.next_cleaning <= now:
+            self.data.purge(now)
+            self.next_cleaning = now + self.cleaning_interval
+
+    def flush(self, key=None):
+        with self.lock:
+            if key is not None:
+                if key in self.data:
+                    del self.data[key]
+            else:
+                self.data.clear()
+                self.next_cleaning = time.time() + self.cleaning_interval
+
+
+class MmapCache(MmapCacheBase, Cache):
+    def __init__(self, *args, **kwargs):
+        super(MmapCache, self).__init__(*args, **kwargs)
@@ -40,7 +40,9 @@ class _LayeredCache(ObjectWrapper):
 
     def get(self, key):
         try:
-            return self._read_only_cache.get(key)
+            value = self._read_only_cache.get(key)
         except Exception:
-            pass
+            value = None
+        if value is not None:
+            return value
         return self._writable_cache.get(key)
@@ -1,5 +1,7 @@
 import collections
+import os
 import os.path
+import time
 
 try:
     import threading as _threading
@@ -14,6 +16,17 @@ except ImportError:  # pragma: no cover
 
 from dns.resolver import LRUCacheNode, Cache, LRUCache
 
+from .eviction import EvictionPolicyCacheBase
+from .wire import dumps, loads
+
+# State created again from the loaded entries
+_TRANSIENT_ATTRIBUTES = ("_policy", "_expiry_heap", "_expirations", "_expiry_counter")
+
+
+def _drop_transient(odict):
+    for name in _TRANSIENT_ATTRIBUTES:
+        odict.pop(name, None)
+
 
 class SelfPickle(object):
     def __init__(self, filename, *args, **kwargs):
@@ -25,31 +38,54 @@ class SelfPickle(object):
             self.__dict__.update(p.__dict__)
 
     def __del__(self):
+        if not getattr(self, "filename", None):
+            # Already saved, such as by atexit
+            return
         with open(self.filename, "wb") as f:
             pickle.dump(self, f)
         self.data = None
         self.filename = None
 
 
-class PickableCacheBase(SelfPickle):
+class WireSelfPickle(SelfPickle):
+    """Optionally store the values using the wire format."""
+
+    def __init__(self, filename, wire=False, *args, **kwargs):
+        self.wire = wire
+        super(WireSelfPickle, self).__init__(filename, *args, **kwargs)
+        # The loaded state has the setting used when it was stored
+        self.wire = wire
+
+
+class PickableCacheBase(WireSelfPickle):
     def __getstate__(self):
         odict = self.__dict__.copy()
+        if odict.get("wire"):
+            with self.lock:
+                odict["data"] = dict(
+                    (key, dumps(value)) for key, value in self.data.items()
+                )
+        _drop_transient(odict)
         del odict["lock"]
         return odict
 
     def __setstate__(self, odict):
         self.lock = _threading.Lock()
+        if odict.get("wire"):
+            odict["data"] = dict(
+                (key, loads(value)) for key, value in odict["data"].items()
+            )
         self.__dict__.update(odict)
 
 
-class PickableLRUCacheBase(SelfPickle):
+class PickableLRUCacheBase(WireSelfPickle):
     def _flatten_lru(self):
         new = collections.OrderedDict()
         try:
             self.lock.acquire()
             node = self.sentinel.next
             while node != self.sentinel:
-                new[node.key] = node.value
+                new[node.key] = dumps(node.value) if self.wire else node.value
                 node = node.next
         finally:
             self.lock.release()
@@ -58,6 +94,7 @@ class PickableLRUCacheBase(SelfPickle):
     def __getstate__(self):
         odict = self.__dict__.copy()
         odict["data"] = self._flatten_lru()
+        _drop_transient(odict)
         del odict["sentinel"]
         del odict["lock"]
         return odict
@@ -71,7 +108,10 @@ class PickableLRUCacheBase(SelfPickle):
         except TypeError:  # pragma: no cover
             flattened_lru = flattened_lru.items()
         data = odict["data"] = {}
+        wire = odict.get("wire")
         for key, value in flattened_lru:
+            if wire:
+                value = loads(value)
             # TODO: make more efficient
             node = LRUCacheNode(key, value)
             node.link_after(sentinel)
@@ -84,6 +124,185 @@ class PickableCache(PickableCacheBase, Cache):
         super(PickableCache, self).__init__(*args, **kwargs)
 
 
-class PickableLRUCache(PickableLRUCacheBase, LRUCache):
+class PickableLRUCache(EvictionPolicyCacheBase, PickableLRUCacheBase, LRUCache):
     def __init__(self, *args, **kwargs):
         super(PickableLRUCache, self).__init__(*args, **kwargs)
+
+
+DEFAULT_COMPACT_THRESHOLD = 100000
+
+
+def _replace(src, dst):
+    try:
+        os.replace(src, dst)
+    except AttributeError:  # pragma: no cover
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+def _read_records(filename):
+    """Return the (key, value) records in a file, and the end of the last.
+
+    A partial record at the end, left by a crash, is ignored.
+    """
+    records = []
+    end = 0
+    with open(filename, "rb") as f:
+        while True:
+            try:
+                record = pickle.load(f)
+            except Exception:
+                # EOFError, or any other error from a partial record
+                break
+            records.append(record)
+            end = f.tell()
+    return records, end
+
+
+class JournaledPickleBase(object):
+    """Persist the cache incrementally.
+
+    Each put and flush is appended to `<filename>.journal`, which is
+    replayed on load.  Puts of the value already stored under the key, such
+    as the repeated puts of AggressiveCachingResolver, are not recorded.
+    Once the journal has `compact_threshold` records, and on `close`, the
+    unexpired entries are written to `filename` as a snapshot, and the
+    journal is emptied, bounding both the load time and, with `fsync`, the
+    entries lost in a crash.  With `wire`, values are recorded in the wire
+    format.
+    """
+
+    def __init__(
+        self,
+        filename,
+        compact_threshold=DEFAULT_COMPACT_THRESHOLD,
+        fsync=False,
+        wire=False,
+        *args,
+        **kwargs
+    ):
+        super(JournaledPickleBase, self).__init__(*args, **kwargs)
+        self.filename = filename
+        self.wire = wire
+        self.journal_filename = filename + ".journal"
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self._journal_lock = _threading.Lock()
+        self._journal = None
+        self._journal_records = 0
+
+        self._load()
+        self._journal = open(self.journal_filename, "ab")
+
+    def _load(self):
+        now = time.time()
+        if os.path.exists(self.filename):
+            records, end = _read_records(self.filename)
+            self._restore(records, now)
+
+        if os.path.exists(self.journal_filename):
+            records, end = _read_records(self.journal_filename)
+            self._restore(records, now)
+            self._journal_records = len(records)
+            # Drop any partial record, so appends follow the last whole one
+            with open(self.journal_filename, "ab") as f:
+                f.truncate(end)
+
+    def _restore(self, records, now):
+        for key, value in records:
+            if value is None:
+                super(JournaledPickleBase, self).flush(key)
+                continue
+            if isinstance(value, bytes):
+                value = loads(value)
+            if value.expiration > now:
+                super(JournaledPickleBase, self).put(key, value)
+
+    def _dump(self, key, value, f):
+        if self.wire and value is not None:
+            value = dumps(value)
+        pickle.dump((key, value), f, pickle.HIGHEST_PROTOCOL)
+
+    def _append(self, key, value):
+        with self._journal_lock:
+            if self._journal is None:
+                return
+            self._dump(key, value, self._journal)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._journal_records += 1
+
+        if self._journal_records >= self.compact_threshold:
+            self.compact()
+
+    def _items(self):
+        with self.lock:
+            entries = list(self.data.items())
+        for key, value in entries:
+            if isinstance(value, LRUCacheNode):
+                value = value.value
+            yield key, value
+
+    def put(self, key, value):
+        previous = self.data.get(key)
+        if isinstance(previous, LRUCacheNode):
+            previous = previous.value
+        super(JournaledPickleBase, self).put(key, value)
+        if value is not previous:
+            self._append(key, value)
+
+    def flush(self, key=None):
+        super(JournaledPickleBase, self).flush(key)
+        if key is None:
+            self.compact()
+        else:
+            self._append(key, None)
+
+    def compact(self):
+        """Write a snapshot of the unexpired entries, and empty the journal."""
+        with self._journal_lock:
+            if self._journal is None:
+                return
+
+            now = time.time()
+            temp_filename = self.filename + ".tmp"
+            with open(temp_filename, "wb") as f:
+                for key, value in self._items():
+                    if value.expiration > now:
+                        self._dump(key, value, f)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            _replace(temp_filename, self.filename)
+
+            self._journal.close()
+            self._journal = open(self.journal_filename, "wb")
+            self._journal_records = 0
+
+    def close(self):
+        """Compact the journal, and close it."""
+        if not hasattr(self, "_journal_lock"):
+            return
+        if self._journal_records:
+            self.compact()
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def __del__(self):
+        self.close()
+
+
+class JournaledPickableCache(JournaledPickleBase, Cache):
+    def __init__(self, *args, **kwargs):
+        super(JournaledPickableCache, self).__init__(*args, **kwargs)
+
+
+class JournaledPickableLRUCache(
+    EvictionPolicyCacheBase, JournaledPickleBase, LRUCache
+):
+    def __init__(self, *args, **kwargs):
+        super(JournaledPickableLRUCache, self).__init__(*args, **kwargs)
@@ -1,16 +1,51 @@
+import collections
+import copy
+import socket
 import time
 
-from dns.exception import DNSException
-from dns.name import from_text
+try:
+    import queue as _queue
+except ImportError:  # pragma: no cover
+    import Queue as _queue
+
+try:
+    import threading as _threading
+except ImportError:  # pragma: no cover
+    import dummy_threading as _threading
+
+from dns.exception import DNSException, Timeout
+from dns.name import NoParent, from_text
 from dns.rdataclass import IN
-from dns.rdatatype import A
-from dns.resolver import NXDOMAIN, Answer, NoMetaqueries, Resolver
+from dns.rdatatype import A, AAAA, ANY, CNAME, DNAME, SOA
+from dns.rdtypes.ANY.CNAME import CNAME as CNAMERdata
+from dns.rrset import RRset
+from dns.resolver import (
+    NXDOMAIN,
+    Answer,
+    NoAnswer,
+    NoMetaqueries,
+    NoNameservers,
+    Resolver,
+)
 from dns.version import MAJOR as _MAJOR, MINOR as _MINOR
 
+from peak.util.proxies import ObjectWrapper
+
 import dns_cache.expiration
 
 from .block import dnspython_resolver_socket_block
-from .dnspython import create_answer
+from .dnspython import (
+    InjectedAnswer,
+    RdataClass,
+    RdataType,
+    create_chained_answer,
+)
+from .getaddrinfo import _peek
+
+try:
+    from dns.resolver import HostAnswers
+except ImportError:  # pragma: no cover
+    HostAnswers = None
 
 try:
     from types import StringTypes
@@ -24,27 +59,239 @@ def _get_dnspython_version():
     return (_MAJOR, _MINOR)
 
 
-class AggressiveCachingResolver(Resolver):
-    # dnspython 2 introduced resolve
-    def resolve(self, qname, rdtype=A, rdclass=IN,
-                tcp=False, source=None, raise_on_no_answer=True, source_port=0,
-                lifetime=None, search=None):
-        assert self.cache
+# As used by dns.message.Message.resolve_chaining
+_MAX_CHAIN = 16
 
-        answer = super(AggressiveCachingResolver, self).resolve(
-            qname, rdtype, rdclass, tcp, source,
-            raise_on_no_answer, source_port, lifetime,
-        )
+
+def _find_cached_rrset(answer, name, rdtype, rdclass):
+    if not isinstance(answer, Answer) or isinstance(answer, NXAnswer):
+        return None
+    if isinstance(answer, InjectedAnswer):
+        # Without creating its response
+        return answer.rrset
+    try:
+        return answer.response.find_rrset(answer.response.answer, name, rdclass, rdtype)
+    except KeyError:
+        return None
+
+
+DEFAULT_CHAIN_INDEX_SIZE = 10000
+
+
+class CacheGetResolverBase(object):
+    def _cache_get(self, key):
+        """Look up `key` in the cache, for a lookup of the resolver.
+
+        `CoalescingResolverBase` overrides it to return the answer it has
+        already looked up for the key.
+        """
+        return self.cache.get(key)
+
+
+class AggressiveCachingResolverBase(CacheGetResolverBase):
+    """Cache every rrset of a response.
+
+    Answer section rrsets are cached under their own keys with the whole
+    answer.  Authority and additional rrsets, such as NS records and glue,
+    are cached as `InjectedAnswer`, which only creates its messages when
+    they are used, unless their key is already cached.  Answers are also
+    synthesized from cached CNAME and DNAME chains, whose owners are kept in
+    an index of up to `chain_index_size` names of each rdtype, so that the
+    cache is only searched for links which this resolver has cached.
+    """
+
+    chain_index_size = DEFAULT_CHAIN_INDEX_SIZE
+
+    def __init__(self, *args, **kwargs):
+        super(AggressiveCachingResolverBase, self).__init__(*args, **kwargs)
+        self._chain_index = {
+            CNAME: collections.OrderedDict(),
+            DNAME: collections.OrderedDict(),
+        }
+        self._chain_index_lock = _threading.Lock()
+
+    def _index_chain(self, entries):
+        """Index the owners of the CNAME and DNAME rrsets of `entries`, which
+        are pairs of an rrset and its expiration."""
+        with self._chain_index_lock:
+            for rrset, expiration in entries:
+                index = self._chain_index.get(rrset.rdtype)
+                if index is None:
+                    continue
+                key = (rrset.name, RdataClass.make(rrset.rdclass))
+                index.pop(key, None)
+                index[key] = expiration
+                while len(index) > self.chain_index_size:
+                    index.popitem(last=False)
+
+    def _is_chain_indexed(self, name, rdtype, rdclass):
+        key = (name, rdclass)
+        expiration = self._chain_index[rdtype].get(key)
+        if expiration is None:
+            return False
+        if expiration <= time.time():
+            with self._chain_index_lock:
+                self._chain_index[rdtype].pop(key, None)
+            return False
+        return True
+
+    def _has_indexed_dname(self, name, rdclass):
+        if not self._chain_index[DNAME]:
+            return False
+        while True:
+            try:
+                name = name.parent()
+            except NoParent:
+                return False
+            if self._is_chain_indexed(name, DNAME, rdclass):
+                return True
+
+    def _get_cached_rrset(self, name, rdtype, rdclass):
+        """Return a cached rrset, and the expiration of its answer."""
+        answer = self.cache.get((name, rdtype, rdclass))
+        rrset = _find_cached_rrset(answer, name, rdtype, rdclass)
+        if rrset is None:
+            return None, None
+        return rrset, answer.expiration
+
+    def _get_cached_dname(self, name, rdclass):
+        """Return a cached DNAME of a superdomain of `name` as CNAME rrsets."""
+        if not self._chain_index[DNAME]:
+            return None, None, None
+
+        owner = name
+        while True:
+            try:
+                owner = owner.parent()
+            except NoParent:
+                return None, None, None
+            if not self._is_chain_indexed(owner, DNAME, rdclass):
+                continue
+            dname, expiration = self._get_cached_rrset(owner, DNAME, rdclass)
+            if dname is not None:
+                break
+
+        try:
+            target = name.relativize(owner).concatenate(dname[0].target)
+        except Exception:
+            # Such as dns.name.NameTooLong
+            return None, None, None
+
+        # As the server would have synthesized (RFC 6672 section 3.4)
+        cname = RRset(name, rdclass, CNAME)
+        cname.update_ttl(dname.ttl)
+        cname.add(CNAMERdata(rdclass, CNAME, target))
+        return [dname, cname], target, expiration
+
+    def _synthesize_answer(self, qname, rdtype, rdclass):
+        """Assemble an answer from cached CNAME and DNAME chains.
+
+        None is returned unless every hop of the chain, and the rrset at the
+        end, are in the cache.
+        """
+        if rdtype in (CNAME, DNAME, ANY):
+            return None
+
+        name = qname
+        rrsets = []
+        expirations = []
+        for i in range(_MAX_CHAIN + 1):
+            if rrsets:
+                rrset, expiration = self._get_cached_rrset(name, rdtype, rdclass)
+                if rrset is not None:
+                    rrsets.append(rrset)
+                    expirations.append(expiration)
+                    answer = create_chained_answer(qname, rdtype, rdclass, rrsets)
+                    answer.expiration = min(expirations)
+                    return answer
+
+            cname = None
+            if self._is_chain_indexed(name, CNAME, rdclass):
+                cname, expiration = self._get_cached_rrset(name, CNAME, rdclass)
+            if cname is not None:
+                rrsets.append(cname)
+                name = cname[0].target
+            else:
+                dname_rrsets, name, expiration = self._get_cached_dname(name, rdclass)
+                if dname_rrsets is None:
+                    return None
+                rrsets.extend(dname_rrsets)
+            expirations.append(expiration)
+
+        return None
+
+    def _get_uncached_answer(self, qname, rdtype, rdclass):
+        """Return an answer made from chained rrsets.
+
+        None is returned if the answer is in the cache, which the resolver
+        will find, or can not be made without a query.  The cache is only
+        searched when there is an indexed chain for `qname`.
+        """
+        rdtype = RdataType.make(rdtype)
+        rdclass = RdataClass.make(rdclass)
+        if isinstance(qname, StringTypes):
+            qname = from_text(qname)
+        key = (qname, rdtype, rdclass)
+
+        if not (
+            self._is_chain_indexed(qname, CNAME, rdclass)
+            or self._has_indexed_dname(qname, rdclass)
+        ):
+            return None
+
+        if self._cache_get(key) is not None:
+            return None
+
+        answer = self._synthesize_answer(qname, rdtype, rdclass)
+        if answer is not None:
+            self.cache.put(key, answer)
+        return answer
+
+    def _cache_answer(self, answer, raise_on_no_answer=True):
         # Stuff extra responses into the cache
         rrsets = answer.response.answer
         assert not raise_on_no_answer or rrsets
 
         for rrset in rrsets:
             self.cache.put((rrset.name, rrset.rdtype, rrset.rdclass), answer)
+        self._index_chain((rrset, answer.expiration) for rrset in rrsets)
 
         self._inject(answer.response.authority)
         self._inject(answer.response.additional)
 
+    def _inject(self, rrsets):
+        if not rrsets:
+            return
+
+        now = time.time()
+        data = getattr(self.cache, "data", None)
+        entries = []
+        for rrset in rrsets:
+            answer = InjectedAnswer(rrset, now + rrset.ttl)
+            key = (answer.qname, answer.rdtype, answer.rdclass)
+            if data is None or key not in data:
+                self.cache.put(key, answer)
+            entries.append((rrset, answer.expiration))
+        self._index_chain(entries)
+
+
+class AggressiveCachingResolver(AggressiveCachingResolverBase, Resolver):
+    # dnspython 2 introduced resolve
+    def resolve(self, qname, rdtype=A, rdclass=IN,
+                tcp=False, source=None, raise_on_no_answer=True, source_port=0,
+                lifetime=None, search=None):
+        assert self.cache
+
+        answer = self._get_uncached_answer(qname, rdtype, rdclass)
+        if answer is not None:
+            return answer
+
+        answer = super(AggressiveCachingResolver, self).resolve(
+            qname, rdtype, rdclass, tcp, source,
+            raise_on_no_answer, source_port, lifetime,
+        )
+        self._cache_answer(answer, raise_on_no_answer)
+
         return answer
 
     if not DNSPYTHON_2:  # pragma: no cover
@@ -53,10 +300,14 @@ class AggressiveCachingResolver(Resolver):
     def query(self, qname, rdtype=A, rdclass=IN, **kwargs):
         assert self.cache
 
+        if not DNSPYTHON_2:  # pragma: no cover
+            answer = self._get_uncached_answer(qname, rdtype, rdclass)
+            if answer is not None:
+                return answer
+
         answer = super(AggressiveCachingResolver, self).query(
             qname, rdtype=rdtype, rdclass=rdclass, **kwargs
         )
-        # Stuff extra responses into the cache
         raise_on_no_answer = kwargs.get("raise_on_no_answer", True)
         rrsets = answer.response.answer
         assert not raise_on_no_answer or rrsets
@@ -65,24 +316,35 @@ class AggressiveCachingResolver(Resolver):
             # Extra caching was already done in .resolve
             return answer
 
-        for rrset in rrsets:
-            self.cache.put((rrset.name, rrset.rdtype, rrset.rdclass), answer)
-
-        self._inject(answer.response.authority)
-        self._inject(answer.response.additional)
+        self._cache_answer(answer, raise_on_no_answer)
 
         return answer
 
-    def _inject(self, rrsets):
-        for rrset in rrsets:
-            forged_answer = create_answer(rrset.name, rrset)
-            rdtype = forged_answer.rdtype
-            rdclass = forged_answer.rdclass
-            if (rrset.name, rdtype, rdclass) not in self.cache.data:
-                self.cache.put(
-                    (rrset.name, rdtype, rdclass),
-                    forged_answer
-                )
+
+def _negative_ttl(response, name=None):
+    """Return the negative caching TTL of a response (RFC 2308 section 5).
+
+    It is the smaller of the TTL and minimum of the SOA in the authority
+    section, preferring a SOA whose owner is a superdomain of `name`.
+    None is returned if there is no SOA.
+    """
+    soa = None
+    for rrset in response.authority:
+        if rrset.rdtype != SOA or not len(rrset):
+            continue
+        if soa is None or (name is not None and name.is_subdomain(rrset.name)):
+            soa = rrset
+    if soa is None:
+        return None
+    return min(soa.ttl, soa[0].minimum)
+
+
+def _nonexistent_name(qname, response):
+    # The last name of any CNAME chain is the name which does not exist
+    try:
+        return response.resolve_chaining().canonical_name
+    except Exception:
+        return qname
 
 
 class NXAnswer(Answer):
@@ -90,7 +352,10 @@ class NXAnswer(Answer):
         if _get_dnspython_version() >= (2, 0):  # pragma: nocover
             kwargs.pop("raise_on_no_answer")
         super(NXAnswer, self).__init__(*args, **kwargs)
-        self.expiration += dns_cache.expiration.MIN_TTL
+        ttl = _negative_ttl(self.response, self.qname)
+        if ttl is None:
+            ttl = dns_cache.expiration.MIN_TTL
+        self.expiration = time.time() + ttl
 
 
 def _get_nxdomain_exception_values(e):  # pragma: no cover
@@ -100,7 +365,83 @@ def _get_nxdomain_exception_values(e):  # pragma: no cover
         return e.kwargs["qnames"], e.kwargs["responses"]
 
 
-class ExceptionCachingResolver(Resolver):
+DEFAULT_NXDOMAIN_INDEX_SIZE = 10000
+
+
+class ExceptionCachingResolverBase(CacheGetResolverBase):
+    """Cache lookup failures.
+
+    Names which do not exist are also kept in an index of up to
+    `nxdomain_index_size` names, so that names below them, of any rdtype,
+    fail without a query (RFC 8020).
+    """
+
+    nxdomain_index_size = DEFAULT_NXDOMAIN_INDEX_SIZE
+
+    def __init__(self, *args, **kwargs):
+        super(ExceptionCachingResolverBase, self).__init__(*args, **kwargs)
+        self._nxdomain_index = collections.OrderedDict()
+        self._nxdomain_index_lock = _threading.Lock()
+
+    def _find_nxdomain(self, qname, rdclass):
+        if not self._nxdomain_index:
+            return None
+
+        now = time.time()
+        name = qname
+        with self._nxdomain_index_lock:
+            while True:
+                answer = self._nxdomain_index.get((name, rdclass))
+                if answer is not None:
+                    if answer.expiration > now:
+                        return answer
+                    del self._nxdomain_index[(name, rdclass)]
+                try:
+                    name = name.parent()
+                except NoParent:
+                    return None
+
+    def _index_nxdomain(self, name, rdclass, answer):
+        key = (name, rdclass)
+        with self._nxdomain_index_lock:
+            self._nxdomain_index.pop(key, None)
+            self._nxdomain_index[key] = answer
+            while len(self._nxdomain_index) > self.nxdomain_index_size:
+                self._nxdomain_index.popitem(last=False)
+
+    def _raise_cached_exception(self, qname, rdtype, rdclass):
+        answer = self._cache_get(
+            (qname, RdataType.make(rdtype), RdataClass.make(rdclass))
+        )
+        if answer is None:
+            answer = self._find_nxdomain(qname, RdataClass.make(rdclass))
+        if answer is not None:
+            if isinstance(answer, NXAnswer):
+                raise NXDOMAIN(qnames=[qname], responses={qname: answer.response})
+            elif isinstance(answer, DNSException):
+                raise answer
+
+    def _cache_exception(self, e, qname, rdtype, rdclass):
+        if isinstance(e, NXDOMAIN):
+            qnames, responses = _get_nxdomain_exception_values(e)
+            for _qname, response in responses.items():
+                answer = NXAnswer(
+                    _qname, rdtype, rdclass, response, raise_on_no_answer=False
+                )
+                self.cache.put((_qname, rdtype, rdclass), answer)
+                self._index_nxdomain(
+                    _nonexistent_name(_qname, response),
+                    RdataClass.make(rdclass),
+                    answer,
+                )
+
+        else:
+            now = time.time()
+            e.expiration = now + dns_cache.expiration.MIN_TTL
+            self.cache.put((qname, rdtype, rdclass), e)
+
+
+class ExceptionCachingResolver(ExceptionCachingResolverBase, Resolver):
     # dnspython 2 introduced resolve
     def resolve(self, qname, rdtype=A, rdclass=IN,
                 tcp=False, source=None, raise_on_no_answer=True, source_port=0,
@@ -110,12 +451,7 @@ class ExceptionCachingResolver(Resolver):
         if isinstance(qname, StringTypes):
             qname = from_text(qname)
 
-        answer = self.cache.get((qname, rdtype, rdclass))
-        if answer is not None:
-            if isinstance(answer, NXAnswer):
-                raise NXDOMAIN(qnames=[qname], responses={qname: answer.response})
-            elif isinstance(answer, DNSException):
-                raise answer
+        self._raise_cached_exception(qname, rdtype, rdclass)
 
         try:
             return super(ExceptionCachingResolver, self).resolve(
@@ -137,12 +473,7 @@ class ExceptionCachingResolver(Resolver):
         if isinstance(qname, StringTypes):
             qname = from_text(qname)
 
-        answer = self.cache.get((qname, rdtype, rdclass))
-        if answer is not None:
-            if isinstance(answer, NXAnswer):
-                raise NXDOMAIN(qnames=[qname], responses={qname: answer.response})
-            elif isinstance(answer, DNSException):
-                raise answer
+        self._raise_cached_exception(qname, rdtype, rdclass)
 
         if DNSPYTHON_2:  # pragma: no cover
             return super(ExceptionCachingResolver, self).query(
@@ -159,16 +490,477 @@ class ExceptionCachingResolver(Resolver):
             self._cache_exception(e, qname, rdtype, rdclass)
             raise
 
-    def _cache_exception(self, e, qname, rdtype, rdclass):
-        if isinstance(e, NXDOMAIN):
-            qnames, responses = _get_nxdomain_exception_values(e)
-            for _qname, response in responses.items():
-                answer = NXAnswer(
-                    _qname, rdtype, rdclass, response, raise_on_no_answer=False
-                )
-                self.cache.put((_qname, rdtype, rdclass), answer)
 
-        else:
+class _InFlightCall(object):
+    def __init__(self):
+        self.event = _threading.Event()
+        self.answer = None
+        self.exception = None
+
+
+class CoalescingResolverBase(CacheGetResolverBase):
+    """Share one upstream lookup between concurrent identical requests.
+
+    The first caller for a key missing from the cache performs the lookup,
+    and callers arriving before it completes wait for, and receive, the same
+    answer or exception.  Cache hits are not coalesced.
+
+    The answer looked up to decide is returned by `_cache_get` during the
+    call, so the other resolver bases do not look the key up again.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CoalescingResolverBase, self).__init__(*args, **kwargs)
+        self._in_flight = {}
+        self._in_flight_lock = _threading.Lock()
+        # The keys and answers looked up by the calls of each thread, of
+        # which the innermost is used, so nested lookups have their own
+        self._cache_lookups = _threading.local()
+
+    def _cache_get(self, key):
+        lookups = getattr(self._cache_lookups, "stack", None)
+        if lookups and lookups[-1][0] == key:
+            return lookups[-1][1]
+        return super(CoalescingResolverBase, self)._cache_get(key)
+
+    def _coalesce_miss(self, key, func, *args, **kwargs):
+        """Call `func` directly if `key` is cached, otherwise coalesced."""
+        # The key also has raise_on_no_answer, which changes the outcome
+        cache_key = key[:3]
+        answer = None
+        if self.cache:
+            answer = self.cache.get(cache_key)
+        lookups = self._cache_lookups.__dict__.setdefault("stack", [])
+        lookups.append((cache_key, answer))
+        try:
+            if answer is not None:
+                return func(*args, **kwargs)
+            return self._coalesce(key, func, *args, **kwargs)
+        finally:
+            lookups.pop()
+
+    def _coalesce(self, key, func, *args, **kwargs):
+        with self._in_flight_lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlightCall()
+
+        if not leader:
+            call.event.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.answer
+
+        try:
+            call.answer = func(*args, **kwargs)
+            return call.answer
+        except Exception as e:
+            call.exception = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            call.event.set()
+
+
+def _coalescing_key(qname, rdtype, rdclass, raise_on_no_answer):
+    if isinstance(qname, StringTypes):
+        qname = from_text(qname)
+    return (
+        qname, RdataType.make(rdtype), RdataClass.make(rdclass),
+        raise_on_no_answer,
+    )
+
+
+class CoalescingResolver(CoalescingResolverBase, Resolver):
+    # dnspython 2 introduced resolve
+    def resolve(self, qname, rdtype=A, rdclass=IN,
+                tcp=False, source=None, raise_on_no_answer=True, source_port=0,
+                lifetime=None, search=None):
+        key = _coalescing_key(qname, rdtype, rdclass, raise_on_no_answer)
+
+        return self._coalesce_miss(
+            key, super(CoalescingResolver, self).resolve,
+            qname, rdtype, rdclass, tcp, source,
+            raise_on_no_answer, source_port, lifetime,
+        )
+
+    if not DNSPYTHON_2:  # pragma: no cover
+        del resolve
+
+    def query(self, qname, rdtype=A, rdclass=IN, **kwargs):
+        if DNSPYTHON_2:  # pragma: no cover
+            # Coalescing is done in .resolve
+            return super(CoalescingResolver, self).query(
+                qname, rdtype=rdtype, rdclass=rdclass, **kwargs
+            )
+
+        key = _coalescing_key(
+            qname, rdtype, rdclass, kwargs.get("raise_on_no_answer", True)
+        )
+
+        return self._coalesce_miss(
+            key, super(CoalescingResolver, self).query,
+            qname, rdtype=rdtype, rdclass=rdclass, **kwargs
+        )
+
+
+class _RefreshCache(ObjectWrapper):
+    # Used by background refreshes, it always misses so the lookup goes
+    # upstream, and drops exceptions so that a failed refresh does not
+    # replace the answer already in the cache.
+
+    def get(self, key):
+        return None
+
+    def put(self, key, value):
+        if not isinstance(value, DNSException):
+            self.__subject__.put(key, value)
+
+
+def _cached_answer(answer, raise_on_no_answer):
+    # As dns.resolver.Resolver does for cache hits
+    if answer.rrset is None and raise_on_no_answer:
+        raise NoAnswer(response=answer.response)
+    return answer
+
+
+class BackgroundRefreshResolverBase(object):
+    def __init__(self, *args, **kwargs):
+        super(BackgroundRefreshResolverBase, self).__init__(*args, **kwargs)
+        self._refreshing = set()
+        self._refreshing_lock = _threading.Lock()
+
+    def _refresh(self, cls, key, **kwargs):
+        """Look up `key` upstream in a thread, using the resolvers after `cls`."""
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        refresher = copy.copy(self)
+        refresher.cache = _RefreshCache(self.cache)
+
+        thread = _threading.Thread(
+            target=self._run_refresh, args=(cls, refresher, key, kwargs)
+        )
+        thread.daemon = True
+        thread.start()
+
+    def _run_refresh(self, cls, refresher, key, kwargs):
+        qname, rdtype, rdclass = key
+        try:
+            if DNSPYTHON_2:
+                lookup = super(cls, refresher).resolve
+            else:  # pragma: no cover
+                lookup = super(cls, refresher).query
+            lookup(qname, rdtype, rdclass, **kwargs)
+        except Exception:
+            pass
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(key)
+
+
+class ServeStaleResolver(BackgroundRefreshResolverBase, Resolver):
+    """Serve stale answers from caches providing `get_stale`.
+
+    Within `stale_ttl` of expiring, the stale answer is returned immediately
+    and a refresh is performed in the background.  When upstream fails with
+    a timeout or no nameservers, answers within `serve_stale_ttl` of
+    expiring are returned instead of raising, as suggested by RFC 8767.
+    """
+
+    def _get_stale(self, key):
+        get_stale = getattr(self.cache, "get_stale", None)
+        if not get_stale:
+            return None
+        answer = get_stale(key)
+        if not isinstance(answer, Answer) or isinstance(answer, NXAnswer):
+            return None
+        return answer
+
+    def _serve_stale(self, cls, qname, rdtype, rdclass, lookup, **kwargs):
+        assert self.cache
+
+        if isinstance(qname, StringTypes):
+            qname = from_text(qname)
+
+        key = (qname, rdtype, rdclass)
+        raise_on_no_answer = kwargs.get("raise_on_no_answer", True)
+
+        answer = self._get_stale(key)
+        if answer is not None:
             now = time.time()
-            e.expiration = now + dns_cache.expiration.MIN_TTL
-            self.cache.put((qname, rdtype, rdclass), e)
+            if answer.expiration > now:
+                return _cached_answer(answer, raise_on_no_answer)
+            if answer.expiration + self.cache.stale_ttl > now:
+                self._refresh(cls, key, **kwargs)
+                return _cached_answer(answer, raise_on_no_answer)
+
+        try:
+            return lookup(qname, rdtype, rdclass, **kwargs)
+        except (Timeout, NoNameservers):
+            if answer is None:
+                raise
+            if answer.expiration + self.cache.serve_stale_ttl <= time.time():
+                raise
+            # Restore the entry, if the failure was cached, still expired
+            entry = dns_cache.expiration.StaleEntry(
+                answer,
+                answer.expiration
+                + max(self.cache.stale_ttl, self.cache.serve_stale_ttl),
+            )
+            self.cache.put(key, entry)
+            return _cached_answer(answer, raise_on_no_answer)
+
+    # dnspython 2 introduced resolve
+    def resolve(self, qname, rdtype=A, rdclass=IN,
+                tcp=False, source=None, raise_on_no_answer=True, source_port=0,
+                lifetime=None, search=None):
+        return self._serve_stale(
+            ServeStaleResolver, qname, rdtype, rdclass,
+            super(ServeStaleResolver, self).resolve,
+            tcp=tcp, source=source, raise_on_no_answer=raise_on_no_answer,
+            source_port=source_port, lifetime=lifetime,
+        )
+
+    if not DNSPYTHON_2:  # pragma: no cover
+        del resolve
+
+    def query(self, qname, rdtype=A, rdclass=IN, **kwargs):
+        if DNSPYTHON_2:  # pragma: no cover
+            # Stale answers are served by .resolve
+            return super(ServeStaleResolver, self).query(
+                qname, rdtype=rdtype, rdclass=rdclass, **kwargs
+            )
+
+        return self._serve_stale(
+            ServeStaleResolver, qname, rdtype, rdclass,
+            super(ServeStaleResolver, self).query, **kwargs
+        )
+
+
+class PrefetchingResolver(BackgroundRefreshResolverBase, Resolver):
+    """Refresh answers in the background when caches with `claim_prefetch`
+    report they are popular and close to expiring.
+    """
+
+    def _prefetch(self, cls, qname, rdtype, rdclass, lookup, **kwargs):
+        assert self.cache
+
+        if isinstance(qname, StringTypes):
+            qname = from_text(qname)
+
+        answer = lookup(qname, rdtype, rdclass, **kwargs)
+
+        claim_prefetch = getattr(self.cache, "claim_prefetch", None)
+        key = (qname, rdtype, rdclass)
+        if claim_prefetch and claim_prefetch(key, answer):
+            self._refresh(cls, key, **kwargs)
+
+        return answer
+
+    # dnspython 2 introduced resolve
+    def resolve(self, qname, rdtype=A, rdclass=IN,
+                tcp=False, source=None, raise_on_no_answer=True, source_port=0,
+                lifetime=None, search=None):
+        return self._prefetch(
+            PrefetchingResolver, qname, rdtype, rdclass,
+            super(PrefetchingResolver, self).resolve,
+            tcp=tcp, source=source, raise_on_no_answer=raise_on_no_answer,
+            source_port=source_port, lifetime=lifetime,
+        )
+
+    if not DNSPYTHON_2:  # pragma: no cover
+        del resolve
+
+    def query(self, qname, rdtype=A, rdclass=IN, **kwargs):
+        if DNSPYTHON_2:  # pragma: no cover
+            # Prefetching is done in .resolve
+            return super(PrefetchingResolver, self).query(
+                qname, rdtype=rdtype, rdclass=rdclass, **kwargs
+            )
+
+        return self._prefetch(
+            PrefetchingResolver, qname, rdtype, rdclass,
+            super(PrefetchingResolver, self).query, **kwargs
+        )
+
+
+def _answer_addresses(answer):
+    # dns_cache.wire.LazyAnswer provides them without parsing the response
+    if hasattr(type(answer), "addresses"):
+        return answer.addresses()
+    return [rdata.address for rdata in answer]
+
+
+if HostAnswers:
+
+    class CachedHostAnswers(HostAnswers):
+        """Host answers which do not parse lazily loaded answers."""
+
+        def addresses_and_families(self, family=socket.AF_UNSPEC):
+            if family == socket.AF_UNSPEC:
+                families = [socket.AF_INET6, socket.AF_INET]
+            else:
+                families = [family]
+            for address_family in families:
+                answer = self.get(AAAA if address_family == socket.AF_INET6 else A)
+                if answer is not None:
+                    for address in _answer_addresses(answer):
+                        yield (address, address_family)
+
+else:  # pragma: no cover
+    CachedHostAnswers = None
+
+
+class HostAnswersResolverBase(object):
+    """Answer `resolve_name`, used by `socket.getaddrinfo` after
+    `override_system_resolver`, directly from cached A and AAAA answers.
+    """
+
+    def _cached_host_answers(self, name, family, search=None, raise_on_no_answer=True):
+        if not self.cache or not CachedHostAnswers:
+            return None
+
+        if family == socket.AF_INET:
+            rdtypes = [A]
+        elif family == socket.AF_INET6:
+            rdtypes = [AAAA]
+        elif family == socket.AF_UNSPEC:
+            rdtypes = [AAAA, A]
+        else:  # pragma: no cover
+            return None
+
+        if isinstance(name, StringTypes):
+            name = from_text(name, None)
+        # Only the first name is used, as the others are tried after it fails
+        qname = self._get_qnames_to_try(name, search)[0]
+
+        answers = CachedHostAnswers()
+        for rdtype in rdtypes:
+            answer = self.cache.get((qname, rdtype, IN))
+            if not isinstance(answer, Answer) or isinstance(answer, NXAnswer):
+                return None
+            if not raise_on_no_answer or _answer_addresses(answer):
+                answers[rdtype] = answer
+
+        if not answers:
+            # Let the full lookup raise NoAnswer
+            return None
+        return answers
+
+    def resolve_name(self, name, family=socket.AF_UNSPEC, **kwargs):
+        answers = self._cached_host_answers(
+            name, family, kwargs.get("search"), kwargs.get("raise_on_no_answer", True)
+        )
+        if answers is not None:
+            return answers
+
+        return super(HostAnswersResolverBase, self).resolve_name(
+            name, family, **kwargs
+        )
+
+
+class HostAnswersResolver(HostAnswersResolverBase, Resolver):
+    pass
+
+
+DEFAULT_CONCURRENCY = 32
+
+
+class BulkResolverBase(object):
+    """Resolve many names, answering hits from the cache immediately and
+    looking up up to `concurrency` misses at a time.
+    """
+
+    concurrency = DEFAULT_CONCURRENCY
+
+    def _is_cached(self, qname, rdtype, rdclass):
+        if not self.cache:
+            return False
+        try:
+            if isinstance(qname, StringTypes):
+                qname = from_text(qname)
+        except DNSException:
+            # Let the lookup raise it
+            return True
+        key = (qname, RdataType.make(rdtype), RdataClass.make(rdclass))
+        # The lookup gets it again, so avoid counting a hit or moving it in
+        # the LRU order here
+        value = _peek(self.cache, key)
+        return value is not None and value.expiration > time.time()
+
+
+class BulkResolver(BulkResolverBase, Resolver):
+    def _lookup(self, qname, rdtype, rdclass, kwargs):
+        if DNSPYTHON_2:
+            lookup = self.resolve
+        else:  # pragma: no cover
+            lookup = self.query
+        try:
+            return lookup(qname, rdtype, rdclass, **kwargs)
+        except Exception as e:
+            return e
+
+    def _lookup_worker(self, tasks, results, stopped, rdtype, rdclass, kwargs):
+        while True:
+            qname = tasks.get()
+            if qname is None:
+                return
+            if stopped.is_set():
+                result = None
+            else:
+                result = self._lookup(qname, rdtype, rdclass, kwargs)
+            results.put((qname, result))
+
+    def resolve_many(self, qnames, rdtype=A, rdclass=IN, concurrency=None, **kwargs):
+        """Yield (qname, answer or exception) for each of `qnames`.
+
+        Names in the cache are yielded in the order given, while the
+        others are looked up by up to `concurrency` threads, and yielded
+        as they complete.  `qnames` is consumed as results are yielded,
+        so it may be a large iterator, such as the lines of a file.
+        """
+        concurrency = concurrency or self.concurrency
+        tasks = _queue.Queue(concurrency)
+        results = _queue.Queue()
+        stopped = _threading.Event()
+        workers = []
+        pending = 0
+
+        try:
+            for qname in qnames:
+                if self._is_cached(qname, rdtype, rdclass):
+                    yield qname, self._lookup(qname, rdtype, rdclass, kwargs)
+                else:
+                    if len(workers) < concurrency:
+                        worker = _threading.Thread(
+                            target=self._lookup_worker,
+                            args=(tasks, results, stopped, rdtype, rdclass, kwargs),
+                        )
+                        worker.daemon = True
+                        worker.start()
+                        workers.append(worker)
+                    tasks.put(qname)
+                    pending += 1
+
+                while pending:
+                    try:
+                        result = results.get_nowait()
+                    except _queue.Empty:
+                        break
+                    pending -= 1
+                    yield result
+
+            while pending:
+                result = results.get()
+                pending -= 1
+                yield result
+        finally:
+            # Names still queued are skipped when the caller stops early
+            stopped.set()
+            for worker in workers:
+                tasks.put(None)
@@ -0,0 +1,169 @@
+from dns.resolver import Cache, LRUCache
+
+from .expiration import (
+    MIN_TTL,
+    ExpiryHeapCache,
+    MinExpirationCacheBase,
+    NoExpirationCacheBase,
+)
+
+DEFAULT_SHARDS = 16
+
+
+class _ShardedData(object):
+    """Dict-like view of the data of all shards."""
+
+    def __init__(self, shards):
+        self._shards = shards
+
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def __contains__(self, key):
+        return key in self._shard(key).data
+
+    def __getitem__(self, key):
+        return self._shard(key).data[key]
+
+    def __setitem__(self, key, value):
+        self._shard(key).data[key] = value
+
+    def __delitem__(self, key):
+        del self._shard(key).data[key]
+
+    def __len__(self):
+        return sum(len(shard.data) for shard in self._shards)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def get(self, key, default=None):
+        return self._shard(key).data.get(key, default)
+
+    def keys(self):
+        for shard in self._shards:
+            for key in list(shard.data.keys()):
+                yield key
+
+    def items(self):
+        for shard in self._shards:
+            for item in list(shard.data.items()):
+                yield item
+
+
+class ShardedCacheBase(object):
+    """Spread keys over shards which each have their own lock.
+
+    Each shard is a complete dnspython cache, created as
+    `shard_class(**shard_kwargs)`, so threads working on keys in different
+    shards do not contend for a single lock.  The keyword arguments needed
+    by the sharded cache, such as `max_size`, are added to `shard_kwargs`.
+    """
+
+    shard_class = ExpiryHeapCache
+
+    def __init__(self, shards=DEFAULT_SHARDS, *args, **kwargs):
+        shard_class = kwargs.pop("shard_class", None)
+        shard_kwargs = kwargs.pop("shard_kwargs", None)
+        self._shards = []
+        self._shard_count = max(1, shards)
+        super(ShardedCacheBase, self).__init__(*args, **kwargs)
+        if shard_class is not None:
+            self.shard_class = shard_class
+        self._shard_kwargs = dict(self._default_shard_kwargs())
+        self._shard_kwargs.update(shard_kwargs or {})
+        self._shards[:] = [
+            self.shard_class(**self._shard_kwargs)
+            for i in range(self._shard_count)
+        ]
+        self.data = _ShardedData(self._shards)
+
+    def _default_shard_kwargs(self):
+        return {}
+
+    def _shard(self, key):
+        return self._shards[hash(key) % self._shard_count]
+
+    def _maybe_clean(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard._maybe_clean()
+
+    def get(self, key):
+        return self._shard(key).get(key)
+
+    def put(self, key, value):
+        self._shard(key).put(key, value)
+
+    def flush(self, key=None):
+        if key is not None:
+            self._shard(key).flush(key)
+        else:
+            for shard in self._shards:
+                shard.flush()
+
+    def reset_statistics(self):
+        for shard in self._shards:
+            shard.reset_statistics()
+
+    def hits(self):
+        return sum(shard.hits() for shard in self._shards)
+
+    def misses(self):
+        return sum(shard.misses() for shard in self._shards)
+
+    def get_statistics_snapshot(self):
+        snapshot = self._shards[0].get_statistics_snapshot()
+        for shard in self._shards[1:]:
+            statistics = shard.get_statistics_snapshot()
+            snapshot.hits += statistics.hits
+            snapshot.misses += statistics.misses
+        return snapshot
+
+
+class ShardedCache(ShardedCacheBase, Cache):
+    def _default_shard_kwargs(self):
+        return {"cleaning_interval": self.cleaning_interval}
+
+
+class ShardedLRUCache(ShardedCacheBase, LRUCache):
+
+    shard_class = LRUCache
+
+    def _default_shard_kwargs(self):
+        return {"max_size": self._shard_max_size()}
+
+    def _shard_max_size(self):
+        # Round up, so the total is at least max_size
+        return -(-self.max_size // self._shard_count)
+
+    def set_max_size(self, max_size):
+        super(ShardedLRUCache, self).set_max_size(max_size)
+        for shard in self._shards:
+            shard.set_max_size(self._shard_max_size())
+
+    def get_hits_for_key(self, key):
+        return self._shard(key).get_hits_for_key(key)
+
+
+class MinExpirationShardedCache(MinExpirationCacheBase, ShardedCache):
+    def __init__(self, cleaning_interval=None, min_ttl=None, *args, **kwargs):
+        if not min_ttl:
+            min_ttl = MIN_TTL
+        if not cleaning_interval:
+            cleaning_interval = max(MIN_TTL, min_ttl)
+        super(MinExpirationShardedCache, self).__init__(
+            cleaning_interval=cleaning_interval, min_ttl=min_ttl, *args, **kwargs
+        )
+
+
+class NoExpirationShardedCache(NoExpirationCacheBase, ShardedCache):
+    pass
+
+
+class MinExpirationShardedLRUCache(MinExpirationCacheBase, ShardedLRUCache):
+    pass
+
+
+class NoExpirationShardedLRUCache(NoExpirationCacheBase, ShardedLRUCache):
+    pass
@@ -0,0 +1,279 @@
+"""Cache stored in a SQLite database, shared by threads and processes.
+
+Unlike `SqliteDictCache`, which stores pickled entries under string keys,
+`SqliteCache` uses a table keyed by the name, rdtype and rdclass, with the
+expiration in an indexed column.  Lookups of expired entries are misses
+without reading the value, and expired entries are removed every
+`cleaning_interval` by one `DELETE`, instead of loading every entry.
+
+The database uses write-ahead logging, so readers do not block the writer,
+and each thread, and each process after a fork, has its own connection,
+which waits up to `timeout` seconds for locks held by other processes.
+The connection of a thread is closed when the thread ends.
+The statements are constant, so are prepared once per connection by the
+statement cache of `sqlite3`.
+"""
+from __future__ import absolute_import
+
+import os
+import re
+import sqlite3
+import time
+import weakref
+
+try:
+    import threading as _threading
+except ImportError:  # pragma: no cover
+    import dummy_threading as _threading
+
+try:
+    # Python 3 backport to Python 2.7
+    from pickle4 import pickle as pickle
+except ImportError:  # pragma: no cover
+    import pickle
+
+from dns.name import Name, from_text
+from dns.resolver import Cache
+
+from .wire import dumps, loads
+
+DEFAULT_TABLE = "dns"
+DEFAULT_TIMEOUT = 30.0
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS {table} ("
+    "name TEXT NOT NULL, rdtype INTEGER NOT NULL, rdclass INTEGER NOT NULL, "
+    "expiration REAL NOT NULL, value BLOB NOT NULL, "
+    "PRIMARY KEY (name, rdtype, rdclass)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS {table}_expiration ON {table} (expiration)",
+)
+
+_STATEMENTS = {
+    "get": (
+        "SELECT value, expiration FROM {table} "
+        "WHERE name = ? AND rdtype = ? AND rdclass = ?"
+    ),
+    "get_unexpired": (
+        "SELECT value FROM {table} "
+        "WHERE name = ? AND rdtype = ? AND rdclass = ? AND expiration > ?"
+    ),
+    "contains": (
+        "SELECT 1 FROM {table} WHERE name = ? AND rdtype = ? AND rdclass = ?"
+    ),
+    "put": (
+        "INSERT OR REPLACE INTO {table} "
+        "(name, rdtype, rdclass, expiration, value) VALUES (?, ?, ?, ?, ?)"
+    ),
+    "delete": "DELETE FROM {table} WHERE name = ? AND rdtype = ? AND rdclass = ?",
+    "delete_all": "DELETE FROM {table}",
+    "purge": "DELETE FROM {table} WHERE expiration <= ?",
+    "count": "SELECT COUNT(*) FROM {table}",
+    "keys": "SELECT name, rdtype, rdclass FROM {table}",
+    "items": "SELECT name, rdtype, rdclass, value FROM {table}",
+}
+
+
+def _key_columns(key):
+    name, rdtype, rdclass = key
+    if isinstance(name, Name):
+        name = name.to_text()
+    # Names compare without case
+    return (name.lower(), int(rdtype), int(rdclass))
+
+
+def _key(name, rdtype, rdclass):
+    return (from_text(name, None), rdtype, rdclass)
+
+
+class _ThreadConnection(object):
+    """The connection of a thread, kept only by the thread local storage, so
+    that it is closed when the thread ends and the storage is released."""
+
+    __slots__ = ("connection", "pid", "__weakref__")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.pid = os.getpid()
+
+
+class _SqliteData(object):
+    """Dict-like view of the entries of a `SqliteCacheBase`."""
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def __contains__(self, key):
+        return self._cache._fetchone("contains", _key_columns(key)) is not None
+
+    def __getitem__(self, key):
+        row = self._cache._fetchone("get", _key_columns(key))
+        if row is None:
+            raise KeyError(key)
+        return self._cache._loads(row[0])
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        self._cache._put(key, value)
+
+    def __delitem__(self, key):
+        if not self._cache._execute("delete", _key_columns(key)).rowcount:
+            raise KeyError(key)
+
+    def __len__(self):
+        return self._cache._fetchone("count")[0]
+
+    def __iter__(self):
+        return self.keys()
+
+    def keys(self):
+        for row in self._cache._execute("keys").fetchall():
+            yield _key(*row)
+
+    def items(self):
+        cache = self._cache
+        for name, rdtype, rdclass, value in cache._execute("items").fetchall():
+            yield _key(name, rdtype, rdclass), cache._loads(value)
+
+
+class SqliteCacheBase(object):
+    """Store the entries in the `table` of the SQLite database `filename`.
+
+    With `wire`, values are stored in the DNS wire format, using
+    `dns_cache.wire`, instead of pickled.
+    """
+
+    def __init__(
+        self,
+        filename,
+        table=DEFAULT_TABLE,
+        wire=False,
+        timeout=DEFAULT_TIMEOUT,
+        *args,
+        **kwargs
+    ):
+        if not re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", table):
+            raise ValueError("Invalid table name {!r}".format(table))
+        super(SqliteCacheBase, self).__init__(*args, **kwargs)
+        self.filename = filename
+        self.table = table
+        self.wire = wire
+        self.timeout = timeout
+        self._sql = dict(
+            (name, sql.format(table=table)) for name, sql in _STATEMENTS.items()
+        )
+        self._local = _threading.local()
+        # Weak, so only open connections of threads which have not ended
+        self._connections = weakref.WeakSet()
+        self._connections_lock = _threading.Lock()
+        # Connections of the parent process, left open for it
+        self._inherited = []
+
+        connection = self._connection()
+        for sql in _SCHEMA:
+            connection.execute(sql.format(table=table))
+        self.data = _SqliteData(self)
+
+    def _connection(self):
+        local = self._local
+        thread_connection = getattr(local, "connection", None)
+        if thread_connection is not None:
+            if thread_connection.pid == os.getpid():
+                return thread_connection.connection
+            self._inherited.append(thread_connection)
+
+        # Autocommit, so each statement is its own short transaction
+        connection = sqlite3.connect(
+            self.filename,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        thread_connection = local.connection = _ThreadConnection(connection)
+        with self._connections_lock:
+            self._connections.add(thread_connection)
+        return connection
+
+    def _execute(self, statement, parameters=()):
+        return self._connection().execute(self._sql[statement], parameters)
+
+    def _fetchone(self, statement, parameters=()):
+        return self._execute(statement, parameters).fetchone()
+
+    def _dumps(self, value):
+        if self.wire:
+            return sqlite3.Binary(dumps(value))
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def _loads(self, value):
+        if self.wire:
+            return loads(bytes(value))
+        return pickle.loads(bytes(value))
+
+    def _put(self, key, value):
+        self._execute(
+            "put", _key_columns(key) + (value.expiration, self._dumps(value))
+        )
+
+    def _count_lookup(self, hit):
+        statistics = getattr(self, "statistics", None)
+        if statistics is not None:
+            if hit:
+                statistics.hits += 1
+            else:
+                statistics.misses += 1
+
+    def _maybe_clean(self):
+        now = time.time()
+        if self.next_cleaning <= now:
+            self.purge_expired(now)
+            self.next_cleaning = time.time() + self.cleaning_interval
+
+    def purge_expired(self, now=None):
+        """Remove the expired entries, returning how many were removed."""
+        if now is None:
+            now = time.time()
+        return self._execute("purge", (now, )).rowcount
+
+    def get(self, key):
+        with self.lock:
+            self._maybe_clean()
+        row = self._fetchone("get_unexpired", _key_columns(key) + (time.time(), ))
+        self._count_lookup(row is not None)
+        if row is None:
+            return None
+        return self._loads(row[0])
+
+    def put(self, key, value):
+        with self.lock:
+            self._maybe_clean()
+        self._put(key, value)
+
+    def flush(self, key=None):
+        if key is not None:
+            self._execute("delete", _key_columns(key))
+        else:
+            self._execute("delete_all")
+            with self.lock:
+                self.next_cleaning = time.time() + self.cleaning_interval
+
+    def close(self):
+        """Close the connections of all threads."""
+        with self._connections_lock:
+            connections = list(self._connections) + self._inherited
+            self._connections = weakref.WeakSet()
+            self._inherited = []
+        for thread_connection in connections:
+            thread_connection.connection.close()
+        self._local = _threading.local()
+
+
+class SqliteCache(SqliteCacheBase, Cache):
+    def __init__(self, *args, **kwargs):
+        super(SqliteCache, self).__init__(*args, **kwargs)
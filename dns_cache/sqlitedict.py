@@ -1,10 +1,25 @@
 from __future__ import absolute_import
 
+import time
+
 from sqlitedict import SqliteDict
 
 from dns.resolver import Cache, LRUCache
 
-from .key_transform import StringKeyDictBase
+from .eviction import EvictionPolicyCacheBase
+from .expiration import ExpiringStoreCacheBase
+from .key_transform import (
+    BinaryKeyDictBase,
+    StringKeyDictBase,
+    binary_key_encode,
+    key_decode,
+)
+from .wire import dumps, loads
+from .write_behind import (
+    DEFAULT_WRITE_BEHIND_BATCH_SIZE,
+    DEFAULT_WRITE_BEHIND_INTERVAL,
+    WriteBehindDict,
+)
 
 
 class StringKeySqliteDict(StringKeyDictBase, SqliteDict):
@@ -13,20 +28,203 @@ class StringKeySqliteDict(StringKeyDictBase, SqliteDict):
         SqliteDict.__init__(self, *args, **kwargs)
 
 
+class BinaryKeySqliteDict(BinaryKeyDictBase, SqliteDict):
+    def __init__(self, *args, **kwargs):
+        # Skip BinaryKeyDictBase
+        SqliteDict.__init__(self, *args, **kwargs)
+
+
+class ExpiringSqliteDict(SqliteDict):
+    """`SqliteDict` keeping the expiration of each value in an indexed column
+    beside it, so that expired entries are missing without loading their
+    value, and `expire` removes them with one `DELETE`.
+    """
+
+    _STATEMENTS = {
+        "get": (
+            "SELECT value FROM {table} "
+            "WHERE key = ? AND (expiration IS NULL OR expiration > ?)"
+        ),
+        "contains": (
+            "SELECT 1 FROM {table} "
+            "WHERE key = ? AND (expiration IS NULL OR expiration > ?)"
+        ),
+        "put": "REPLACE INTO {table} (key, value, expiration) VALUES (?, ?, ?)",
+        "delete": "DELETE FROM {table} WHERE key = ?",
+        "set_expiration": "UPDATE {table} SET expiration = ? WHERE key = ?",
+        "unindexed": "SELECT key, value FROM {table} WHERE expiration IS NULL",
+        "count_expired": "SELECT COUNT(*) FROM {table} WHERE expiration <= ?",
+        "purge": "DELETE FROM {table} WHERE expiration <= ?",
+    }
+
+    def __init__(self, *args, **kwargs):
+        SqliteDict.__init__(self, *args, **kwargs)
+        table = '"{}"'.format(self.tablename)
+        self._sql = dict(
+            (name, sql.format(table=table)) for name, sql in self._STATEMENTS.items()
+        )
+
+        columns = [
+            row[1] for row in self.conn.select("PRAGMA table_info({})".format(table))
+        ]
+        if "expiration" not in columns:
+            self.conn.execute("ALTER TABLE {} ADD COLUMN expiration REAL".format(table))
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS "{}_expiration" ON {} (expiration)'.format(
+                self.tablename, table
+            )
+        )
+        # Index the entries stored without their expiration by earlier versions
+        unindexed = [
+            (self.decode(value).expiration, key)
+            for key, value in self.conn.select(self._sql["unindexed"])
+        ]
+        if unindexed:
+            self.conn.executemany(self._sql["set_expiration"], unindexed)
+        self.conn.commit()
+
+    def __contains__(self, key):
+        row = self.conn.select_one(self._sql["contains"], (key, time.time()))
+        return row is not None
+
+    def __getitem__(self, key):
+        row = self.conn.select_one(self._sql["get"], (key, time.time()))
+        if row is None:
+            raise KeyError(key)
+        return self.decode(row[0])
+
+    def __setitem__(self, key, value):
+        self.conn.execute(
+            self._sql["put"],
+            (key, self.encode(value), value.expiration),
+        )
+        if self.autocommit:
+            self.commit()
+
+    def __delitem__(self, key):
+        # Also delete expired entries, which are not `in` the dict
+        if not SqliteDict.__contains__(self, key):
+            raise KeyError(key)
+        self.conn.execute(self._sql["delete"], (key, ))
+        if self.autocommit:
+            self.commit()
+
+    def expire(self, now=None):
+        """Remove the entries expired at `now`, returning how many were removed."""
+        if now is None:
+            now = time.time()
+        count = self.conn.select_one(self._sql["count_expired"], (now, ))[0]
+        if count:
+            self.conn.execute(self._sql["purge"], (now, ))
+            self.conn.commit()
+        return count
+
+
+class ExpiringStringKeySqliteDict(StringKeyDictBase, ExpiringSqliteDict):
+    def __init__(self, *args, **kwargs):
+        # Skip StringKeyDictBase
+        ExpiringSqliteDict.__init__(self, *args, **kwargs)
+
+
+class ExpiringBinaryKeySqliteDict(BinaryKeyDictBase, ExpiringSqliteDict):
+    def __init__(self, *args, **kwargs):
+        # Skip BinaryKeyDictBase
+        ExpiringSqliteDict.__init__(self, *args, **kwargs)
+
+
+_DATA_CLASSES = {
+    (False, False): StringKeySqliteDict,
+    (False, True): BinaryKeySqliteDict,
+    (True, False): ExpiringStringKeySqliteDict,
+    (True, True): ExpiringBinaryKeySqliteDict,
+}
+
+
+def _encode_string_keys(data):
+    """Replace the string keys stored by earlier versions with binary keys."""
+    table = '"{}"'.format(data.tablename)
+    rows = [
+        (binary_key_encode(key_decode(key)), key)
+        for key, in data.conn.select(
+            "SELECT key FROM {} WHERE typeof(key) = 'text'".format(table)
+        )
+    ]
+    if rows:
+        data.conn.executemany(
+            "UPDATE OR REPLACE {} SET key = ? WHERE key = ?".format(table), rows
+        )
+        data.conn.commit()
+
+
+def _commit(data):
+    data.commit()
+
+
 class SqliteDictCacheBase(object):
+    """Store the entries in a `SqliteDict`.
+
+    With `binary_keys`, keys are stored in the compact encoding of
+    `dns_cache.key_transform.binary_key_encode`, and the string keys of an
+    existing database are converted when it is opened.
+
+    With `write_behind`, puts are not committed individually, and are
+    written in one transaction once `write_behind_batch_size` are pending,
+    or `write_behind_interval` seconds after the oldest, using
+    `dns_cache.write_behind.WriteBehindDict`.  Use `flush_pending` or
+    `close` to write them at shutdown.
+    """
 
     # String keys are needed pending https://github.com/RaRe-Technologies/sqlitedict/pull/74
 
-    def __init__(self, filename, autocommit=True, *args, **kwargs):
+    _expiring_store = False
+
+    def __init__(
+        self,
+        filename,
+        autocommit=True,
+        wire=False,
+        write_behind=False,
+        write_behind_batch_size=DEFAULT_WRITE_BEHIND_BATCH_SIZE,
+        write_behind_interval=DEFAULT_WRITE_BEHIND_INTERVAL,
+        binary_keys=False,
+        *args,
+        **kwargs
+    ):
         super(SqliteDictCacheBase, self).__init__(*args, **kwargs)
-        self.data = StringKeySqliteDict(filename, autocommit=autocommit)
+        serializers = {}
+        if wire:
+            serializers = dict(encode=dumps, decode=loads)
+        data_cls = _DATA_CLASSES[(self._expiring_store, binary_keys)]
+        self.data = data_cls(
+            filename, autocommit=autocommit and not write_behind, **serializers
+        )
+        if binary_keys:
+            _encode_string_keys(self.data)
+        if write_behind:
+            self.data = WriteBehindDict(
+                self.data,
+                commit=_commit,
+                batch_size=write_behind_batch_size,
+                interval=write_behind_interval,
+            )
+
+    def flush_pending(self):
+        """Write the puts pending with `write_behind`."""
+        flush_pending = getattr(self.data, "flush_pending", None)
+        if flush_pending:
+            flush_pending()
+
+    def close(self):
+        """Write any pending puts, and close the database."""
+        self.flush_pending()
+        self.data.close()
 
 
-class SqliteDictCache(SqliteDictCacheBase, Cache):
+class SqliteDictCache(ExpiringStoreCacheBase, SqliteDictCacheBase, Cache):
     def __init__(self, *args, **kwargs):
         super(SqliteDictCache, self).__init__(*args, **kwargs)
 
 
-class SqliteDictLRUCache(SqliteDictCacheBase, LRUCache):
+class SqliteDictLRUCache(EvictionPolicyCacheBase, SqliteDictCacheBase, LRUCache):
     def __init__(self, *args, **kwargs):
         super(SqliteDictLRUCache, self).__init__(*args, **kwargs)
@@ -2,12 +2,32 @@ from __future__ import absolute_import
 
 import os.path
 
+try:
+    # Python 3 backport to Python 2.7
+    from pickle4 import pickle as pickle
+except ImportError:  # pragma: no cover
+    import pickle
+
 from stash import Stash
 from stash.algorithms.core.base import Algorithm
 
 from dns.resolver import Cache, LRUCache
 
-from .key_transform import key_decode, key_encode
+from .eviction import EvictionPolicyCacheBase
+from .expiration import ExpiringStoreCacheBase, ExpiringValueDict
+from .key_transform import (
+    StringKeyFallbackDict,
+    binary_key_decode,
+    binary_key_encode,
+    key_decode,
+    key_encode,
+)
+from .wire import WireValueDict, dumps, loads
+from .write_behind import (
+    DEFAULT_WRITE_BEHIND_BATCH_SIZE,
+    DEFAULT_WRITE_BEHIND_INTERVAL,
+    WriteBehindDict,
+)
 
 
 class AlgorithmNone(Algorithm):
@@ -20,7 +40,30 @@ class AlgorithmNone(Algorithm):
         pass
 
 
+def _pickle_dumps(value):
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _commit(data):
+    # Write the batch from the stash cache to the archive
+    data.flush()
+
+
 class StashCacheBase(object):
+    """Store the entries in a `Stash`.
+
+    With `binary_keys`, keys are stored in the compact encoding of
+    `dns_cache.key_transform.binary_key_encode`.
+
+    With `write_behind`, puts are written to the stash once
+    `write_behind_batch_size` are pending, or `write_behind_interval`
+    seconds after the oldest, followed by one flush to the archive, using
+    `dns_cache.write_behind.WriteBehindDict`.  Use `flush_pending` or
+    `close` to write them at shutdown.
+    """
+
+    _expiring_store = False
+
     def __init__(
         self,
         filename=None,
@@ -28,6 +71,11 @@ class StashCacheBase(object):
         algorithm=AlgorithmNone,
         serializer="pickle:///?protocol=4",
         cache="memory:///",
+        wire=False,
+        write_behind=False,
+        write_behind_batch_size=DEFAULT_WRITE_BEHIND_BATCH_SIZE,
+        write_behind_interval=DEFAULT_WRITE_BEHIND_INTERVAL,
+        binary_keys=False,
         *args,
         **kwargs
     ):
@@ -42,20 +90,56 @@ class StashCacheBase(object):
         elif not archive.startswith("memory:") and archive.find("?") == -1:
             archive += "?table=dns"
 
+        key_transform = (key_encode, key_decode)
+        if binary_keys:
+            # Keys stored as strings by earlier versions are also decoded
+            key_transform = (binary_key_encode, binary_key_decode)
         self.data = Stash(
             archive,
             algorithm,
             serializer,
             cache,
-            key_transform=(key_encode, key_decode),
+            key_transform=key_transform,
         )
-
-
-class StashCache(StashCacheBase, Cache):
+        if binary_keys:
+            # Entries stored under string keys are moved when looked up
+            self.data = StringKeyFallbackDict(self.data)
+        if self._expiring_store:
+            # Values are serialized here, so the serializer of the stash only
+            # loads the expiration and bytes
+            if wire:
+                self.data = ExpiringValueDict(self.data, encode=dumps, decode=loads)
+            else:
+                self.data = ExpiringValueDict(
+                    self.data, encode=_pickle_dumps, decode=pickle.loads
+                )
+        elif wire:
+            self.data = WireValueDict(self.data)
+        if write_behind:
+            self.data = WriteBehindDict(
+                self.data,
+                commit=_commit,
+                batch_size=write_behind_batch_size,
+                interval=write_behind_interval,
+            )
+
+    def flush_pending(self):
+        """Write the puts pending with `write_behind`."""
+        flush_pending = getattr(self.data, "flush_pending", None)
+        if flush_pending:
+            flush_pending()
+
+    def close(self):
+        """Write any pending puts, and flush them to the archive."""
+        self.flush_pending()
+        self.data.flush()
+
+
+class StashCache(ExpiringStoreCacheBase, StashCacheBase, Cache):
     def __init__(self, *args, **kwargs):
         super(StashCache, self).__init__(*args, **kwargs)
 
 
-class StashLRUCache(StashCacheBase, LRUCache):
+class StashLRUCache(EvictionPolicyCacheBase, StashCacheBase, LRUCache):
     def __init__(self, *args, **kwargs):
         super(StashLRUCache, self).__init__(*args, **kwargs)
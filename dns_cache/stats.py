@@ -0,0 +1,484 @@
+"""Counters and latency histograms of caches and resolvers.
+
+`StatsCacheBase` counts hits, misses, negative hits, exception hits and
+evictions, and the latency of lookups.  `StatsResolverBase` records the
+latency of lookups, and of lookups which missed the cache and so went
+upstream, and counts injected rrsets, answers synthesized from cached
+chains, and names found below a nonexistent name.
+
+Both record by rdtype, into a shared `Stats`, which by default is the
+`stats` of the resolver cache.  A resolver may look up the cache several
+times for one lookup, so within a lookup of the resolver only the outcome
+of the first lookup of the cache is counted, once the resolver lookup
+completes.  `lookup_latency` records every lookup of the cache.
+
+`prometheus_text` and `StatsdExporter` export the values.
+"""
+import bisect
+import collections
+import socket
+import time
+
+try:
+    import threading as _threading
+except ImportError:  # pragma: no cover
+    import dummy_threading as _threading
+
+from dns.exception import DNSException
+from dns.rdataclass import IN
+from dns.rdatatype import A, to_text as rdatatype_to_text
+from dns.resolver import Cache, LRUCache, Resolver
+
+from .dnspython import RdataType
+from .eviction import EvictionPolicyCacheBase
+from .resolver import DNSPYTHON_2, NXAnswer, StringTypes
+
+try:
+    _timer = time.perf_counter
+except AttributeError:  # pragma: no cover
+    _timer = time.time
+
+# Seconds
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005,
+    0.01, 0.05, 0.1, 0.5, 1.0, 5.0,
+)
+
+DEFAULT_PREFIX = "dns_cache"
+DEFAULT_STATSD_PORT = 8125
+_STATSD_PACKET_SIZE = 1432
+
+
+def _rdtype_text(rdtype):
+    if rdtype is None:
+        return None
+    try:
+        return rdatatype_to_text(rdtype)
+    except Exception:  # pragma: no cover
+        return str(rdtype)
+
+
+def _key_rdtype(key):
+    try:
+        return key[1]
+    except (IndexError, KeyError, TypeError):  # pragma: no cover
+        return None
+
+
+class _Histogram(object):
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+
+
+class _Shard(object):
+    """The counters and histograms recorded by one thread."""
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = collections.defaultdict(int)
+        self.histograms = {}
+
+    def add(self, other, size):
+        for key, count in other.counters.copy().items():
+            self.counters[key] += count
+        for key, histogram in other.histograms.copy().items():
+            total = self.histograms.get(key)
+            if total is None:
+                total = self.histograms[key] = _Histogram(size)
+            total.add(histogram)
+
+
+class Stats(object):
+    """Thread-safe counters and histograms, each broken down by rdtype.
+
+    Each thread records into its own shard, without a lock, and the shards
+    are added together when read.  The shards of finished threads are merged
+    when another thread starts recording.
+
+    Histograms have cumulative `buckets` of seconds, as Prometheus expects.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._shards = []
+        self._retired = _Shard()
+        self._lock = _threading.Lock()
+        # The shard, and resolver lookup, of the current thread
+        self._local = _threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._retire_shards()
+                self._shards.append((_threading.current_thread(), shard))
+        return shard
+
+    def _retire_shards(self):
+        shards = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                shards.append((thread, shard))
+            else:
+                self._retired.add(shard, len(self.buckets) + 1)
+        self._shards = shards
+
+    def _total(self):
+        total = _Shard()
+        with self._lock:
+            total.add(self._retired, len(self.buckets) + 1)
+            for thread, shard in self._shards:
+                total.add(shard, len(self.buckets) + 1)
+        return total
+
+    def increment(self, name, rdtype=None, count=1):
+        self._shard().counters[(name, rdtype)] += count
+
+    def observe(self, name, rdtype, seconds, counter=None):
+        """Record `seconds` in a histogram, and increment `counter`."""
+        index = bisect.bisect_left(self.buckets, seconds)
+        shard = self._shard()
+        histogram = shard.histograms.get((name, rdtype))
+        if histogram is None:
+            histogram = shard.histograms[(name, rdtype)] = _Histogram(
+                len(self.buckets) + 1
+            )
+        histogram.counts[index] += 1
+        histogram.sum += seconds
+        histogram.count += 1
+        if counter:
+            shard.counters[(counter, rdtype)] += 1
+
+    def counters(self):
+        """Return {name: {rdtype text or None: count}}."""
+        result = {}
+        for (name, rdtype), count in self._total().counters.items():
+            result.setdefault(name, {})[_rdtype_text(rdtype)] = count
+        return result
+
+    def histograms(self):
+        """Return {name: {rdtype text: {"buckets", "sum", "count"}}}.
+
+        "buckets" is a list of (upper bound, cumulative count), ending with
+        infinity.
+        """
+        bounds = self.buckets + (float("inf"), )
+        result = {}
+        for (name, rdtype), histogram in self._total().histograms.items():
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            result.setdefault(name, {})[_rdtype_text(rdtype)] = {
+                "buckets": buckets,
+                "sum": histogram.sum,
+                "count": histogram.count,
+            }
+        return result
+
+    def snapshot(self):
+        return {"counters": self.counters(), "histograms": self.histograms()}
+
+    def reset(self):
+        with self._lock:
+            # Replaced rather than cleared, as other threads may be recording
+            self._retired = _Shard()
+            for thread, shard in self._shards:
+                shard.counters = collections.defaultdict(int)
+                shard.histograms = {}
+
+    # The resolver lookup of the current thread, used by StatsResolverBase,
+    # as the counter of its first cache lookup, and whether it was answered
+    # without going upstream
+
+    def _start_lookup(self):
+        outer = getattr(self._local, "lookup", None)
+        self._local.lookup = [None, False]
+        return outer
+
+    def _end_lookup(self, outer):
+        lookup = self._local.lookup
+        self._local.lookup = outer
+        return lookup
+
+    def _count_cache_lookup(self, counter):
+        """Return whether the resolver lookup in progress counts `counter`,
+        instead of the cache."""
+        lookup = getattr(self._local, "lookup", None)
+        if lookup is None:
+            return False
+        if lookup[0] is None:
+            lookup[0] = counter
+        return True
+
+    def _answered(self):
+        lookup = getattr(self._local, "lookup", None)
+        if lookup is not None:
+            lookup[1] = True
+
+
+class StatsCacheBase(object):
+    """Record lookups of a cache in `stats`.
+
+    Within a lookup of a resolver recording into the same `stats`, only the
+    first lookup of the cache is counted, by the resolver.
+
+    Evictions are counted for caches storing entries in a dict, such as
+    `dns.resolver.Cache` and `LRUCache`, as counting the entries of other
+    key stores may be slow.
+    """
+
+    def __init__(self, stats=None, *args, **kwargs):
+        super(StatsCacheBase, self).__init__(*args, **kwargs)
+        self.stats = stats or Stats()
+        self._count_evictions = type(self.__dict__.get("data")) is dict
+
+    def get(self, key):
+        stats = self.stats
+        before = len(self.data) if self._count_evictions else None
+        start = _timer()
+        value = super(StatsCacheBase, self).get(key)
+        elapsed = _timer() - start
+
+        if value is None:
+            counter = "misses"
+        elif isinstance(value, NXAnswer):
+            counter = "negative_hits"
+        elif isinstance(value, DNSException):
+            counter = "exception_hits"
+        else:
+            counter = "hits"
+        if stats._count_cache_lookup(counter):
+            counter = None
+        stats.observe("lookup_latency", _key_rdtype(key), elapsed, counter)
+
+        # Expired entries may be removed by the lookup
+        if before is not None and len(self.data) < before:
+            stats.increment("evictions", None, before - len(self.data))
+        return value
+
+    def put(self, key, value):
+        if not self._count_evictions:
+            return super(StatsCacheBase, self).put(key, value)
+
+        expected = len(self.data) + (key not in self.data)
+        super(StatsCacheBase, self).put(key, value)
+        if len(self.data) < expected:
+            self.stats.increment("evictions", None, expected - len(self.data))
+
+
+class StatsResolverBase(object):
+    """Record the latency of lookups in `stats`.
+
+    When the cache records into the same `stats`, such as caches with
+    `StatsCacheBase`, each lookup is also counted as a hit or miss of the
+    cache, and lookups which missed the cache and went upstream are also
+    recorded as upstream latency.
+    """
+
+    def __init__(self, *args, **kwargs):
+        stats = kwargs.pop("stats", None)
+        super(StatsResolverBase, self).__init__(*args, **kwargs)
+        self._stats = stats
+        self._own_stats = None
+
+    @property
+    def stats(self):
+        if self._stats is not None:
+            return self._stats
+        stats = getattr(self.cache, "stats", None)
+        if isinstance(stats, Stats):
+            return stats
+        if self._own_stats is None:
+            self._own_stats = Stats()
+        return self._own_stats
+
+    def _record(self, lookup, qname, rdtype, rdclass, *args, **kwargs):
+        stats = self.stats
+        outer = stats._start_lookup()
+        start = _timer()
+        try:
+            return lookup(qname, rdtype, rdclass, *args, **kwargs)
+        finally:
+            elapsed = _timer() - start
+            counter, answered = stats._end_lookup(outer)
+            if isinstance(rdtype, StringTypes):
+                rdtype = RdataType.make(rdtype)
+            stats.observe("resolve_latency", rdtype, elapsed, counter)
+            if counter == "misses" and not answered:
+                stats.observe("upstream_latency", rdtype, elapsed)
+
+    # Used by AggressiveCachingResolverBase and ExceptionCachingResolverBase
+
+    def _get_uncached_answer(self, qname, rdtype, rdclass):
+        answer = super(StatsResolverBase, self)._get_uncached_answer(
+            qname, rdtype, rdclass
+        )
+        if answer is not None:
+            # Answered without going upstream
+            self.stats._answered()
+            self.stats.increment("synthesized", RdataType.make(rdtype))
+        return answer
+
+    def _inject(self, rrsets):
+        super(StatsResolverBase, self)._inject(rrsets)
+        for rrset in rrsets:
+            self.stats.increment("injected", RdataType.make(rrset.rdtype))
+
+    def _find_nxdomain(self, qname, rdclass):
+        answer = super(StatsResolverBase, self)._find_nxdomain(qname, rdclass)
+        if answer is not None:
+            # Answered without going upstream
+            self.stats._answered()
+            self.stats.increment("nxdomain_index_hits", answer.rdtype)
+        return answer
+
+
+class StatsResolver(StatsResolverBase, Resolver):
+    # dnspython 2 introduced resolve
+    def resolve(self, qname, rdtype=A, rdclass=IN, *args, **kwargs):
+        return self._record(
+            super(StatsResolver, self).resolve, qname, rdtype, rdclass,
+            *args, **kwargs
+        )
+
+    if not DNSPYTHON_2:  # pragma: no cover
+        del resolve
+
+    def query(self, qname, rdtype=A, rdclass=IN, **kwargs):
+        if DNSPYTHON_2:  # pragma: no cover
+            # Recorded in .resolve
+            return super(StatsResolver, self).query(
+                qname, rdtype=rdtype, rdclass=rdclass, **kwargs
+            )
+
+        return self._record(  # pragma: no cover
+            super(StatsResolver, self).query, qname, rdtype, rdclass, **kwargs
+        )
+
+
+class StatsCache(StatsCacheBase, Cache):
+    pass
+
+
+class StatsLRUCache(StatsCacheBase, EvictionPolicyCacheBase, LRUCache):
+    pass
+
+
+def _label(rdtype, extra=""):
+    labels = []
+    if rdtype is not None:
+        labels.append('rdtype="{}"'.format(rdtype))
+    if extra:
+        labels.append(extra)
+    if not labels:
+        return ""
+    return "{" + ",".join(labels) + "}"
+
+
+def _format_bound(bound):
+    if bound == float("inf"):
+        return "+Inf"
+    return repr(float(bound))
+
+
+def prometheus_text(stats, prefix=DEFAULT_PREFIX):
+    """Return the values in the Prometheus text exposition format."""
+    lines = []
+    for name, values in sorted(stats.counters().items()):
+        metric = "{}_{}_total".format(prefix, name)
+        lines.append("# TYPE {} counter".format(metric))
+        for rdtype, count in sorted(values.items(), key=lambda item: str(item[0])):
+            lines.append("{}{} {}".format(metric, _label(rdtype), count))
+
+    for name, values in sorted(stats.histograms().items()):
+        metric = "{}_{}_seconds".format(prefix, name)
+        lines.append("# TYPE {} histogram".format(metric))
+        for rdtype, histogram in sorted(values.items(), key=lambda item: str(item[0])):
+            for bound, count in histogram["buckets"]:
+                lines.append("{}_bucket{} {}".format(
+                    metric,
+                    _label(rdtype, 'le="{}"'.format(_format_bound(bound))),
+                    count,
+                ))
+            lines.append("{}_sum{} {!r}".format(
+                metric, _label(rdtype), histogram["sum"]
+            ))
+            lines.append("{}_count{} {}".format(
+                metric, _label(rdtype), histogram["count"]
+            ))
+
+    return "\n".join(lines) + "\n"
+
+
+class StatsdExporter(object):
+    """Send the values to a StatsD server over UDP.
+
+    Counters, and the count and total milliseconds of histograms, are sent
+    as the change since the previous `send`.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_STATSD_PORT,
+                 prefix=DEFAULT_PREFIX):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._previous = {}
+        self._sock = None
+
+    def _metric(self, *parts):
+        return ".".join([self.prefix] + [str(part) for part in parts if part])
+
+    def lines(self, stats):
+        """Return the StatsD lines of the changes since the previous call."""
+        values = {}
+        for name, counts in stats.counters().items():
+            for rdtype, count in counts.items():
+                values[self._metric(name, rdtype)] = count
+        for name, histograms in stats.histograms().items():
+            for rdtype, histogram in histograms.items():
+                values[self._metric(name, rdtype, "count")] = histogram["count"]
+                values[self._metric(name, rdtype, "sum_ms")] = histogram["sum"] * 1000
+
+        lines = []
+        for metric, value in sorted(values.items()):
+            delta = value - self._previous.get(metric, 0)
+            if delta:
+                if isinstance(delta, float):
+                    delta = round(delta, 3)
+                lines.append("{}:{}|c".format(metric, delta))
+        self._previous = values
+        return lines
+
+    def send(self, stats):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        packet = []
+        size = 0
+        for line in self.lines(stats):
+            if packet and size + len(line) + 1 > _STATSD_PACKET_SIZE:
+                self._sock.sendto("\n".join(packet).encode("ascii"), self.address)
+                packet = []
+                size = 0
+            packet.append(line)
+            size += len(line) + 1
+        if packet:
+            self._sock.sendto("\n".join(packet).encode("ascii"), self.address)
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
@@ -0,0 +1,183 @@
+"""Cache in memory in front of a persistent cache.
+
+Persistent caches, such as `DiskCache`, `SqliteDictCache` and `StashCache`,
+read and deserialize the entry on every hit.  `TieredCache` keeps recently
+used entries in a bounded in-memory L1 cache, so that only L1 misses are
+looked up in the persistent L2 cache, and are then promoted into L1.
+
+Entries keep their expiration in both tiers, as the same value is put in
+both, and promoted entries are put in L1 as they were stored in L2.
+"""
+import atexit
+import weakref
+
+try:
+    import threading as _threading
+except ImportError:  # pragma: no cover
+    import dummy_threading as _threading
+
+from dns.resolver import LRUCache
+
+DEFAULT_L1_SIZE = 10000
+DEFAULT_WRITE_BEHIND_INTERVAL = 1.0
+DEFAULT_WRITE_BEHIND_BATCH_SIZE = 1000
+
+# Caches writing behind, which are closed at exit to write their pending puts
+_writing_behind = weakref.WeakSet()
+
+
+def _close_writing_behind():
+    for cache in list(_writing_behind):
+        cache.close()
+
+
+atexit.register(_close_writing_behind)
+
+
+def _write_behind(ref, wake):
+    """Write the pending puts of the cache referenced by `ref`, until it is
+    closed or garbage collected.
+
+    Only a weak reference is kept while waiting, so that the cache can be
+    garbage collected, which closes it.
+    """
+    while True:
+        cache = ref()
+        if cache is None or cache._closed:
+            return
+        interval = cache.interval
+        del cache
+
+        wake.wait(interval)
+        wake.clear()
+
+        cache = ref()
+        if cache is None:
+            return
+        try:
+            cache.flush_pending()
+        except Exception:
+            # The batch is lost, as entries are when evicted
+            pass
+        del cache
+
+
+class TieredCache(object):
+    """Look up `l1`, which defaults to an `LRUCache`, and then `l2`.
+
+    Puts are written to L2 immediately, or with `write_behind`, by a
+    background thread every `interval` seconds, or once `batch_size` puts
+    are pending.  Pending puts are seen by `get`, and are written by
+    `flush_pending` and `close`, which is called when the cache is garbage
+    collected, and at exit.
+
+    L1 should not change the expiration of entries, as `MinExpirationCache`
+    does, as promoted entries would then expire later than in L2.
+    """
+
+    def __init__(
+        self,
+        l2,
+        l1=None,
+        write_behind=False,
+        interval=DEFAULT_WRITE_BEHIND_INTERVAL,
+        batch_size=DEFAULT_WRITE_BEHIND_BATCH_SIZE,
+    ):
+        self.l1 = l1 if l1 is not None else LRUCache(max_size=DEFAULT_L1_SIZE)
+        self.l2 = l2
+        self.write_behind = write_behind
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._pending = {}
+        # Pending puts being written, which are still seen by get
+        self._writing = {}
+        self._pending_lock = _threading.Lock()
+        # Orders writes and flushes of L2
+        self._write_lock = _threading.Lock()
+        self._wake = _threading.Event()
+        self._writer = None
+        self._closed = False
+
+    @property
+    def min_ttl(self):
+        return getattr(self.l1, "min_ttl", None) or getattr(self.l2, "min_ttl", None)
+
+    def _get_pending(self, key):
+        with self._pending_lock:
+            value = self._pending.get(key)
+            if value is None:
+                value = self._writing.get(key)
+        return value
+
+    def get(self, key):
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+
+        if self._pending or self._writing:
+            value = self._get_pending(key)
+        if value is None:
+            value = self.l2.get(key)
+        if value is not None:
+            self.l1.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.l1.put(key, value)
+        if not self.write_behind or self._closed:
+            with self._write_lock:
+                self.l2.put(key, value)
+            return
+
+        with self._pending_lock:
+            self._pending[key] = value
+            full = len(self._pending) >= self.batch_size
+            if self._writer is None:
+                self._writer = _threading.Thread(
+                    target=_write_behind, args=(weakref.ref(self), self._wake)
+                )
+                self._writer.daemon = True
+                self._writer.start()
+                _writing_behind.add(self)
+        if full:
+            self._wake.set()
+
+    def flush_pending(self):
+        """Write the pending puts to L2."""
+        with self._write_lock:
+            with self._pending_lock:
+                self._writing, self._pending = self._pending, {}
+            try:
+                for key, value in self._writing.items():
+                    self.l2.put(key, value)
+            finally:
+                with self._pending_lock:
+                    self._writing = {}
+
+    def flush(self, key=None):
+        self.l1.flush(key)
+        with self._write_lock:
+            with self._pending_lock:
+                if key is None:
+                    self._pending = {}
+                else:
+                    self._pending.pop(key, None)
+            self.l2.flush(key)
+
+    def close(self):
+        """Stop writing behind, and write the pending puts to L2."""
+        self._closed = True
+        _writing_behind.discard(self)
+        writer = self._writer
+        if writer is not None:
+            self._wake.set()
+            if writer is not _threading.current_thread():
+                writer.join()
+            self._writer = None
+        self.flush_pending()
+
+    def __del__(self):
+        if not hasattr(self, "_write_lock"):
+            return
+        self.close()
@@ -0,0 +1,295 @@
+"""Compact serialization of answers, using the DNS wire format.
+
+Answers are stored as the response wire format and the few attributes
+needed to rebuild them, instead of the pickled object graph of the
+response message.  Other values, such as cached exceptions, are pickled.
+
+Answers are loaded as `LazyAnswer`, which only parses the response when
+it is used, and can provide the addresses of A and AAAA answers without
+parsing it.
+"""
+import struct
+
+try:
+    # Python 3 backport to Python 2.7
+    from pickle4 import pickle as pickle
+except ImportError:  # pragma: no cover
+    import pickle
+
+from dns.ipv4 import inet_ntoa as ipv4_ntoa
+from dns.ipv6 import inet_ntoa as ipv6_ntoa
+from dns.message import from_wire as message_from_wire
+from dns.name import Name
+from dns.rdatatype import A, AAAA, CNAME, DNAME
+from dns.resolver import Answer
+
+from peak.util.proxies import ObjectWrapper
+
+from .dnspython import InjectedAnswer, RdataClass, RdataType
+from .expiration import StaleEntry
+from .resolver import DNSPYTHON_2, NXAnswer
+
+_WIRE = b"W"
+_PICKLE = b"P"
+
+_NXANSWER = 1
+
+# expiration, fresh expiration of a StaleEntry (NaN if absent), rdtype,
+# rdclass, flags
+_HEADER = struct.Struct("<ddHHB")
+
+# Message question and answer counts, and resource record header
+_COUNTS = struct.Struct("!HH")
+_RR_HEADER = struct.Struct("!HHIH")
+
+_ADDRESS_FORMATTERS = {
+    A: (4, ipv4_ntoa),
+    AAAA: (16, ipv6_ntoa),
+}
+
+# As used by dns.message.Message.resolve_chaining
+_MAX_CHAIN = 16
+_MAX_POINTERS = 256
+
+_MATERIALIZED_ATTRIBUTES = frozenset(
+    ["response", "nameserver", "port", "chaining_result", "canonical_name", "rrset"]
+)
+# Provided by Answer from the rrset
+_RRSET_ATTRIBUTES = frozenset(["name", "ttl", "covers"])
+
+
+def _read_name(wire, offset):
+    """Return the labels of a possibly compressed name, and its length.
+
+    `wire` is a bytearray.  Unlike `dns.name.from_wire`, the labels are
+    not validated.
+    """
+    labels = []
+    used = None
+    start = offset
+    for i in range(_MAX_POINTERS):
+        length = wire[offset]
+        if length >= 0xC0:
+            if used is None:
+                used = offset + 2 - start
+            offset = ((length & 0x3F) << 8) | wire[offset + 1]
+            continue
+        if not length:
+            if used is None:
+                used = offset + 1 - start
+            return tuple(labels), used
+        labels.append(bytes(wire[offset + 1:offset + 1 + length]))
+        offset += length + 1
+    raise ValueError("Too many compression pointers")
+
+
+def _lower(labels):
+    return tuple(label.lower() for label in labels)
+
+
+def _parse_addresses(wire, qname, rdtype, rdclass):
+    """Return the canonical name and addresses of an A or AAAA response.
+
+    Only the answer section is walked, following any CNAME chain.  None is
+    returned when the response needs the full parser, such as with DNAME.
+    """
+    length, formatter = _ADDRESS_FORMATTERS[rdtype]
+    wire = bytearray(wire)
+
+    try:
+        qdcount, ancount = _COUNTS.unpack_from(wire, 4)
+        offset = 12
+        for i in range(qdcount):
+            offset += _read_name(wire, offset)[1] + 4
+
+        records = []
+        for i in range(ancount):
+            owner, used = _read_name(wire, offset)
+            offset += used
+            rr_rdtype, rr_rdclass, ttl, rdlength = _RR_HEADER.unpack_from(
+                wire, offset
+            )
+            offset += _RR_HEADER.size
+            if rr_rdtype == DNAME:
+                return None
+            if rr_rdclass == rdclass:
+                records.append((_lower(owner), rr_rdtype, offset, rdlength))
+            offset += rdlength
+
+        name = qname
+        labels = _lower(qname.labels[:-1])
+        for i in range(_MAX_CHAIN + 1):
+            addresses = []
+            target = None
+            for owner, rr_rdtype, rdata_offset, rdlength in records:
+                if owner != labels:
+                    continue
+                if rr_rdtype == rdtype:
+                    if rdlength != length:
+                        return None
+                    addresses.append(
+                        formatter(bytes(wire[rdata_offset:rdata_offset + length]))
+                    )
+                elif rr_rdtype == CNAME:
+                    target = _read_name(wire, rdata_offset)[0]
+
+            if addresses or target is None:
+                return name, addresses
+            name = Name(target + (b"", ))
+            labels = _lower(target)
+    except (IndexError, ValueError, struct.error):
+        return None
+
+    return None
+
+
+class LazyAnswer(Answer):
+    """Answer which parses the response wire format only when it is used."""
+
+    def __init__(self, qname, rdtype, rdclass, response_wire, expiration):
+        self.qname = qname
+        self.rdtype = rdtype
+        self.rdclass = rdclass
+        self.expiration = expiration
+        self._response_wire = response_wire
+        self._addresses = None
+
+    def _materialize(self):
+        if "response" in self.__dict__:
+            return
+        expiration = self.expiration
+        response = message_from_wire(self._response_wire)
+        if DNSPYTHON_2:
+            Answer.__init__(self, self.qname, self.rdtype, self.rdclass, response)
+        else:  # pragma: no cover
+            Answer.__init__(
+                self, self.qname, self.rdtype, self.rdclass, response,
+                raise_on_no_answer=False,
+            )
+        self.expiration = expiration
+
+    def _parse(self):
+        if self._addresses is None and "response" not in self.__dict__:
+            if self.rdtype in _ADDRESS_FORMATTERS:
+                parsed = _parse_addresses(
+                    self._response_wire, self.qname, self.rdtype, self.rdclass
+                )
+                if parsed is not None:
+                    self.__dict__["canonical_name"], self._addresses = parsed
+        return self._addresses is not None
+
+    def __getattr__(self, attr):
+        if attr.startswith("__") or "_response_wire" not in self.__dict__:
+            raise AttributeError(attr)
+        if attr == "canonical_name" and self._parse():
+            return self.__dict__[attr]
+        if attr in _MATERIALIZED_ATTRIBUTES:
+            self._materialize()
+            if attr in self.__dict__:
+                return self.__dict__[attr]
+        elif attr in _RRSET_ATTRIBUTES:
+            self._materialize()
+            return super(LazyAnswer, self).__getattr__(attr)
+        raise AttributeError(attr)
+
+    def addresses(self):
+        """Return the addresses of an A or AAAA answer."""
+        if not self._parse():
+            self._addresses = [rdata.address for rdata in self]
+        return self._addresses
+
+
+_ANSWER_TYPES = (Answer, NXAnswer, LazyAnswer, InjectedAnswer)
+
+
+def _dumps_answer(answer, expiration=None):
+    if isinstance(answer, LazyAnswer):
+        response_wire = answer._response_wire
+    else:
+        response_wire = answer.response.to_wire()
+    flags = _NXANSWER if isinstance(answer, NXAnswer) else 0
+    if expiration is None:
+        expiration = answer.expiration
+        fresh_expiration = float("nan")
+    else:
+        fresh_expiration = answer.expiration
+
+    return b"".join([
+        _WIRE,
+        _HEADER.pack(
+            expiration, fresh_expiration,
+            answer.rdtype, answer.rdclass, flags,
+        ),
+        answer.qname.to_wire(),
+        response_wire,
+    ])
+
+
+def dumps(value):
+    answer, expiration = value, None
+    if isinstance(value, StaleEntry):
+        # Retained until the expiration of the entry
+        answer, expiration = value.answer, value.expiration
+    if type(answer) in _ANSWER_TYPES:
+        try:
+            return _dumps_answer(answer, expiration)
+        except Exception:  # pragma: no cover
+            # Responses which can not be rendered, such as when signed
+            pass
+    return _PICKLE + pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _loads_answer(data):
+    expiration, fresh_expiration, rdtype, rdclass, flags = _HEADER.unpack_from(
+        data, 1
+    )
+    rdtype = RdataType.make(rdtype)
+    rdclass = RdataClass.make(rdclass)
+    offset = 1 + _HEADER.size
+    labels, used = _read_name(bytearray(data[offset:offset + 255]), 0)
+    qname = Name(labels + (b"", ))
+    response_wire = data[offset + used:]
+
+    if flags & _NXANSWER:
+        answer = NXAnswer(
+            qname, rdtype, rdclass, message_from_wire(response_wire),
+            raise_on_no_answer=False,
+        )
+    else:
+        answer = LazyAnswer(qname, rdtype, rdclass, response_wire, expiration)
+
+    if fresh_expiration == fresh_expiration:
+        answer.expiration = fresh_expiration
+        return StaleEntry(answer, expiration)
+    answer.expiration = expiration
+    return answer
+
+
+def loads(data):
+    data = bytes(data)
+    if data[:1] == _WIRE:
+        return _loads_answer(data)
+    return pickle.loads(data[1:])
+
+
+class WireValueDict(ObjectWrapper):
+    """Wrap a dict-like store, serializing its values with `dumps`."""
+
+    def __getitem__(self, key):
+        return loads(self.__subject__[key])
+
+    def __setitem__(self, key, value):
+        self.__subject__[key] = dumps(value)
+
+    def set(self, key, value, *args, **kwargs):
+        return self.__subject__.set(key, dumps(value), *args, **kwargs)
+
+    def get(self, key, default=None):
+        value = self.__subject__.get(key)
+        if value is None:
+            return default
+        return loads(value)
+
+    def items(self):
+        for key, value in self.__subject__.items():
+            yield key, loads(value)
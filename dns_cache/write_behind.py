@@ -0,0 +1,164 @@
+"""Buffer the writes to a persistent key store, writing them in batches.
+
+Stores such as `SqliteDict` with `autocommit` commit each write, so the
+puts of a cache, including the rrsets injected by
+`AggressiveCachingResolver`, are limited by the rate of commits.
+`WriteBehindDict` keeps the writes pending, and writes them together,
+followed by one `commit`, once `batch_size` are pending, or on the first
+write `interval` seconds after the oldest pending write.  The interval is
+only checked by writes, so after the last write the pending writes remain
+pending until `flush_pending` or `close` is called.
+
+Lookups see the pending writes, including while they are being written,
+while iterating over the store, such as by `Cache._maybe_clean`, first
+writes them.
+"""
+import time
+
+try:
+    import threading as _threading
+except ImportError:  # pragma: no cover
+    import dummy_threading as _threading
+
+from peak.util.proxies import ObjectWrapper
+
+DEFAULT_WRITE_BEHIND_BATCH_SIZE = 1000
+DEFAULT_WRITE_BEHIND_INTERVAL = 5.0
+
+_DELETED = object()
+
+
+class WriteBehindDict(ObjectWrapper):
+    """Wrap a dict-like store, buffering its writes."""
+
+    _commit = None
+    _batch_size = None
+    _interval = None
+    _pending = None
+    _writing = None
+    _oldest = None
+    _lock = None
+
+    def __init__(
+        self,
+        subject,
+        commit=None,
+        batch_size=DEFAULT_WRITE_BEHIND_BATCH_SIZE,
+        interval=DEFAULT_WRITE_BEHIND_INTERVAL,
+    ):
+        super(WriteBehindDict, self).__init__(subject)
+        self._commit = commit
+        self._batch_size = batch_size
+        self._interval = interval
+        self._pending = {}
+        # Pending writes being written, which are still seen by lookups
+        self._writing = {}
+        self._lock = _threading.RLock()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def _write(self, key, value):
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.time()
+            self._pending[key] = value
+            if (
+                len(self._pending) >= self._batch_size
+                or time.time() - self._oldest >= self._interval
+            ):
+                self.flush_pending()
+
+    def flush_pending(self):
+        """Write the pending writes, and commit them."""
+        with self._lock:
+            if not self._pending:
+                return
+            # Lookups do not lock, so see the writes in one or the other
+            pending = self._writing = self._pending
+            self._pending = {}
+            subject = self.__subject__
+            try:
+                for key, value in pending.items():
+                    if value is _DELETED:
+                        try:
+                            del subject[key]
+                        except KeyError:
+                            pass
+                    else:
+                        subject[key] = value
+                if self._commit:
+                    self._commit(subject)
+            finally:
+                self._writing = {}
+
+    def close(self, *args, **kwargs):
+        """Write the pending writes, and close the store, if it has `close`."""
+        self.flush_pending()
+        close = getattr(self.__subject__, "close", None)
+        if close:
+            close(*args, **kwargs)
+
+    def _get_pending(self, key):
+        value = self._pending.get(key)
+        if value is None:
+            value = self._writing.get(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._write(key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._write(key, _DELETED)
+
+    def __getitem__(self, key):
+        value = self._get_pending(key)
+        if value is _DELETED:
+            raise KeyError(key)
+        if value is not None:
+            return value
+        return self.__subject__[key]
+
+    def get(self, key, default=None):
+        value = self._get_pending(key)
+        if value is _DELETED:
+            return default
+        if value is not None:
+            return value
+        return self.__subject__.get(key, default)
+
+    def __contains__(self, key):
+        value = self._get_pending(key)
+        if value is not None:
+            return value is not _DELETED
+        return key in self.__subject__
+
+    def __len__(self):
+        self.flush_pending()
+        return len(self.__subject__)
+
+    def __iter__(self):
+        self.flush_pending()
+        return iter(self.__subject__)
+
+    def keys(self):
+        self.flush_pending()
+        return self.__subject__.keys()
+
+    def items(self):
+        self.flush_pending()
+        return self.__subject__.items()
+
+    def values(self):
+        self.flush_pending()
+        return self.__subject__.values()
+
+    def clear(self):
+        with self._lock:
+            self._pending = {}
+            self.__subject__.clear()
+            if self._commit:
+                self._commit(self.__subject__)
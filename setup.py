@@ -31,7 +31,7 @@ setup(
     license="MIT",
     author_email="jayvdb@gmail.com",
     url='https://github.com/jayvdb/dns-cache',
-    packages=find_packages(exclude=["tests", "tests.*"]),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*", "tests", "tests.*"]),
     python_requires=">=2.7,!=3.0.*,!=3.1.*,!=3.2.*,!=3.3.*",
     install_requires=[
         "dnspython",
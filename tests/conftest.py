@@ -0,0 +1,13 @@
+collect_ignore = []
+
+try:
+    # dnspython 2 only, which requires Python 3.6
+    import dns.asyncresolver  # noqa: F401
+except ImportError:
+    collect_ignore.append("test_asyncresolver.py")
+
+try:
+    # The benchmarks use tracemalloc and time.perf_counter of Python 3
+    import tracemalloc  # noqa: F401
+except ImportError:
+    collect_ignore.append("test_benchmarks.py")
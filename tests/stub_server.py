@@ -0,0 +1,166 @@
+"""Local stub DNS server, for tests which do not need a live nameserver."""
+import socket
+import threading
+import time
+
+from dns.flags import AA, RA
+from dns.message import from_wire, make_response
+from dns.name import from_text
+from dns.rcode import NXDOMAIN
+from dns.rdataclass import IN
+from dns.rdatatype import A, AAAA, CNAME, NS, SOA
+from dns.rrset import from_text as rrset_from_text
+
+
+class StubServer(object):
+    """UDP nameserver answering from an in-memory set of records.
+
+    CNAME chains are followed, NS answers include glue in the additional
+    section, and NXDOMAIN/no data responses carry the zone SOA in the
+    authority section.  Every question received is recorded in `queries`.
+    """
+
+    def __init__(self, delay=0):
+        self.records = {}
+        self.queries = []
+        self.delay = delay
+        self.drop = False
+        self._lock = threading.Lock()
+        self._sock = None
+        self._thread = None
+
+    def add(self, name, ttl, rdtype, *values):
+        rrset = rrset_from_text(name, ttl, IN, rdtype, *values)
+        self.records[(rrset.name, rrset.rdtype)] = rrset
+        return rrset
+
+    def add_zone(self, origin, ttl=300, minimum=60):
+        self.add(
+            origin, ttl, SOA,
+            "ns1.{} hostmaster.{} 1 7200 900 1209600 {}".format(origin, origin, minimum)
+        )
+
+    @property
+    def port(self):
+        return self._sock.getsockname()[1]
+
+    def query_count(self, name=None, rdtype=None):
+        if name is not None:
+            name = from_text(name)
+        with self._lock:
+            return len([
+                query for query in self.queries
+                if (name is None or query[0] == name)
+                and (rdtype is None or query[1] == rdtype)
+            ])
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind(("127.0.0.1", 0))
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        sock, self._sock = self._sock, None
+        if sock:
+            sock.close()
+
+    def _serve(self):
+        while True:
+            sock = self._sock
+            if sock is None:
+                return
+            try:
+                wire, address = sock.recvfrom(65535)
+            except (OSError, socket.error):
+                return
+
+            if self.delay:
+                worker = threading.Thread(
+                    target=self._reply, args=(sock, wire, address)
+                )
+                worker.daemon = True
+                worker.start()
+            else:
+                self._reply(sock, wire, address)
+
+    def _reply(self, sock, wire, address):
+        request = from_wire(wire)
+        question = request.question[0]
+        with self._lock:
+            self.queries.append((question.name, question.rdtype))
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        if self.drop:
+            return
+
+        response = self.respond(request)
+        try:
+            sock.sendto(response.to_wire(), address)
+        except (OSError, socket.error):
+            pass
+
+    def _find_soa(self, name):
+        while True:
+            soa = self.records.get((name, SOA))
+            if soa is not None:
+                return soa
+            try:
+                name = name.parent()
+            except Exception:
+                return None
+
+    def _name_exists(self, name):
+        for owner, rdtype in self.records:
+            if owner == name or owner.is_subdomain(name):
+                return True
+        return False
+
+    def respond(self, request):
+        question = request.question[0]
+        response = make_response(request)
+        response.flags |= AA | RA
+
+        name = question.name
+        rdtype = question.rdtype
+        while True:
+            rrset = self.records.get((name, rdtype))
+            if rrset is not None:
+                response.answer.append(rrset)
+                break
+
+            cname = self.records.get((name, CNAME))
+            if cname is None:
+                break
+            response.answer.append(cname)
+            name = cname[0].target
+
+        if not response.answer or response.answer[-1].rdtype == CNAME:
+            if not self._name_exists(name):
+                response.set_rcode(NXDOMAIN)
+            soa = self._find_soa(name)
+            if soa is not None:
+                response.authority.append(soa)
+            return response
+
+        if rdtype == NS:
+            for rdata in response.answer[-1]:
+                for glue_rdtype in (A, AAAA):
+                    glue = self.records.get((rdata.target, glue_rdtype))
+                    if glue is not None:
+                        response.additional.append(glue)
+
+        return response
+
+
+def get_stub_resolver(cls, server, cache=None, lifetime=2):
+    resolver = cls(configure=False)
+    resolver.port = server.port
+    resolver.nameservers = ["127.0.0.1"]
+    resolver.lifetime = lifetime
+    resolver.cache = cache
+    return resolver
@@ -0,0 +1,155 @@
+"""Tests for the asyncio caching resolvers."""
+import asyncio
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A, CNAME, NS
+from dns.resolver import NXDOMAIN, Answer, Cache
+
+from dns_cache.asyncresolver import (
+    AggressiveCachingResolver,
+    BulkResolver,
+    ExceptionCachingResolver,
+    Resolver,
+)
+from dns_cache.resolver import NXAnswer
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class _TestStubServerBase(object):
+
+    resolver_cls = None
+
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.add("www.example.", 300, CNAME, "example.")
+        self.server.add("example.", 300, NS, "ns1.example.")
+        self.server.add("ns1.example.", 300, A, "192.0.2.53")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_test_resolver(self):
+        return get_stub_resolver(self.resolver_cls, self.server, cache=Cache())
+
+    def run_async(self, coro):
+        # asyncio.run requires Python 3.7
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+
+class TestAggressiveCachingResolver(_TestStubServerBase, unittest.TestCase):
+
+    resolver_cls = AggressiveCachingResolver
+
+    def test_hit_cname(self):
+        resolver = self.get_test_resolver()
+
+        q1 = self.run_async(resolver.resolve("www.example."))
+        assert q1.rrset[0].address == "192.0.2.1"
+
+        assert (from_text("www.example."), CNAME, IN) in resolver.cache.data
+        assert (from_text("example."), A, IN) in resolver.cache.data
+
+        q2 = self.run_async(resolver.resolve("www.example."))
+        assert q2 is q1
+
+        q3 = self.run_async(resolver.resolve("example."))
+        assert q3 is q1
+
+        assert self.server.query_count() == 1
+
+    def test_hit_additional(self):
+        resolver = self.get_test_resolver()
+
+        self.run_async(resolver.resolve("example.", NS))
+        assert (from_text("ns1.example."), A, IN) in resolver.cache.data
+
+        answer = self.run_async(resolver.resolve("ns1.example."))
+        assert answer.rrset[0].address == "192.0.2.53"
+
+        assert self.server.query_count() == 1
+
+    def test_concurrent(self):
+        for i in range(200):
+            self.server.add("host{}.example.".format(i), 300, A, "192.0.2.2")
+
+        resolver = self.get_test_resolver()
+
+        async def resolve_all():
+            return await asyncio.gather(*[
+                resolver.resolve("host{}.example.".format(i))
+                for i in range(200)
+            ])
+
+        answers = self.run_async(resolve_all())
+        assert len(answers) == 200
+        assert len(resolver.cache.data) == 200
+
+
+class TestExceptionCachingResolver(_TestStubServerBase, unittest.TestCase):
+
+    resolver_cls = ExceptionCachingResolver
+
+    def test_nxdomain(self):
+        resolver = self.get_test_resolver()
+
+        with self.assertRaises(NXDOMAIN):
+            self.run_async(resolver.resolve("missing.example."))
+
+        name = from_text("missing.example.")
+        entry = resolver.cache.data[(name, A, IN)]
+        assert isinstance(entry, NXAnswer)
+
+        with self.assertRaises(NXDOMAIN):
+            self.run_async(resolver.resolve("missing.example."))
+
+        assert self.server.query_count() == 1
+
+
+class TestBulkResolver(_TestStubServerBase, unittest.TestCase):
+
+    resolver_cls = BulkResolver
+
+    def resolve_many(self, resolver, names, **kwargs):
+        async def collect():
+            return [
+                result async for result in resolver.resolve_many(names, **kwargs)
+            ]
+
+        return self.run_async(collect())
+
+    def test_resolve_many(self):
+        names = ["host{}.example.".format(i) for i in range(50)]
+        for name in names:
+            self.server.add(name, 300, A, "192.0.2.2")
+
+        resolver = self.get_test_resolver()
+
+        results = dict(self.resolve_many(
+            resolver, names + ["missing.example."], concurrency=8
+        ))
+        assert len(results) == 51
+        assert all(isinstance(results[name], Answer) for name in names)
+        assert isinstance(results["missing.example."], NXDOMAIN)
+        assert self.server.query_count() == 51
+
+        # Hits are in the order given
+        results = self.resolve_many(resolver, reversed(names))
+        assert [name for name, answer in results] == list(reversed(names))
+        assert self.server.query_count() == 51
+
+
+class TestResolver(
+    TestAggressiveCachingResolver, TestExceptionCachingResolver, TestBulkResolver
+):
+
+    resolver_cls = Resolver
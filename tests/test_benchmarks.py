@@ -0,0 +1,24 @@
+"""Smoke test of the benchmark suite."""
+import unittest
+
+from benchmarks.suite import Suite
+
+
+class TestSuite(unittest.TestCase):
+    def test_run(self):
+        only = [
+            "Cache", "PickableCache[wire]", "HostsCache", "Resolver", "serialization",
+        ]
+        report = Suite(entries=10, threads=2, only=only).run()
+
+        assert report["entries"] == 10
+        results = dict(
+            ((result["group"], result["name"], result["metric"]), result)
+            for result in report["results"]
+        )
+        assert ("backend", "Cache", "hit_latency") in results
+        assert ("backend", "PickableCache[wire]", "load") in results
+        assert ("backend", "HostsCache", "startup") in results
+        assert ("resolver", "Resolver", "getaddrinfo_hit_latency") in results
+        assert ("serialization", "wire", "bytes_per_entry") in results
+        assert all(result["value"] >= 0 for result in report["results"])
@@ -0,0 +1,110 @@
+"""Tests for resolving many names."""
+import time
+import unittest
+
+from dns.rdatatype import A
+from dns.resolver import NXDOMAIN, Answer, Cache
+
+from dns_cache import Resolver
+from dns_cache.resolver import BulkResolver
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+NAMES = ["host{}.example.".format(i) for i in range(8)]
+
+
+class TestBulkResolver(unittest.TestCase):
+
+    resolver_cls = BulkResolver
+    delay = 0.2
+
+    def setUp(self):
+        self.server = StubServer(delay=self.delay)
+        self.server.add_zone("example.")
+        for i, name in enumerate(NAMES):
+            self.server.add(name, 300, A, "192.0.2.{}".format(i + 1))
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_test_resolver(self):
+        return get_stub_resolver(self.resolver_cls, self.server, cache=Cache())
+
+    def test_results(self):
+        resolver = self.get_test_resolver()
+
+        names = NAMES + ["missing.example."]
+        results = dict(resolver.resolve_many(iter(names)))
+        assert set(results) == set(names)
+
+        for i, name in enumerate(NAMES):
+            assert isinstance(results[name], Answer)
+            assert results[name].rrset[0].address == "192.0.2.{}".format(i + 1)
+        assert isinstance(results["missing.example."], NXDOMAIN)
+
+    def test_concurrent(self):
+        resolver = self.get_test_resolver()
+
+        start = time.time()
+        results = list(resolver.resolve_many(NAMES))
+        elapsed = time.time() - start
+
+        assert len(results) == len(NAMES)
+        assert self.server.query_count() == len(NAMES)
+        assert elapsed < self.delay * len(NAMES) / 2
+
+    def test_concurrency_limit(self):
+        resolver = self.get_test_resolver()
+
+        start = time.time()
+        results = list(resolver.resolve_many(NAMES, concurrency=2))
+        elapsed = time.time() - start
+
+        assert len(results) == len(NAMES)
+        assert elapsed >= self.delay * len(NAMES) / 2
+
+    def test_hits(self):
+        resolver = self.get_test_resolver()
+
+        list(resolver.resolve_many(NAMES))
+        assert self.server.query_count() == len(NAMES)
+
+        start = time.time()
+        results = list(resolver.resolve_many(reversed(NAMES)))
+        assert time.time() - start < self.delay
+
+        # Hits are in the order given
+        assert [name for name, answer in results] == list(reversed(NAMES))
+        assert self.server.query_count() == len(NAMES)
+
+    def test_hit_statistics(self):
+        resolver = self.get_test_resolver()
+
+        list(resolver.resolve_many(NAMES))
+        resolver.cache.reset_statistics()
+        for name in NAMES:
+            resolver.resolve(name)
+        hits = resolver.cache.hits()
+
+        resolver.cache.reset_statistics()
+        list(resolver.resolve_many(NAMES))
+
+        # As many as resolving each name
+        assert resolver.cache.hits() == hits
+        assert resolver.cache.misses() == 0
+
+    def test_early_exit(self):
+        resolver = self.get_test_resolver()
+
+        for name, answer in resolver.resolve_many(NAMES, concurrency=2):
+            break
+
+        time.sleep(self.delay * 2)
+        # The remaining queued names were not looked up
+        assert self.server.query_count() < len(NAMES)
+
+
+class TestResolver(TestBulkResolver):
+
+    resolver_cls = Resolver
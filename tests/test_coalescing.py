@@ -0,0 +1,142 @@
+"""Tests for coalescing concurrent identical lookups."""
+import threading
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+from dns.resolver import NXDOMAIN, Cache
+
+from dns_cache import Resolver
+from dns_cache.resolver import CoalescingResolver
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class _CountingCache(Cache):
+    def __init__(self, *args, **kwargs):
+        super(_CountingCache, self).__init__(*args, **kwargs)
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return super(_CountingCache, self).get(key)
+
+
+def _resolve_concurrently(resolver, name, count=20):
+    results = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = resolver.resolve(name)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i, )) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+class TestCoalescingResolver(unittest.TestCase):
+
+    resolver_cls = CoalescingResolver
+    # The lookup before coalescing, and that of dnspython
+    hit_gets = 2
+
+    def setUp(self):
+        self.server = StubServer(delay=0.2)
+        self.server.add_zone("example.")
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_test_resolver(self):
+        return get_stub_resolver(self.resolver_cls, self.server, cache=Cache())
+
+    def test_answer(self):
+        resolver = self.get_test_resolver()
+
+        results = _resolve_concurrently(resolver, "example.")
+
+        assert self.server.query_count() == 1
+        assert all(result is results[0] for result in results)
+        assert results[0].rrset[0].address == "192.0.2.1"
+
+        assert not resolver._in_flight
+
+    def test_nxdomain(self):
+        resolver = self.get_test_resolver()
+
+        results = _resolve_concurrently(resolver, "missing.example.")
+
+        assert self.server.query_count() == 1
+        assert all(isinstance(result, NXDOMAIN) for result in results)
+
+        assert not resolver._in_flight
+
+    def test_hit(self):
+        resolver = get_stub_resolver(
+            self.resolver_cls, self.server, cache=_CountingCache()
+        )
+        resolver.resolve("example.")
+
+        coalesced = []
+        resolver._coalesce = lambda *args, **kwargs: coalesced.append(args)
+        resolver.cache.gets = 0
+        assert resolver.resolve("example.").rrset[0].address == "192.0.2.1"
+
+        assert not coalesced
+        assert resolver.cache.gets == self.hit_gets
+
+    def test_nested(self):
+        resolver = get_stub_resolver(
+            self.resolver_cls, self.server, cache=_CountingCache()
+        )
+        answer = resolver.resolve("example.")
+        key = (from_text("example."), A, IN)
+        other = (from_text("missing.example."), A, IN)
+
+        def outer():
+            # A nested lookup has its own answer, and does not replace this
+            assert resolver._coalesce_miss(
+                other + (True, ), resolver._cache_get, other
+            ) is None
+            return resolver._cache_get(key)
+
+        resolver.cache.gets = 0
+        assert resolver._coalesce_miss(key + (True, ), outer) is answer
+        assert resolver.cache.gets == 2
+        assert not resolver._cache_lookups.stack
+
+    def test_sequential(self):
+        resolver = self.get_test_resolver()
+        resolver.cache = None
+
+        resolver.resolve("example.")
+        resolver.resolve("example.")
+
+        assert self.server.query_count() == 2
+
+
+class TestResolver(TestCoalescingResolver):
+
+    resolver_cls = Resolver
+
+    def test_sequential(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("example.")
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("missing.example.")
+
+        resolver.resolve("example.")
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("missing.example.")
+
+        assert self.server.query_count() == 2
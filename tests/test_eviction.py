@@ -0,0 +1,208 @@
+"""Tests for the eviction policies of the LRU caches."""
+import os
+import tempfile
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+
+from dns_cache.eviction import (
+    ARCPolicy,
+    FrequencySketch,
+    PolicyLRUCache,
+    TinyLFUPolicy,
+)
+from dns_cache.expiration import MinExpirationLRUCache
+from dns_cache.pickle import JournaledPickableLRUCache, PickableLRUCache
+
+
+class _Value(object):
+    def __init__(self):
+        self.expiration = time.time() + 300
+
+
+def _key(name):
+    return (from_text(name), A, IN)
+
+
+HOT = [_key("hot{}.example.".format(i)) for i in range(20)]
+SCAN = [_key("scan{}.example.".format(i)) for i in range(2000)]
+
+
+def _lookup(cache, key):
+    value = cache.get(key)
+    if value is None:
+        cache.put(key, _Value())
+        return False
+    return True
+
+
+class TestFrequencySketch(unittest.TestCase):
+    def test_frequency(self):
+        sketch = FrequencySketch(100)
+        for i in range(5):
+            sketch.increment(HOT[0])
+        sketch.increment(HOT[1])
+
+        assert sketch.frequency(HOT[0]) == 5
+        assert sketch.frequency(HOT[1]) == 1
+        assert sketch.frequency(HOT[2]) == 0
+
+    def test_max_count(self):
+        sketch = FrequencySketch(100)
+        for i in range(20):
+            sketch.increment(HOT[0])
+        assert sketch.frequency(HOT[0]) == 15
+
+    def test_reset(self):
+        sketch = FrequencySketch(1000)
+        sketch.sample_size = 10
+        for i in range(8):
+            sketch.increment(HOT[0])
+        sketch.increment(HOT[1])
+        assert sketch.frequency(HOT[0]) == 8
+
+        # Counters are halved after sample_size increments
+        sketch.increment(HOT[2])
+        assert sketch.frequency(HOT[0]) == 4
+        assert sketch.frequency(HOT[1]) == 0
+
+
+class TestPolicyLRUCache(unittest.TestCase):
+
+    policy = "tinylfu"
+    policy_cls = TinyLFUPolicy
+
+    def get_cache(self, max_size=100):
+        return PolicyLRUCache(max_size=max_size, policy=self.policy)
+
+    def test_policy(self):
+        cache = self.get_cache()
+        assert isinstance(cache.policy, self.policy_cls)
+        assert PolicyLRUCache().policy is None
+
+        with self.assertRaises(ValueError):
+            PolicyLRUCache(policy="missing")
+
+    def test_max_size(self):
+        cache = self.get_cache()
+        for key in SCAN[:500]:
+            _lookup(cache, key)
+
+        assert len(cache.data) == 100
+        assert len(cache.policy) == 100
+
+    def test_scan(self):
+        cache = self.get_cache()
+        for i in range(5):
+            for key in HOT:
+                _lookup(cache, key)
+        for key in SCAN:
+            _lookup(cache, key)
+
+        hits = sum(_lookup(cache, key) for key in HOT)
+        assert hits >= len(HOT) * 0.9
+
+        # LRU keeps none of them
+        cache = PolicyLRUCache(max_size=100)
+        for i in range(5):
+            for key in HOT:
+                _lookup(cache, key)
+        for key in SCAN:
+            _lookup(cache, key)
+        assert not any(cache.get(key) for key in HOT)
+
+    def test_flush(self):
+        cache = self.get_cache()
+        for key in HOT:
+            _lookup(cache, key)
+
+        cache.flush(HOT[0])
+        assert HOT[0] not in cache.policy
+        assert len(cache.policy) == len(HOT) - 1
+
+        cache.flush()
+        assert len(cache.policy) == 0
+
+    def test_expired(self):
+        cache = self.get_cache()
+        _lookup(cache, HOT[0])
+        cache.data[HOT[0]].value.expiration = time.time() - 1
+
+        assert cache.get(HOT[0]) is None
+        assert HOT[0] not in cache.policy
+
+    def test_set_max_size(self):
+        cache = self.get_cache()
+        for key in HOT:
+            _lookup(cache, key)
+
+        cache.set_max_size(10)
+        assert cache.policy.max_size == 10
+        assert len(cache.policy) == 10
+        assert len(cache.data) == 10
+
+        _lookup(cache, SCAN[0])
+        assert len(cache.data) <= 10
+        assert len(cache.policy) <= 10
+
+    def test_expiration_cache(self):
+        cache = MinExpirationLRUCache(max_size=100, policy=self.policy)
+        assert isinstance(cache.policy, self.policy_cls)
+
+    def test_pickle(self):
+        filename = os.path.join(tempfile.mkdtemp(), "cache.pickle")
+        cache = PickableLRUCache(filename=filename, policy=self.policy)
+        for key in HOT:
+            _lookup(cache, key)
+        cache.__del__()
+
+        cache = PickableLRUCache(filename=filename, policy=self.policy)
+        assert isinstance(cache.policy, self.policy_cls)
+        assert len(cache.policy) == len(HOT)
+        assert all(key in cache.policy for key in HOT)
+
+        cache = PickableLRUCache(filename=filename)
+        assert cache.policy is None
+
+    def test_journaled(self):
+        filename = os.path.join(tempfile.mkdtemp(), "cache.pickle")
+        cache = JournaledPickableLRUCache(
+            filename=filename, max_size=10, policy=self.policy
+        )
+        for key in HOT:
+            _lookup(cache, key)
+        assert len(cache.data) == 10
+        cache.close()
+
+        cache = JournaledPickableLRUCache(
+            filename=filename, max_size=10, policy=self.policy
+        )
+        assert len(cache.data) == 10
+        assert len(cache.policy) == 10
+        cache.close()
+
+
+class TestARCPolicy(TestPolicyLRUCache):
+
+    policy = "arc"
+    policy_cls = ARCPolicy
+
+    def test_adapt(self):
+        policy = ARCPolicy(4)
+        for key in HOT[:4]:
+            assert policy.insert(key) == []
+        for key in HOT[:2]:
+            policy.hit(key)
+        assert list(policy.t2) == HOT[:2]
+
+        # The oldest key seen once is evicted, and remembered
+        assert policy.insert(HOT[4]) == [HOT[2]]
+        assert HOT[2] in policy.b1
+
+        # Which, when seen again, favours keys seen once
+        policy.insert(HOT[2])
+        assert policy.p == 1
+        assert HOT[2] in policy.t2
@@ -11,6 +11,7 @@ from freezegun import freeze_time
 from dns_cache.expiration import (
     SECONDS_PER_WEEK,
     TEN_MINS,
+    ExpiryHeapCacheBase,
     MinExpirationCache,
     MinExpirationLRUCache,
     NoExpirationCache,
@@ -62,8 +63,9 @@ class TestCache(_TestCacheBase, unittest.TestCase):
         with freeze_time(datetime.timedelta(seconds=self.expiration + 1)):
             assert not resolver.cache.get((name, A, IN))
 
-        # LRU cache purges expired records in .get()
-        if isinstance(resolver.cache, MinExpirationLRUCache):
+        # LRU cache purges expired records in .get(), and the expiry heap
+        # purges them before the lookup
+        if isinstance(resolver.cache, (MinExpirationLRUCache, ExpiryHeapCacheBase)):
             assert len(resolver.cache.data) == 0
         else:
             assert len(resolver.cache.data) == 1
@@ -0,0 +1,240 @@
+"""Tests for removing expired entries of persistent key stores without loading them."""
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import unittest
+
+import diskcache
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+
+from sqlitedict import SqliteDict
+
+from dns_cache import Resolver
+from dns_cache.diskcache import DiskCache
+from dns_cache.expiration import ExpiringValueDict
+from dns_cache.key_transform import key_encode
+from dns_cache.sqlitedict import SqliteDictCache
+from dns_cache.wire import dumps
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class _Value(object):
+    loads = 0
+
+    def __init__(self, ttl=300):
+        self.expiration = time.time() + ttl
+
+    def __setstate__(self, state):
+        _Value.loads += 1
+        self.__dict__.update(state)
+
+
+def _key(i):
+    return (from_text("host{}.example.".format(i)), A, IN)
+
+
+class TestExpiringValueDict(unittest.TestCase):
+    def setUp(self):
+        _Value.loads = 0
+        self.store = {}
+        self.data = ExpiringValueDict(
+            self.store, encode=pickle.dumps, decode=pickle.loads
+        )
+
+    def test_expired(self):
+        self.data["a"] = _Value(-1)
+        self.data["b"] = _Value()
+        assert isinstance(self.store["a"], tuple)
+
+        assert self.data.get("a") is None
+        assert "a" not in self.data
+        with self.assertRaises(KeyError):
+            self.data["a"]
+        assert _Value.loads == 0
+
+        assert self.data.get("b") is not None
+        assert "b" in self.data
+        assert _Value.loads == 1
+
+    def test_expire(self):
+        self.data["a"] = _Value(-1)
+        self.data["b"] = _Value()
+
+        assert self.data.expire() == 1
+        assert list(self.store) == ["b"]
+        assert _Value.loads == 0
+
+    def test_unindexed(self):
+        self.store["a"] = _Value(-1)
+        self.store["b"] = _Value()
+        self.store["c"] = pickle.dumps(_Value())
+
+        assert self.data.get("b") is self.store["b"]
+        assert self.data.get("c").expiration > time.time()
+        assert self.data.expire() == 1
+        assert sorted(self.store) == ["b", "c"]
+
+
+class _TestExpiringStoreBase(object):
+    def setUp(self):
+        _Value.loads = 0
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_cache(self, **kwargs):
+        raise NotImplementedError
+
+    def close_cache(self, cache):
+        cache.data.close()
+
+    def test_expired(self):
+        cache = self.get_cache()
+        cache.put(_key(0), _Value(-1))
+        cache.put(_key(1), _Value())
+
+        assert cache.get(_key(0)) is None
+        assert _Value.loads == 0
+        assert cache.get(_key(1)) is not None
+        self.close_cache(cache)
+
+    def test_purge(self):
+        cache = self.get_cache(cleaning_interval=0)
+        for i in range(10):
+            cache.put(_key(i), _Value(-1 if i % 2 else 300))
+        cache.put(_key(10), _Value())
+
+        assert len(cache.data) == 6
+        assert _key(1) not in cache.data
+        assert _key(2) in cache.data
+        assert _Value.loads == 0
+        self.close_cache(cache)
+
+    def test_flush(self):
+        cache = self.get_cache()
+        cache.put(_key(0), _Value())
+        cache.put(_key(1), _Value(-1))
+
+        cache.flush(_key(1))
+        assert len(cache.data) == 1
+        cache.flush()
+        assert len(cache.data) == 0
+        self.close_cache(cache)
+
+        cache = self.get_cache()
+        assert len(cache.data) == 0
+        self.close_cache(cache)
+
+
+class TestSqliteDictCache(_TestExpiringStoreBase, unittest.TestCase):
+    def get_cache(self, **kwargs):
+        return SqliteDictCache(
+            filename=os.path.join(self.directory, "dns.sqlite"), **kwargs
+        )
+
+    def test_unindexed(self):
+        filename = os.path.join(self.directory, "dns.sqlite")
+        data = SqliteDict(filename, autocommit=True)
+        data[key_encode(_key(0))] = _Value(-1)
+        data[key_encode(_key(1))] = _Value()
+        data.close()
+
+        cache = self.get_cache()
+        assert cache.data.expire() == 1
+        assert list(cache.data.keys()) == [_key(1)]
+        self.close_cache(cache)
+
+    def test_write_behind(self):
+        cache = self.get_cache(write_behind=True, write_behind_batch_size=100)
+        cache.put(_key(0), _Value(-1))
+        cache.next_cleaning = 0
+        cache.put(_key(1), _Value())
+
+        assert cache.data.pending == 1
+        assert len(cache.data) == 1
+        cache.close()
+
+
+class TestDiskCache(_TestExpiringStoreBase, unittest.TestCase):
+
+    encode = staticmethod(lambda value: value)
+
+    def get_cache(self, **kwargs):
+        return DiskCache(directory=os.path.join(self.directory, "dc"), **kwargs)
+
+    def test_unindexed(self):
+        data = diskcache.Cache(os.path.join(self.directory, "dc"))
+        data[_key(0)] = self.encode(_Value(-1))
+        data[_key(1)] = self.encode(_Value())
+        data.close()
+
+        cache = self.get_cache()
+        assert len(cache.data) == 1
+        assert _key(1) in cache.data
+        self.close_cache(cache)
+
+        data = diskcache.Cache(os.path.join(self.directory, "dc"))
+        expire_time = data.get(_key(1), expire_time=True)[1]
+        assert time.time() + 290 < expire_time <= time.time() + 300
+        data.close()
+
+
+    def test_unindexed_once(self):
+        cache = self.get_cache()
+        self.close_cache(cache)
+
+        data = diskcache.Cache(os.path.join(self.directory, "dc"))
+        data[_key(0)] = self.encode(_Value())
+        data.close()
+
+        cache = self.get_cache()
+        assert cache.data.set_expire_times() == 0
+        self.close_cache(cache)
+
+        data = diskcache.Cache(os.path.join(self.directory, "dc"))
+        assert data.get(_key(0), expire_time=True)[1] is None
+        data.close()
+
+
+class TestWireDiskCache(TestDiskCache):
+
+    encode = staticmethod(dumps)
+
+    def get_cache(self, **kwargs):
+        return DiskCache(
+            directory=os.path.join(self.directory, "dc"), wire=True, **kwargs
+        )
+
+
+class TestResolver(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        self.server.add("example.", 1, A, "192.0.2.1")
+        self.server.start()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def test_expired(self):
+        cache = SqliteDictCache(
+            filename=os.path.join(self.directory, "dns.sqlite"), wire=True
+        )
+        resolver = get_stub_resolver(Resolver, self.server, cache=cache)
+        answer = resolver.resolve("example.")
+        assert resolver.resolve("example.").expiration == answer.expiration
+        assert self.server.query_count() == 1
+
+        time.sleep(answer.expiration - time.time() + 0.1)
+        resolver.resolve("example.")
+        assert self.server.query_count() == 2
+        cache.data.close()
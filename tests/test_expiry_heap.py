@@ -0,0 +1,118 @@
+"""Tests for removing expired entries using a heap of expirations."""
+import os
+import tempfile
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+
+from dns_cache import MinExpirationPickableCache
+from dns_cache.expiration import ExpiryHeapCache, MinExpirationCache
+from dns_cache.sharded import ShardedCache
+
+
+class _Value(object):
+    def __init__(self, ttl):
+        self.expiration = time.time() + ttl
+
+
+class _NoScanDict(dict):
+    def items(self):
+        raise AssertionError("Entries were scanned")
+
+
+def _key(i):
+    return (from_text("host{}.example.".format(i)), A, IN)
+
+
+class TestExpiryHeapCache(unittest.TestCase):
+    def get_cache(self):
+        cache = ExpiryHeapCache()
+        cache.put(_key(0), _Value(300))
+        cache.data = _NoScanDict(cache.data)
+        return cache
+
+    def test_expired(self):
+        cache = self.get_cache()
+        for i in range(1, 4):
+            cache.put(_key(i), _Value(-i))
+        # Each put removes the entries which expired before it
+        assert set(cache.data) == set([_key(0), _key(3)])
+
+        cache.put(_key(4), _Value(300))
+        assert set(cache.data) == set([_key(0), _key(4)])
+        assert len(cache._expiry_heap) == 2
+
+    def test_clean_batch(self):
+        cache = self.get_cache()
+        cache.clean_batch = 2
+        for i in range(1, 6):
+            cache.data[_key(i)] = _Value(-i)
+            cache._schedule_expiry(_key(i), cache.data[_key(i)].expiration)
+
+        cache.get(_key(0))
+        assert len(cache.data) == 4
+        cache.get(_key(0))
+        assert len(cache.data) == 2
+
+    def test_put_again(self):
+        cache = self.get_cache()
+        cache.put(_key(1), _Value(-1))
+        value = _Value(300)
+        cache.put(_key(1), value)
+
+        cache.get(_key(0))
+        assert cache.data[_key(1)] is value
+
+    def test_extended(self):
+        cache = self.get_cache()
+        value = _Value(-1)
+        cache.put(_key(1), value)
+        value.expiration = time.time() + 300
+
+        cache.get(_key(0))
+        assert cache.data[_key(1)] is value
+        assert cache._expirations[_key(1)] == value.expiration
+
+    def test_compact(self):
+        cache = self.get_cache()
+        cache.clean_batch = 10
+        value = _Value(300)
+        for i in range(100):
+            value.expiration += 1
+            cache.put(_key(1), value)
+
+        assert len(cache._expiry_heap) <= 2 * 2 + cache.clean_batch + 1
+
+    def test_flush(self):
+        cache = self.get_cache()
+        cache.put(_key(1), _Value(300))
+        cache.flush()
+        assert cache._expiry_heap == []
+        assert cache._expirations == {}
+
+
+class TestExpiryHeapCaches(unittest.TestCase):
+    def test_min_expiration(self):
+        cache = MinExpirationCache(min_ttl=300)
+        cache.put(_key(0), _Value(-1))
+        assert cache._expirations[_key(0)] > time.time()
+
+    def test_sharded(self):
+        cache = ShardedCache(shards=2)
+        assert all(isinstance(shard, ExpiryHeapCache) for shard in cache._shards)
+
+    def test_pickle(self):
+        filename = os.path.join(tempfile.mkdtemp(), "cache.pickle")
+        cache = MinExpirationPickableCache(filename=filename)
+        cache.put(_key(0), _Value(300))
+        state = cache.__getstate__()
+        assert "_expiry_heap" not in state
+        assert "_expirations" not in state
+        cache.__del__()
+
+        cache = MinExpirationPickableCache(filename=filename)
+        cache.get(_key(0))
+        assert list(cache._expirations) == [_key(0)]
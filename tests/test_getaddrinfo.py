@@ -0,0 +1,173 @@
+"""Tests for the getaddrinfo result cache."""
+import socket
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A, AAAA, CNAME
+from dns.resolver import Cache, override_system_resolver, restore_system_resolver
+
+import dns_cache
+from dns_cache import Resolver
+from dns_cache.getaddrinfo import GetAddrInfoCache
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+orig_getaddrinfo = socket.getaddrinfo
+orig_gethostbyname = socket.gethostbyname
+
+
+class TestGetAddrInfoCache(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.add("example.", 300, AAAA, "2001:db8::1")
+        self.server.add("www.example.", 300, CNAME, "example.")
+        self.server.start()
+
+        self.resolver = get_stub_resolver(Resolver, self.server, cache=Cache())
+        override_system_resolver(self.resolver)
+
+        self.calls = []
+        getaddrinfo = socket.getaddrinfo
+
+        def counting_getaddrinfo(*args):
+            self.calls.append(args)
+            return getaddrinfo(*args)
+
+        self.cache = GetAddrInfoCache(self.resolver, getaddrinfo=counting_getaddrinfo)
+        self.cache.install()
+
+    def tearDown(self):
+        restore_system_resolver()
+        self.server.stop()
+
+    def test_hit(self):
+        first = socket.getaddrinfo("www.example.", 80, 0, socket.SOCK_STREAM)
+        second = socket.getaddrinfo("www.example.", 80, 0, socket.SOCK_STREAM)
+
+        assert sorted(first) == sorted(second)
+        assert len(first) == 2
+        assert len(self.calls) == 1
+        assert self.server.query_count() == 2
+
+    def test_port(self):
+        socket.getaddrinfo("www.example.", 80, socket.AF_INET, socket.SOCK_STREAM)
+        results = socket.getaddrinfo(
+            "www.example.", "443", socket.AF_INET, socket.SOCK_STREAM
+        )
+        assert [result[4] for result in results] == [("192.0.2.1", 443)]
+
+        results = socket.getaddrinfo(
+            "www.example.", None, socket.AF_INET6, socket.SOCK_STREAM
+        )
+        assert results[0][4][:2] == ("2001:db8::1", 0)
+        assert len(self.calls) == 2
+
+    def test_gethostbyname(self):
+        assert socket.gethostbyname("www.example.") == "192.0.2.1"
+        assert socket.gethostbyname("www.example.") == "192.0.2.1"
+        assert len(self.calls) == 1
+
+    def test_expiration(self):
+        socket.getaddrinfo("example.", 80, socket.AF_INET)
+
+        answer = self.resolver.cache.data[(from_text("example."), A, IN)]
+        answer.expiration = time.time() - 1
+        self.cache.flush()
+
+        socket.getaddrinfo("example.", 80, socket.AF_INET)
+        assert len(self.calls) == 2
+        assert self.server.query_count() == 2
+
+        key = ("example.", socket.AF_INET, 0, 0, 0, None)
+        assert self.cache._results[key][0] <= time.time() + self.cache.max_age
+
+    def test_max_age(self):
+        self.cache.max_age = 0
+
+        socket.getaddrinfo("example.", 80, socket.AF_INET)
+        socket.getaddrinfo("example.", 80, socket.AF_INET)
+        assert len(self.calls) == 2
+        assert self.server.query_count() == 1
+
+    def test_size(self):
+        self.cache.size = 1
+
+        socket.getaddrinfo("example.", 80, socket.AF_INET)
+        socket.getaddrinfo("example.", 80, socket.AF_INET6)
+        assert len(self.cache._results) == 1
+
+        socket.getaddrinfo("example.", 80, socket.AF_INET)
+        assert len(self.calls) == 3
+
+    def test_failure(self):
+        for i in range(2):
+            with self.assertRaises(socket.gaierror):
+                socket.getaddrinfo("missing.example.", 80)
+        assert len(self.calls) == 2
+        assert not self.cache._results
+
+    def test_no_cache_get(self):
+        socket.getaddrinfo("example.", 80, socket.AF_INET)
+        gets = []
+        get = self.resolver.cache.get
+        self.resolver.cache.get = lambda key: gets.append(key) or get(key)
+
+        assert self.cache._expiration("example.", socket.AF_INET) is not None
+        assert not gets
+
+    def test_uninstall(self):
+        self.cache.uninstall()
+        assert not hasattr(socket.getaddrinfo, "__self__")
+        assert socket.gethostbyname("www.example.") == "192.0.2.1"
+
+    def test_numeric_host(self):
+        socket.getaddrinfo("192.0.2.1", 80, socket.AF_INET)
+        socket.getaddrinfo("192.0.2.1", 80, socket.AF_INET)
+        assert len(self.calls) == 2
+        assert self.server.query_count() == 0
+
+
+class TestOverrideSystemResolver(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.start()
+
+    def tearDown(self):
+        restore_system_resolver()
+        self.server.stop()
+
+    def test_installed(self):
+        resolver = get_stub_resolver(Resolver, self.server, cache=Cache())
+        dns_cache.override_system_resolver(resolver)
+        assert isinstance(socket.getaddrinfo.__self__, GetAddrInfoCache)
+        assert isinstance(socket.gethostbyname.__self__, GetAddrInfoCache)
+
+        assert socket.gethostbyname("example.") == "192.0.2.1"
+
+        restore_system_resolver()
+        assert socket.getaddrinfo == orig_getaddrinfo
+        assert socket.gethostbyname == orig_gethostbyname
+
+    def test_default_cache(self):
+        resolver = dns_cache.override_system_resolver()
+        resolver.port = self.server.port
+        resolver.nameservers = ["127.0.0.1"]
+        assert socket.getaddrinfo.__self__ is resolver.getaddrinfo_cache
+
+        socket.getaddrinfo("example.", 80, socket.AF_INET)
+        assert resolver.cache.get((from_text("example."), A, IN)) is not None
+        assert len(resolver.getaddrinfo_cache._results) == 1
+
+        resolver.getaddrinfo_cache.uninstall()
+        assert socket.getaddrinfo == resolver.getaddrinfo_cache._getaddrinfo
+
+    def test_disabled(self):
+        resolver = get_stub_resolver(Resolver, self.server, cache=Cache())
+        dns_cache.override_system_resolver(resolver, getaddrinfo_cache_size=0)
+        assert not hasattr(socket.getaddrinfo, "__self__")
@@ -0,0 +1,116 @@
+"""Tests for answering resolve_name from the cache."""
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+
+from dns.rdatatype import A, AAAA, CNAME
+from dns.resolver import (
+    NoAnswer,
+    Cache,
+    override_system_resolver,
+    restore_system_resolver,
+)
+
+from dns_cache import Resolver
+from dns_cache.resolver import CachedHostAnswers
+from dns_cache.sqlitedict import SqliteDictCache
+from dns_cache.wire import LazyAnswer
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class TestHostAnswersResolver(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        self.server.add("example.", 300, A, "192.0.2.1", "192.0.2.2")
+        self.server.add("example.", 300, AAAA, "2001:db8::1")
+        self.server.add("www.example.", 300, CNAME, "example.")
+        self.server.add("v4.example.", 300, A, "192.0.2.4")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_cache(self):
+        return Cache()
+
+    def get_test_resolver(self):
+        return get_stub_resolver(Resolver, self.server, cache=self.get_cache())
+
+    def test_unspec(self):
+        resolver = self.get_test_resolver()
+
+        answers = resolver.resolve_name("www.example.")
+        assert not isinstance(answers, CachedHostAnswers)
+        assert self.server.query_count() == 2
+
+        cached = resolver.resolve_name("www.example.")
+        assert isinstance(cached, CachedHostAnswers)
+        assert self.server.query_count() == 2
+
+        assert sorted(cached.addresses_and_families()) == sorted(
+            answers.addresses_and_families()
+        )
+        assert sorted(cached.addresses(socket.AF_INET)) == ["192.0.2.1", "192.0.2.2"]
+        assert cached.canonical_name() == answers.canonical_name()
+
+    def test_family(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve_name("v4.example.", socket.AF_INET)
+        answers = resolver.resolve_name("v4.example.", socket.AF_INET)
+        assert isinstance(answers, CachedHostAnswers)
+        assert list(answers.addresses()) == ["192.0.2.4"]
+
+        resolver.resolve_name("v4.example.")
+        answers = resolver.resolve_name("v4.example.")
+        assert isinstance(answers, CachedHostAnswers)
+        assert list(answers.addresses()) == ["192.0.2.4"]
+
+        with self.assertRaises(NoAnswer):
+            resolver.resolve_name("v4.example.", socket.AF_INET6)
+
+        assert self.server.query_count() == 2
+
+    def test_getaddrinfo(self):
+        resolver = self.get_test_resolver()
+        override_system_resolver(resolver)
+        try:
+            first = socket.getaddrinfo("www.example.", 80, 0, socket.SOCK_STREAM)
+            second = socket.getaddrinfo("www.example.", 80, 0, socket.SOCK_STREAM)
+        finally:
+            restore_system_resolver()
+
+        assert sorted(first) == sorted(second)
+        assert len(first) == 3
+        assert self.server.query_count() == 2
+
+
+class TestWireHostAnswersResolver(TestHostAnswersResolver):
+    def setUp(self):
+        super(TestWireHostAnswersResolver, self).setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(TestWireHostAnswersResolver, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def get_cache(self):
+        return SqliteDictCache(
+            filename=os.path.join(self.directory, "dns.sqlite"), wire=True
+        )
+
+    def test_lazy(self):
+        resolver = self.get_test_resolver()
+        resolver.resolve_name("www.example.")
+
+        answers = resolver.resolve_name("www.example.", socket.AF_INET)
+        answer = answers[A]
+        assert isinstance(answer, LazyAnswer)
+
+        assert sorted(answers.addresses()) == ["192.0.2.1", "192.0.2.2"]
+        assert answers.canonical_name().to_text() == "example."
+        assert "response" not in answer.__dict__
@@ -1,14 +1,18 @@
+import os
+import shutil
 import socket
+import tempfile
+import time
 import unittest
 
 from dns.name import from_text
 from dns.rdataclass import IN
-from dns.rdatatype import A
+from dns.rdatatype import A, AAAA
 from dns.resolver import restore_system_resolver
 
 from dns_cache import override_system_resolver
 from dns_cache.block import dnspython_resolver_socket_block
-from dns_cache.hosts import loads
+from dns_cache.hosts import IndexedHostsCache, loads, parse_hosts
 from dns_cache.persistence import _LayeredCache
 from dns_cache.resolver import DNSPYTHON_2
 
@@ -65,3 +69,116 @@ class TestHostsCache(unittest.TestCase):
 
         restore_system_resolver()
         assert socket.gethostbyname == orig_gethostbyname
+
+
+class TestParseHosts(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "hosts")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_parse(self):
+        with open(self.filename, "w") as f:
+            f.write(
+                "# comment\n"
+                "127.0.0.1 localhost Local.Example.  # trailing comment\n"
+                "::1 localhost ip6-localhost\n"
+                "fe80::1%lo0 scoped\n"
+                "192.0.2.1 multi\n"
+                "192.0.2.2 multi\n"
+                "invalid-line\n"
+            )
+
+        index = parse_hosts(self.filename)
+        assert index[A] == {
+            "localhost": "127.0.0.1",
+            "local.example": "127.0.0.1",
+            "multi": ["192.0.2.1", "192.0.2.2"],
+        }
+        assert index[AAAA] == {
+            "localhost": "::1",
+            "ip6-localhost": "::1",
+        }
+
+
+class TestIndexedHostsCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "hosts")
+        self.write_hosts("192.0.2.1 host1 alias1\n::1 host1\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_hosts(self, content, filename=None):
+        filename = filename or self.filename
+        with open(filename, "w") as f:
+            f.write(content)
+        # Ensure the change is seen, even with a coarse mtime
+        mtime = time.time() + len(content)
+        os.utime(filename, (mtime, mtime))
+
+    def test_lazy(self):
+        cache = IndexedHostsCache(filename=self.filename)
+        assert len(cache.data) == 0
+
+        name = from_text("Alias1")
+        answer = cache.get((name, A, IN))
+        assert answer.rrset[0].address == "192.0.2.1"
+        assert len(cache.data) == 1
+
+        assert cache.get((name, A, IN)) is answer
+        assert cache.get((from_text("host1"), AAAA, IN)).rrset[0].address == "::1"
+        assert cache.get((from_text("missing"), A, IN)) is None
+        assert len(cache.data) == 2
+
+    def test_reload(self):
+        cache = IndexedHostsCache(filename=self.filename, check_interval=0)
+        key = (from_text("host1"), A, IN)
+        other_key = (from_text("host1"), AAAA, IN)
+
+        answer = cache.get(key)
+        other_answer = cache.get(other_key)
+        assert answer.rrset[0].address == "192.0.2.1"
+
+        self.write_hosts("192.0.2.2 host1\n::1 host1\n192.0.2.3 host2\n")
+
+        changed = cache.get(key)
+        assert changed is not answer
+        assert changed.rrset[0].address == "192.0.2.2"
+        assert cache.get(other_key) is not other_answer
+        assert cache.get((from_text("host2"), A, IN)).rrset[0].address == "192.0.2.3"
+        assert cache.get((from_text("alias1"), A, IN)) is None
+
+    def test_reload_interval(self):
+        cache = IndexedHostsCache(filename=self.filename, check_interval=60)
+        key = (from_text("host1"), A, IN)
+
+        answer = cache.get(key)
+        self.write_hosts("192.0.2.2 host1\n")
+        assert cache.get(key) is answer
+
+    def test_multiple_files(self):
+        other = os.path.join(self.directory, "generated")
+        self.write_hosts("192.0.2.9 host1\n192.0.2.10 host10\n", other)
+
+        cache = IndexedHostsCache(filename=[self.filename, other], check_interval=0)
+        host1 = cache.get((from_text("host1"), A, IN))
+        alias1 = cache.get((from_text("alias1"), A, IN))
+        host10 = cache.get((from_text("host10"), A, IN))
+        assert host1.rrset[0].address == "192.0.2.1"
+        assert host10.rrset[0].address == "192.0.2.10"
+
+        self.write_hosts("192.0.2.11 host10\n", other)
+
+        assert cache.get((from_text("alias1"), A, IN)) is alias1
+        assert cache.get((from_text("host1"), A, IN)).rrset[0].address == "192.0.2.1"
+        assert cache.get((from_text("host10"), A, IN)).rrset[0].address == "192.0.2.11"
+
+    def test_missing_file(self):
+        cache = IndexedHostsCache(
+            filename=os.path.join(self.directory, "missing"), check_interval=0
+        )
+        assert cache.get((from_text("host1"), A, IN)) is None
@@ -0,0 +1,140 @@
+"""Tests for caching authority and additional rrsets as injected answers."""
+import pickle
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A, AAAA, CNAME, MX, NS, SOA
+from dns.resolver import Cache
+
+from dns_cache import Resolver
+from dns_cache.dnspython import InjectedAnswer
+from dns_cache.expiration import MinExpirationCache
+from dns_cache.resolver import AggressiveCachingResolver
+from dns_cache.wire import dumps, loads
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class TestInjectedAnswer(unittest.TestCase):
+
+    resolver_cls = AggressiveCachingResolver
+
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.", ttl=300, minimum=60)
+        self.server.add("example.", 300, NS, "ns1.example.", "ns2.example.")
+        self.server.add("ns1.example.", 30, A, "192.0.2.53")
+        self.server.add("ns1.example.", 30, AAAA, "2001:db8::53")
+        self.server.add("ns2.example.", 30, A, "192.0.2.54")
+        self.server.add("dns.example.", 300, CNAME, "ns1.example.")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_test_resolver(self, cache=None):
+        return get_stub_resolver(self.resolver_cls, self.server, cache=cache or Cache())
+
+    def test_additional(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("example.", NS)
+        assert self.server.query_count() == 1
+
+        key = (from_text("ns1.example."), A, IN)
+        assert isinstance(resolver.cache.data[key], InjectedAnswer)
+        assert "response" not in vars(resolver.cache.data[key])
+        assert len(resolver.cache.data) == 4
+
+        answer = resolver.resolve("ns1.example.", AAAA)
+        assert self.server.query_count() == 1
+        assert [rdata.address for rdata in answer] == ["2001:db8::53"]
+
+        answer = resolver.resolve("ns2.example.", A)
+        assert self.server.query_count() == 1
+        assert [rdata.address for rdata in answer] == ["192.0.2.54"]
+
+        assert answer.canonical_name == from_text("ns2.example.")
+        assert answer.response.answer == [answer.rrset]
+        assert resolver.resolve("ns2.example.", A) is answer
+        assert self.server.query_count() == 1
+
+    def test_cached(self):
+        resolver = self.get_test_resolver()
+
+        answer = resolver.resolve("ns1.example.", A)
+        resolver.resolve("example.", NS)
+
+        # Not replaced by the additional rrset
+        assert resolver.cache.data[(from_text("ns1.example."), A, IN)] is answer
+
+    def test_authority(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("example.", MX, raise_on_no_answer=False)
+        assert self.server.query_count() == 1
+
+        answer = resolver.resolve("example.", SOA)
+        assert self.server.query_count() == 1
+        assert answer.rrset.rdtype == SOA
+
+    def test_expiration(self):
+        resolver = self.get_test_resolver()
+
+        start = time.time()
+        resolver.resolve("example.", NS)
+
+        answer = resolver.resolve("ns1.example.", A)
+        assert start + 30 <= answer.expiration <= time.time() + 30
+
+    def test_min_ttl(self):
+        resolver = self.get_test_resolver(cache=MinExpirationCache(min_ttl=600))
+
+        start = time.time()
+        resolver.resolve("example.", NS)
+
+        answer = resolver.cache.data[(from_text("ns1.example."), A, IN)]
+        assert start + 600 <= answer.expiration <= time.time() + 600
+
+    def test_expired(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("example.", NS)
+
+        key = (from_text("ns1.example."), A, IN)
+        resolver.cache.data[key].expiration = time.time() - 1
+
+        answer = resolver.resolve("ns1.example.", A)
+        assert self.server.query_count() == 2
+        assert not isinstance(answer, InjectedAnswer)
+
+    def test_persisted(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("example.", NS)
+        answer = resolver.cache.data[(from_text("ns1.example."), A, IN)]
+
+        for loaded in (pickle.loads(pickle.dumps(answer)), loads(dumps(answer))):
+            assert loaded.expiration == answer.expiration
+            assert loaded.canonical_name == from_text("ns1.example.")
+            assert [rdata.address for rdata in loaded] == ["192.0.2.53"]
+
+    def test_synthesis(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("example.", NS)
+        resolver.resolve("dns.example.", CNAME)
+        assert self.server.query_count() == 2
+
+        # The CNAME target is injected
+        answer = resolver.resolve("dns.example.", A)
+        assert self.server.query_count() == 2
+        assert answer.canonical_name == from_text("ns1.example.")
+        assert [rdata.address for rdata in answer] == ["192.0.2.53"]
+
+
+class TestResolver(TestInjectedAnswer):
+
+    resolver_cls = Resolver
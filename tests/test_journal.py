@@ -0,0 +1,168 @@
+"""Tests for journaled persistence."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+from dns.resolver import LRUCacheNode
+
+from dns_cache.dnspython import create_answer, create_simple_rrset
+from dns_cache.expiration import MinExpirationCacheBase
+from dns_cache.pickle import JournaledPickableCache, JournaledPickableLRUCache
+
+
+def _create_entry(i, ttl=300):
+    name = from_text("host{}.example.".format(i))
+    rrset = create_simple_rrset(name, "192.0.2.{}".format(i % 250))
+    rrset.ttl = ttl
+    return (name, A, IN), create_answer(name, rrset)
+
+
+def _value(entry):
+    if isinstance(entry, LRUCacheNode):
+        return entry.value
+    return entry
+
+
+class MinExpirationJournaledPickableCache(
+    MinExpirationCacheBase, JournaledPickableCache
+):
+    pass
+
+
+class TestJournaledPickableCache(unittest.TestCase):
+
+    cache_cls = JournaledPickableCache
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "dns.pickle")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_cache(self, **kwargs):
+        return self.cache_cls(filename=self.filename, **kwargs)
+
+    def test_reload(self):
+        cache = self.get_cache()
+        for i in range(10):
+            cache.put(*_create_entry(i))
+
+        assert not os.path.exists(self.filename)
+        assert os.path.exists(cache.journal_filename)
+
+        # Without closing, as after a crash
+        cache = self.get_cache()
+
+        assert len(cache.data) == 10
+        key, answer = _create_entry(3)
+        assert cache.get(key).rrset == answer.rrset
+        assert cache._journal_records == 10
+
+    def test_flush_key(self):
+        cache = self.get_cache()
+        for i in range(3):
+            cache.put(*_create_entry(i))
+
+        key, answer = _create_entry(1)
+        cache.flush(key)
+        cache.close()
+
+        cache = self.get_cache()
+        assert len(cache.data) == 2
+        assert key not in cache.data
+
+    def test_flush(self):
+        cache = self.get_cache()
+        for i in range(3):
+            cache.put(*_create_entry(i))
+
+        cache.flush()
+        cache.close()
+
+        assert os.path.getsize(cache.journal_filename) == 0
+
+        cache = self.get_cache()
+        assert len(cache.data) == 0
+
+    def test_compact(self):
+        cache = self.get_cache(compact_threshold=5)
+        for i in range(12):
+            cache.put(*_create_entry(i))
+
+        assert cache._journal_records == 2
+        assert os.path.exists(self.filename)
+        cache.close()
+
+        # Compacted when closed
+        assert os.path.getsize(cache.journal_filename) == 0
+        cache = self.get_cache()
+        assert len(cache.data) == 12
+        assert cache._journal_records == 0
+
+    def test_unchanged(self):
+        cache = self.get_cache()
+        key, answer = _create_entry(1)
+        for i in range(3):
+            cache.put(key, answer)
+        assert cache._journal_records == 1
+
+        cache.put(*_create_entry(1))
+        assert cache._journal_records == 2
+
+    def test_expired(self):
+        cache = self.get_cache()
+        cache.put(*_create_entry(1))
+        cache.put(*_create_entry(2, ttl=0))
+        cache.close()
+
+        cache = self.get_cache()
+        assert len(cache.data) == 1
+
+    def test_partial_record(self):
+        cache = self.get_cache()
+        for i in range(3):
+            cache.put(*_create_entry(i))
+        cache.close()
+
+        with open(cache.journal_filename, "ab") as f:
+            f.write(b"\x80\x04\x95partial")
+
+        cache = self.get_cache()
+        assert len(cache.data) == 3
+
+        cache.put(*_create_entry(3))
+        cache.close()
+
+        cache = self.get_cache()
+        assert len(cache.data) == 4
+
+    def test_min_expiration(self):
+        self.cache_cls = MinExpirationJournaledPickableCache
+        cache = self.get_cache(min_ttl=3600)
+
+        key, answer = _create_entry(1, ttl=0)
+        cache.put(key, answer)
+        cache.close()
+
+        cache = self.get_cache(min_ttl=3600)
+        assert _value(cache.data[key]).expiration == answer.expiration
+
+
+class TestJournaledPickableLRUCache(TestJournaledPickableCache):
+
+    cache_cls = JournaledPickableLRUCache
+
+    def test_lru_order(self):
+        cache = self.get_cache(max_size=2)
+        for i in range(3):
+            cache.put(*_create_entry(i))
+        cache.close()
+
+        cache = self.get_cache(max_size=2)
+        assert len(cache.data) == 2
+        assert _create_entry(0)[0] not in cache.data
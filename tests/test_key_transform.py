@@ -1,10 +1,23 @@
+import os
+import shutil
+import tempfile
+import time
 import unittest
 
 from dns.name import from_text
 from dns.rdataclass import IN
 from dns.rdatatype import A
 
-from dns_cache.key_transform import StringKeyDict, key_decode, key_encode
+from dns_cache.key_transform import (
+    BinaryKeyDict,
+    StringKeyDict,
+    StringKeyFallbackDict,
+    binary_key_decode,
+    binary_key_encode,
+    key_decode,
+    key_encode,
+)
+from dns_cache.sqlitedict import SqliteDictCache, SqliteDictLRUCache
 
 
 class TestKeyEncoding(unittest.TestCase):
@@ -46,3 +59,109 @@ class TestKeyTransformDict(unittest.TestCase):
                 ((from_text("foo.baz."), A, IN), "blah"),
             ]
         )
+
+
+class TestBinaryKeyEncoding(unittest.TestCase):
+    def test_encode(self):
+        encoded = b"\x03foo\x03bar\x00\x00\x01\x00\x01"
+        assert binary_key_encode(("foo.bar.", A, IN)) == encoded
+        assert binary_key_encode((from_text("Foo.Bar."), A, IN)) == encoded
+
+    def test_decode(self):
+        for name in ("foo.bar.", "foo!bar.", "."):
+            key = (from_text(name), A, IN)
+            assert binary_key_decode(binary_key_encode(key)) == key
+            assert binary_key_decode(bytearray(binary_key_encode(key))) == key
+
+    def test_decode_string(self):
+        assert binary_key_decode(u"foo.bar.!1!1") == (from_text("foo.bar."), A, IN)
+
+    def test_decode_string_bytes(self):
+        # String keys are bytes on Python 2
+        for name in ("foo.bar.", "4foo.bar.", "1.bar."):
+            key = (from_text(name), A, IN)
+            encoded = key_encode(key).encode("ascii")
+            assert binary_key_decode(encoded) == key
+            assert binary_key_decode(bytearray(encoded)) == key
+
+
+class TestBinaryKeyDict(unittest.TestCase):
+    def test_basic(self):
+        d = BinaryKeyDict()
+        d[("foo.bar.", A, IN)] = "blah"
+        assert d[("foo.bar.", A, IN)] == "blah"
+        assert (from_text("FOO.bar."), A, IN) in d
+        del d[("foo.bar.", A, IN)]
+        assert len(d) == 0
+
+    def test_items(self):
+        d = BinaryKeyDict()
+        d[("foo.bar.", A, IN)] = "blah"
+        d[("foo.baz.", A, IN)] = "blah"
+        assert set(d.items()) == set(
+            [
+                ((from_text("foo.bar."), A, IN), "blah"),
+                ((from_text("foo.baz."), A, IN), "blah"),
+            ]
+        )
+
+
+class TestStringKeyFallbackDict(unittest.TestCase):
+    def test_string_keys(self):
+        store = BinaryKeyDict()
+        keys = [(from_text("foo.bar."), A, IN), (from_text("foo.baz."), A, IN)]
+        for key in keys:
+            # As stored by earlier versions
+            store[key_encode(key)] = "blah"
+        d = StringKeyFallbackDict(store)
+
+        assert keys[0] in d
+        assert d.get(keys[0]) == "blah"
+        assert d[keys[0]] == "blah"
+        assert binary_key_encode(keys[0]) in dict.keys(store)
+        assert key_encode(keys[0]) not in dict.keys(store)
+        assert d.get((from_text("foo.qux."), A, IN)) is None
+
+        del d[keys[1]]
+        assert keys[1] not in d
+        assert len(store) == 1
+
+
+class _Value(object):
+    def __init__(self):
+        self.expiration = time.time() + 300
+
+
+class TestSqliteDictBinaryKeys(unittest.TestCase):
+
+    cache_cls = SqliteDictCache
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "dns.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_string_keys(self):
+        cache = self.cache_cls(filename=self.filename)
+        cache.put((from_text("Foo.bar."), A, IN), _Value())
+        cache.put((from_text("foo.baz."), A, IN), _Value())
+        cache.close()
+
+        cache = self.cache_cls(filename=self.filename, binary_keys=True)
+        assert cache.get((from_text("foo.bar."), A, IN)) is not None
+        assert set(cache.data.keys()) == set(
+            [(from_text("foo.bar."), A, IN), (from_text("foo.baz."), A, IN)]
+        )
+        stored = [key for key in cache.data.iterkeys()]
+        assert all(isinstance(key, bytes) for key in stored)
+
+        cache.put((from_text("foo.qux."), A, IN), _Value())
+        assert len(cache.data) == 3
+        cache.close()
+
+
+class TestSqliteDictLRUBinaryKeys(TestSqliteDictBinaryKeys):
+
+    cache_cls = SqliteDictLRUCache
@@ -0,0 +1,175 @@
+"""Tests for the memory bounded caches."""
+import copy
+import os
+import tempfile
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A, CNAME, TXT
+
+from dns_cache import Resolver
+from dns_cache.memory import (
+    MemoryBoundedLRUCache,
+    MemoryBoundedPickableLRUCache,
+    estimate_size,
+)
+from dns_cache.wire import dumps, loads
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class TestMemoryBoundedLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        for i in range(4):
+            self.server.add("host{}.example.".format(i), 300, A, "192.0.2.1")
+        self.server.add("www.example.", 300, CNAME, "host0.example.")
+        self.server.add(
+            "big.example.",
+            300,
+            TXT,
+            *['"{:04d}{}"'.format(i, "x" * 200) for i in range(10)]
+        )
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_test_resolver(self, cache):
+        return get_stub_resolver(Resolver, self.server, cache=cache)
+
+    def test_estimate(self):
+        resolver = self.get_test_resolver(MemoryBoundedLRUCache())
+        small = resolver.resolve("host0.example.")
+        big = resolver.resolve("big.example.", TXT)
+
+        assert 2000 < estimate_size(small) < 5000
+        assert estimate_size(big) > 2 * estimate_size(small)
+        assert estimate_size(loads(dumps(big))) < estimate_size(big)
+
+    def test_usage(self):
+        cache = MemoryBoundedLRUCache()
+        resolver = self.get_test_resolver(cache)
+        assert cache.usage()["bytes"] == 0
+
+        answer = resolver.resolve("host0.example.")
+        usage = cache.usage()
+        assert usage["entries"] == 1
+        assert usage["bytes"] == cache.current_bytes > estimate_size(answer)
+        assert usage["max_bytes"] == cache.max_bytes
+
+        key = (from_text("host0.example."), A, IN)
+        cache.flush(key)
+        assert cache.usage()["entries"] == 0
+        assert cache.current_bytes == 0
+
+        resolver.resolve("host0.example.")
+        cache.flush()
+        assert cache.current_bytes == 0
+        resolver.resolve("host0.example.")
+        assert cache.current_bytes > estimate_size(answer)
+
+    def test_replace(self):
+        cache = MemoryBoundedLRUCache()
+        resolver = self.get_test_resolver(cache)
+
+        answer = resolver.resolve("host0.example.")
+        before = cache.current_bytes
+        cache.put((from_text("host0.example."), A, IN), answer)
+        assert cache.current_bytes == before
+
+    def test_shared(self):
+        cache = MemoryBoundedLRUCache()
+        resolver = self.get_test_resolver(cache)
+        answer = resolver.resolve("host0.example.")
+        before = cache.current_bytes
+
+        cache.put((from_text("other.example."), A, IN), answer)
+        assert len(cache.data) == 2
+        assert before < cache.current_bytes < before + estimate_size(answer)
+
+    def test_evict(self):
+        cache = MemoryBoundedLRUCache()
+        resolver = self.get_test_resolver(cache)
+        resolver.resolve("host0.example.")
+        assert len(cache.data) == 1
+        cache.max_bytes = budget = 3 * cache.current_bytes
+
+        for i in range(1, 4):
+            resolver.resolve("host{}.example.".format(i))
+        assert len(cache.data) == 3
+        assert cache.current_bytes <= budget
+        assert (from_text("host0.example."), A, IN) not in cache.data
+
+        # A large answer evicts several
+        resolver.resolve("big.example.", TXT)
+        assert len(cache.data) == 1
+        assert cache.current_bytes <= budget
+
+        # An answer over the budget is not kept
+        cache.max_bytes = 1000
+        resolver.resolve("host0.example.")
+        assert len(cache.data) == 0
+
+    def test_policy(self):
+        for policy in ("tinylfu", "arc"):
+            cache = MemoryBoundedLRUCache(max_size=200, policy=policy)
+            resolver = self.get_test_resolver(cache)
+            answer = resolver.resolve("host0.example.")
+            cache.set_max_bytes(5 * cache.current_bytes)
+
+            for i in range(200):
+                key = (from_text("host{}.example.".format(i)), A, IN)
+                cache.put(key, copy.copy(answer))
+
+            assert 0 < len(cache.data) <= 5
+            assert cache.current_bytes <= cache.max_bytes
+            # The policy chose the entries, and only has the keys left
+            assert len(cache.policy) == len(cache.data)
+            assert all(key in cache.policy for key in cache.data)
+
+    def test_set_max_bytes(self):
+        cache = MemoryBoundedLRUCache()
+        resolver = self.get_test_resolver(cache)
+        for i in range(4):
+            resolver.resolve("host{}.example.".format(i))
+
+        cache.set_max_bytes(cache.current_bytes // 2)
+        assert len(cache.data) == 2
+        assert (from_text("host3.example."), A, IN) in cache.data
+
+    def test_expired(self):
+        cache = MemoryBoundedLRUCache()
+        resolver = self.get_test_resolver(cache)
+        answer = resolver.resolve("host0.example.")
+        answer.expiration = time.time() - 1
+
+        assert cache.get((from_text("host0.example."), A, IN)) is None
+        assert cache.current_bytes == 0
+
+
+class TestMemoryBoundedPickableLRUCache(unittest.TestCase):
+    def test_reload(self):
+        filename = os.path.join(tempfile.mkdtemp(), "cache.pickle")
+        server = StubServer()
+        server.add_zone("example.")
+        server.add("example.", 300, A, "192.0.2.1")
+        server.start()
+        try:
+            cache = MemoryBoundedPickableLRUCache(filename=filename)
+            resolver = get_stub_resolver(Resolver, server, cache=cache)
+            resolver.resolve("example.")
+            current_bytes = cache.current_bytes
+            del resolver
+            cache.__del__()
+
+            cache = MemoryBoundedPickableLRUCache(filename=filename)
+            assert cache.current_bytes == current_bytes
+
+            cache = MemoryBoundedPickableLRUCache(filename=filename, max_bytes=0)
+            assert len(cache.data) == 0
+        finally:
+            server.stop()
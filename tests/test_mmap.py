@@ -0,0 +1,171 @@
+"""Tests for the memory-mapped shared cache."""
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+
+from dns_cache import Resolver
+from dns_cache.dnspython import create_answer, create_simple_rrset
+from dns_cache.mmap import MmapCache, SharedMemoryDict
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+def _create_entry(i, ttl=300):
+    name = from_text("host{}.example.".format(i))
+    rrset = create_simple_rrset(name, "192.0.2.{}".format(i % 250))
+    rrset.ttl = ttl
+    return (name, A, IN), create_answer(name, rrset)
+
+
+def _put_entry(filename, i):
+    cache = MmapCache(filename=filename)
+    cache.put(*_create_entry(i))
+
+
+class TestSharedMemoryDict(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "dns.mmap")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put_get(self):
+        data = SharedMemoryDict(self.filename, slots=64)
+
+        key, answer = _create_entry(1)
+        data[key] = answer
+
+        assert key in data
+        assert len(data) == 1
+        assert data[key].expiration == answer.expiration
+        assert data.get(key).rrset == answer.rrset
+        assert list(data.keys()) == [key]
+
+        del data[key]
+        assert key not in data
+        assert data.get(key) is None
+        with self.assertRaises(KeyError):
+            data[key]
+
+    def test_shared(self):
+        data = SharedMemoryDict(self.filename, slots=64)
+        other = SharedMemoryDict(self.filename)
+
+        assert other.slots == 64
+
+        key, answer = _create_entry(1)
+        data[key] = answer
+
+        assert other[key].rrset == answer.rrset
+
+    def test_replace(self):
+        data = SharedMemoryDict(self.filename, slots=4, probes=2)
+
+        entries = [_create_entry(i, ttl=i + 1) for i in range(20)]
+        for key, answer in entries:
+            data[key] = answer
+            data[key] = answer
+
+        assert len(data) <= 4
+        assert entries[-1][0] in data
+
+    def test_too_large(self):
+        data = SharedMemoryDict(self.filename, slots=4, slot_size=256)
+
+        key, answer = _create_entry(1)
+        data[key] = answer
+
+        assert key not in data
+
+    def test_purge(self):
+        data = SharedMemoryDict(self.filename, slots=64)
+
+        key, answer = _create_entry(1)
+        data[key] = answer
+        expired_key, expired_answer = _create_entry(2, ttl=0)
+        data[expired_key] = expired_answer
+
+        data.purge(time.time())
+
+        assert key in data
+        assert expired_key not in data
+
+    def test_invalid_file(self):
+        with open(self.filename, "wb") as f:
+            f.write(b"x" * 100)
+
+        with self.assertRaises(ValueError):
+            SharedMemoryDict(self.filename)
+
+
+class TestMmapCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "dns.mmap")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_flush(self):
+        cache = MmapCache(filename=self.filename, slots=64)
+
+        for i in range(3):
+            cache.put(*_create_entry(i))
+
+        key, answer = _create_entry(1)
+        cache.flush(key)
+        assert len(cache.data) == 2
+
+        cache.flush()
+        assert len(cache.data) == 0
+
+    @unittest.skipIf(sys.platform == "win32", "requires fork")
+    @unittest.skipIf(
+        not hasattr(multiprocessing, "get_context"), "requires Python 3.4"
+    )
+    def test_processes(self):
+        cache = MmapCache(filename=self.filename)
+
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=_put_entry, args=(self.filename, i))
+            for i in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        for i in range(4):
+            key, answer = _create_entry(i)
+            assert cache.get(key).rrset == answer.rrset
+
+    def test_resolvers(self):
+        server = StubServer()
+        server.add_zone("example.")
+        server.add("example.", 300, A, "192.0.2.1")
+        server.start()
+        try:
+            resolvers = [
+                get_stub_resolver(
+                    Resolver, server, cache=MmapCache(filename=self.filename)
+                )
+                for i in range(2)
+            ]
+
+            q1 = resolvers[0].resolve("example.")
+            q2 = resolvers[1].resolve("example.")
+
+            assert q2.rrset == q1.rrset
+            assert server.query_count() == 1
+        finally:
+            server.stop()
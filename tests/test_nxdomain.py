@@ -0,0 +1,125 @@
+"""Tests for answering names below a nonexistent name (RFC 8020)."""
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A, CNAME, MX
+from dns.resolver import NXDOMAIN, Cache
+
+from dns_cache import Resolver
+from dns_cache.resolver import ExceptionCachingResolver, NXAnswer
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class TestNXDomainCut(unittest.TestCase):
+
+    resolver_cls = ExceptionCachingResolver
+
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.", ttl=300, minimum=60)
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.add("alias.example.", 300, CNAME, "gone.example.")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_test_resolver(self):
+        return get_stub_resolver(self.resolver_cls, self.server, cache=Cache())
+
+    def test_below(self):
+        resolver = self.get_test_resolver()
+
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("gone.example.")
+        assert self.server.query_count() == 1
+
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("random1.gone.example.")
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("a.random2.gone.example.", MX)
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("gone.example.", MX)
+        assert self.server.query_count() == 1
+
+        # Siblings and parents still exist
+        resolver.resolve("example.")
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("other.example.")
+        assert self.server.query_count() == 3
+
+    def test_cname_target(self):
+        resolver = self.get_test_resolver()
+
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("alias.example.")
+        assert self.server.query_count() == 1
+
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("below.gone.example.")
+        assert self.server.query_count() == 1
+
+        # The alias itself exists
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("below.alias.example.")
+        assert self.server.query_count() == 2
+
+    def test_negative_ttl(self):
+        resolver = self.get_test_resolver()
+
+        start = time.time()
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("gone.example.")
+
+        answer = resolver.cache.data[(from_text("gone.example."), A, IN)]
+        assert isinstance(answer, NXAnswer)
+        assert start + 60 <= answer.expiration <= time.time() + 60
+
+    def test_negative_ttl_soa_ttl(self):
+        self.server.add_zone("example.", ttl=30, minimum=600)
+        resolver = self.get_test_resolver()
+
+        start = time.time()
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("gone.example.")
+
+        answer = resolver.cache.data[(from_text("gone.example."), A, IN)]
+        assert start + 30 <= answer.expiration <= time.time() + 30
+
+    def test_expired(self):
+        resolver = self.get_test_resolver()
+
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("gone.example.")
+
+        for answer in resolver._nxdomain_index.values():
+            answer.expiration = time.time() - 1
+
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("random.gone.example.")
+        assert self.server.query_count() == 2
+        assert (from_text("gone.example."), IN) not in resolver._nxdomain_index
+
+    def test_index_size(self):
+        resolver = self.get_test_resolver()
+        resolver.nxdomain_index_size = 2
+
+        for name in ("gone1.example.", "gone2.example.", "gone3.example."):
+            with self.assertRaises(NXDOMAIN):
+                resolver.resolve(name)
+
+        assert len(resolver._nxdomain_index) == 2
+
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("below.gone1.example.")
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("below.gone3.example.")
+        assert self.server.query_count() == 4
+
+
+class TestResolver(TestNXDomainCut):
+
+    resolver_cls = Resolver
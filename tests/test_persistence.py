@@ -16,7 +16,7 @@ try:
 except ImportError:
     apsw = None
 
-from dns_cache.hosts import HostsCache
+from dns_cache.hosts import HostsCache, IndexedHostsCache
 from dns_cache.diskcache import DiskCache, DiskLRUCache
 from dns_cache.pickle import PickableCache, PickableCacheBase, PickableLRUCache
 from dns_cache.sqlitedict import SqliteDictCache, SqliteDictLRUCache
@@ -249,7 +249,7 @@ class TestPickling(_TestPersistentCacheBase, unittest.TestCase):
             q2.response = None
             q2.rrset = None
 
-        if isinstance(resolver.cache, HostsCache):
+        if isinstance(resolver.cache, (HostsCache, IndexedHostsCache)):
             q1.expiration = None
             q2.expiration = None
 
@@ -275,6 +275,11 @@ class TestHosts(TestPickling):
     seed_cache = lambda self, resolver: None
 
 
+class TestIndexedHosts(TestHosts):
+
+    cache_cls = IndexedHostsCache
+
+
 class TestStashMemory(TestPickling):
 
     cache_cls = StashCache
@@ -395,3 +400,31 @@ if DiskDictCache:
             "serializer": pickle4.dumps,
             "deserializer": pickle4.loads,
         }
+
+
+class TestWirePickling(TestPickling):
+
+    kwargs = {"filename": os.path.abspath("dns-wire.pickle"), "wire": True}
+
+
+class TestLRUWirePickling(TestPickling):
+
+    cache_cls = PickableLRUCache
+    kwargs = {"filename": os.path.abspath("dns-wire-lru.pickle"), "wire": True}
+
+
+class TestWireStashMemory(TestStashMemory):
+
+    kwargs = {"archive": "memory:///", "wire": True}
+
+
+class TestWireSqliteDict(TestPickling):
+
+    cache_cls = SqliteDictCache
+    kwargs = {"filename": os.path.abspath("dns-wire.sqlite"), "wire": True}
+
+
+class TestWireDiskCache(TestPickling):
+
+    cache_cls = DiskCache
+    kwargs = {"directory": os.path.abspath("disk-cache-wire-dir"), "wire": True}
@@ -0,0 +1,118 @@
+"""Tests for prefetching popular entries."""
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+
+from dns_cache import Resolver
+from dns_cache.expiration import PrefetchCache, PrefetchLRUCache
+from dns_cache.resolver import PrefetchingResolver
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class PrefetchingCachingResolver(PrefetchingResolver, Resolver):
+    pass
+
+
+def _wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise AssertionError("Timed out waiting for condition")
+        time.sleep(0.01)
+
+
+class TestPrefetchCache(unittest.TestCase):
+
+    cache_cls = PrefetchCache
+    resolver_cls = PrefetchingResolver
+
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.start()
+        self.key = (from_text("example."), A, IN)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_test_resolver(self, **kwargs):
+        return get_stub_resolver(
+            self.resolver_cls, self.server, cache=self.cache_cls(**kwargs)
+        )
+
+    def test_claim(self):
+        resolver = self.get_test_resolver(prefetch_fraction=0)
+
+        q1 = resolver.resolve("example.")
+        assert not resolver.cache.claim_prefetch(self.key, q1)
+
+        resolver.cache.get(self.key)
+        resolver.cache.get(self.key)
+
+        assert resolver.cache.claim_prefetch(self.key, q1)
+        assert not resolver.cache.claim_prefetch(self.key, q1)
+
+    def test_not_due(self):
+        resolver = self.get_test_resolver()
+
+        q1 = resolver.resolve("example.")
+        for i in range(5):
+            assert resolver.resolve("example.") is q1
+
+        assert not resolver.cache.claim_prefetch(self.key, q1)
+        assert self.server.query_count() == 1
+
+    def test_prefetch(self):
+        resolver = self.get_test_resolver(prefetch_fraction=0)
+
+        q1 = resolver.resolve("example.")
+        resolver.resolve("example.")
+        resolver.resolve("example.")
+
+        _wait_for(lambda: resolver.cache.get(self.key) is not q1)
+
+        assert self.server.query_count() == 2
+        assert resolver.resolve("example.") is not q1
+
+    def test_flush(self):
+        resolver = self.get_test_resolver(prefetch_fraction=0)
+
+        q1 = resolver.resolve("example.")
+        resolver.cache.get(self.key)
+        resolver.cache.get(self.key)
+        resolver.cache.flush()
+
+        assert not resolver.cache.claim_prefetch(self.key, q1)
+
+    def test_pruned(self):
+        cache = self.cache_cls()
+        for i in range(100):
+            value = type("Value", (object, ), {"expiration": time.time() - 1})()
+            cache.put((from_text("host{}.example.".format(i)), A, IN), value)
+        cache.flush((from_text("host99.example."), A, IN))
+
+        assert len(cache._prefetch_hits) <= 2 * len(cache.data) + 1
+
+
+class TestPrefetchLRUCache(TestPrefetchCache):
+
+    cache_cls = PrefetchLRUCache
+
+    def test_evicted(self):
+        cache = self.cache_cls(max_size=100)
+        for i in range(5000):
+            value = type("Value", (object, ), {"expiration": time.time() + 300})()
+            cache.put((from_text("host{}.example.".format(i)), A, IN), value)
+
+        assert len(cache.data) == 100
+        assert len(cache._prefetch_hits) <= 201
+
+
+class TestPrefetchingCachingResolver(TestPrefetchCache):
+
+    resolver_cls = PrefetchingCachingResolver
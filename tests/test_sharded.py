@@ -0,0 +1,200 @@
+"""Tests for the sharded caches."""
+import threading
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+from dns.resolver import Cache, LRUCache, LRUCacheNode
+
+from dns_cache import Resolver
+from dns_cache.dnspython import create_answer, create_simple_rrset
+from dns_cache.eviction import PolicyLRUCache
+from dns_cache.expiration import SECONDS_PER_WEEK, TEN_MINS, ExpiryHeapCache
+from dns_cache.sharded import (
+    MinExpirationShardedCache,
+    MinExpirationShardedLRUCache,
+    NoExpirationShardedCache,
+    NoExpirationShardedLRUCache,
+    ShardedCache,
+    ShardedLRUCache,
+)
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+def _create_entry(i):
+    name = from_text("host{}.example.".format(i))
+    rrset = create_simple_rrset(name, "192.0.2.{}".format(i % 250))
+    rrset.ttl = 300
+    return (name, A, IN), create_answer(name, rrset)
+
+
+def _value(entry):
+    if isinstance(entry, LRUCacheNode):
+        return entry.value
+    return entry
+
+
+class TestShardedCache(unittest.TestCase):
+
+    cache_cls = ShardedCache
+    expiration = 0
+
+    def test_interface(self):
+        cache = self.cache_cls(shards=4)
+
+        assert isinstance(cache, (Cache, LRUCache))
+        assert len(cache._shards) == 4
+
+    def test_put_get(self):
+        cache = self.cache_cls(shards=4)
+
+        entries = [_create_entry(i) for i in range(100)]
+        for key, answer in entries:
+            cache.put(key, answer)
+
+        assert len(cache.data) == 100
+        assert all(len(shard.data) for shard in cache._shards)
+
+        for key, answer in entries:
+            assert key in cache.data
+            assert _value(cache.data[key]) is answer
+            assert cache.get(key) is answer
+
+        assert set(cache.data.keys()) == set(key for key, answer in entries)
+        assert len(list(cache.data.items())) == 100
+
+        assert cache.hits() == 100
+
+    def test_expiration(self):
+        cache = self.cache_cls(shards=4)
+
+        key, answer = _create_entry(1)
+        cache.put(key, answer)
+
+        assert answer.expiration >= time.time() + self.expiration - 1
+
+    def test_flush(self):
+        cache = self.cache_cls(shards=4)
+
+        entries = [_create_entry(i) for i in range(10)]
+        for key, answer in entries:
+            cache.put(key, answer)
+
+        cache.flush(entries[0][0])
+        assert entries[0][0] not in cache.data
+        assert len(cache.data) == 9
+
+        cache.flush()
+        assert len(cache.data) == 0
+
+    def test_threads(self):
+        cache = self.cache_cls(shards=8)
+        entries = [_create_entry(i) for i in range(200)]
+
+        def worker():
+            for key, answer in entries:
+                cache.put(key, answer)
+                assert cache.get(key) is not None
+
+        threads = [threading.Thread(target=worker) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(cache.data) == 200
+
+    def test_resolver(self):
+        server = StubServer()
+        server.add_zone("example.")
+        server.add("example.", 300, A, "192.0.2.1")
+        server.start()
+        try:
+            resolver = get_stub_resolver(Resolver, server, cache=self.cache_cls())
+
+            q1 = resolver.resolve("example.")
+            assert resolver.resolve("example.") is q1
+            assert server.query_count() == 1
+        finally:
+            server.stop()
+
+
+class TestShardedLRUCache(TestShardedCache):
+
+    cache_cls = ShardedLRUCache
+
+    def test_max_size(self):
+        cache = self.cache_cls(shards=4, max_size=40)
+
+        for i in range(200):
+            cache.put(*_create_entry(i))
+
+        assert len(cache.data) <= 40
+
+        cache.set_max_size(400)
+        assert all(shard.max_size == 100 for shard in cache._shards)
+
+    def test_hits_for_key(self):
+        cache = self.cache_cls(shards=4)
+
+        key, answer = _create_entry(1)
+        cache.put(key, answer)
+        cache.get(key)
+
+        assert cache.get_hits_for_key(key) == 1
+
+    def test_shard_class(self):
+        cache = self.cache_cls(
+            shards=4, max_size=40,
+            shard_class=PolicyLRUCache, shard_kwargs={"policy": "tinylfu"},
+        )
+
+        assert all(isinstance(shard, PolicyLRUCache) for shard in cache._shards)
+        assert all(shard.max_size == 10 for shard in cache._shards)
+
+        for i in range(200):
+            cache.put(*_create_entry(i))
+
+        assert len(cache.data) <= 40
+
+
+class TestMinExpirationShardedCache(TestShardedCache):
+
+    cache_cls = MinExpirationShardedCache
+    expiration = TEN_MINS
+
+    def test_expiration(self):
+        cache = self.cache_cls(shards=4, min_ttl=TEN_MINS)
+
+        key, answer = _create_entry(1)
+        cache.put(key, answer)
+
+        assert answer.expiration >= time.time() + TEN_MINS - 1
+
+
+class TestMinExpirationShardedLRUCache(TestMinExpirationShardedCache):
+
+    cache_cls = MinExpirationShardedLRUCache
+
+
+class TestNoExpirationShardedCache(TestShardedCache):
+
+    cache_cls = NoExpirationShardedCache
+    expiration = SECONDS_PER_WEEK
+
+    def test_clean(self):
+        cache = self.cache_cls(shards=4)
+        assert isinstance(cache._shards[0], ExpiryHeapCache)
+
+        cache.put(*_create_entry(1))
+        cache._maybe_clean()
+        assert len(cache.data) == 1
+
+
+class TestNoExpirationShardedLRUCache(TestShardedCache):
+
+    cache_cls = NoExpirationShardedLRUCache
+    expiration = SECONDS_PER_WEEK
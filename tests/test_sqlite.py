@@ -0,0 +1,198 @@
+"""Tests for the SQLite cache."""
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A, AAAA
+
+from dns_cache import Resolver
+from dns_cache.sqlite import SqliteCache
+from dns_cache.wire import LazyAnswer
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+_WRITER = """
+import sys, time
+from dns_cache.sqlite import SqliteCache
+
+class Value(object):
+    expiration = time.time() + 300
+
+cache = SqliteCache(filename=sys.argv[1])
+for i in range(100):
+    cache.put(("{}{}.example.".format(sys.argv[2], i), 1, 1), Value())
+"""
+
+
+class _Value(object):
+    def __init__(self, ttl=300):
+        self.expiration = time.time() + ttl
+
+
+def _key(name, rdtype=A):
+    return (from_text(name), rdtype, IN)
+
+
+class TestSqliteCache(unittest.TestCase):
+
+    wire = False
+
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.add("example.", 300, AAAA, "2001:db8::1")
+        self.server.start()
+        self.filename = os.path.join(tempfile.mkdtemp(), "cache.sqlite")
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_cache(self, **kwargs):
+        cache = SqliteCache(filename=self.filename, wire=self.wire, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_reload(self):
+        resolver = get_stub_resolver(Resolver, self.server, cache=self.get_cache())
+        answer = resolver.resolve("example.")
+
+        resolver = get_stub_resolver(Resolver, self.server, cache=self.get_cache())
+        cached = resolver.resolve("example.")
+        assert cached.rrset == answer.rrset
+        assert cached.expiration == answer.expiration
+        assert self.server.query_count() == 1
+        assert isinstance(cached, LazyAnswer) == self.wire
+
+    def test_case(self):
+        cache = self.get_cache()
+        cache.put(_key("Example."), _Value())
+        assert cache.get(_key("eXample.")) is not None
+        assert list(cache.data.keys()) == [_key("example.")]
+
+    def test_expired(self):
+        cache = self.get_cache()
+        cache.put(_key("a.example."), _Value(-1))
+        cache.put(_key("b.example."), _Value())
+
+        assert cache.get(_key("a.example.")) is None
+        assert len(cache.data) == 2
+
+        assert cache.purge_expired() == 1
+        assert list(cache.data.keys()) == [_key("b.example.")]
+
+    def test_cleaning_interval(self):
+        cache = self.get_cache(cleaning_interval=0)
+        cache.put(_key("a.example."), _Value(-1))
+        cache.get(_key("b.example."))
+        assert len(cache.data) == 0
+
+    def test_statistics(self):
+        cache = self.get_cache()
+        if not hasattr(cache, "statistics"):
+            raise unittest.SkipTest("dnspython 1 has no cache statistics")
+        cache.put(_key("a.example."), _Value())
+        cache.get(_key("a.example."))
+        cache.get(_key("b.example."))
+        assert cache.statistics.hits == 1
+        assert cache.statistics.misses == 1
+
+    def test_data(self):
+        cache = self.get_cache()
+        value = _Value()
+        cache.data[_key("a.example.")] = value
+        assert _key("a.example.") in cache.data
+        assert _key("b.example.") not in cache.data
+        assert cache.data[_key("a.example.")].expiration == value.expiration
+        assert cache.data.get(_key("b.example.")) is None
+        assert [key for key, value in cache.data.items()] == [_key("a.example.")]
+
+        del cache.data[_key("a.example.")]
+        with self.assertRaises(KeyError):
+            cache.data[_key("a.example.")]
+        with self.assertRaises(KeyError):
+            del cache.data[_key("a.example.")]
+
+    def test_flush(self):
+        cache = self.get_cache()
+        cache.put(_key("a.example."), _Value())
+        cache.put(_key("b.example."), _Value())
+
+        cache.flush(_key("a.example."))
+        assert len(cache.data) == 1
+        cache.flush()
+        assert len(cache.data) == 0
+
+    def test_wal(self):
+        cache = self.get_cache()
+        mode = cache._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_table(self):
+        cache = self.get_cache(table="other")
+        cache.put(_key("a.example."), _Value())
+        assert len(self.get_cache().data) == 0
+
+        with self.assertRaises(ValueError):
+            self.get_cache(table="dns; DROP TABLE dns")
+
+    def test_threads(self):
+        cache = self.get_cache()
+
+        def put(prefix):
+            for i in range(50):
+                cache.put(_key("{}{}.example.".format(prefix, i)), _Value())
+
+        threads = [threading.Thread(target=put, args=(str(i), )) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(cache.data) == 200
+
+    def test_thread_connections(self):
+        cache = self.get_cache()
+
+        threads = [
+            threading.Thread(target=cache.get, args=(_key("a.example."), ))
+            for i in range(50)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        gc.collect()
+
+        # Only the connection of this thread remains open
+        assert len(cache._connections) == 1
+
+    def test_processes(self):
+        cache = self.get_cache()
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+            + env.get("PYTHONPATH", "").split(os.pathsep)
+        )
+        processes = [
+            subprocess.Popen(
+                [sys.executable, "-c", _WRITER, self.filename, prefix], env=env
+            )
+            for prefix in ("a", "b")
+        ]
+        for process in processes:
+            assert process.wait() == 0
+
+        assert len(cache.data) == 200
+        assert _key("b99.example.") in cache.data
+
+
+class TestWireSqliteCache(TestSqliteCache):
+
+    wire = True
@@ -0,0 +1,123 @@
+"""Tests for serving stale answers."""
+import time
+import unittest
+
+from dns.exception import Timeout
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+
+from dns_cache import Resolver
+from dns_cache.expiration import (
+    FIVE_MINS,
+    SECONDS_PER_DAY,
+    StaleCache,
+    StaleLRUCache,
+)
+from dns_cache.resolver import ServeStaleResolver
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class ServeStaleCachingResolver(ServeStaleResolver, Resolver):
+    pass
+
+
+def _wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise AssertionError("Timed out waiting for condition")
+        time.sleep(0.01)
+
+
+class TestStaleCache(unittest.TestCase):
+
+    cache_cls = StaleCache
+    resolver_cls = ServeStaleResolver
+
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.start()
+        self.key = (from_text("example."), A, IN)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_test_resolver(self):
+        return get_stub_resolver(
+            self.resolver_cls, self.server, cache=self.cache_cls(), lifetime=0.5
+        )
+
+    def test_retention(self):
+        resolver = self.get_test_resolver()
+
+        q1 = resolver.resolve("example.")
+
+        # The answer keeps its expiration, and the entry is retained longer
+        now = time.time()
+        assert q1.expiration <= now + FIVE_MINS + 1
+        entry = resolver.cache.data[self.key]
+        entry = getattr(entry, "value", entry)
+        assert entry.answer is q1
+        assert entry.expiration > now + SECONDS_PER_DAY
+
+        assert resolver.cache.get(self.key) is q1
+
+        q1.expiration = now - 1
+        assert resolver.cache.get(self.key) is None
+        assert resolver.cache.get_stale(self.key) is q1
+
+    def test_stale_while_revalidate(self):
+        resolver = self.get_test_resolver()
+
+        q1 = resolver.resolve("example.")
+        assert resolver.resolve("example.") is q1
+        assert self.server.query_count() == 1
+
+        q1.expiration = time.time() - 1
+
+        assert resolver.resolve("example.") is q1
+
+        _wait_for(lambda: resolver.cache.get(self.key) is not None)
+
+        q2 = resolver.resolve("example.")
+        assert q2 is not q1
+        assert self.server.query_count() == 2
+
+    def test_serve_stale(self):
+        resolver = self.get_test_resolver()
+
+        q1 = resolver.resolve("example.")
+        q1.expiration = time.time() - FIVE_MINS - 1
+
+        self.server.drop = True
+
+        assert resolver.resolve("example.") is q1
+        assert resolver.cache.get_stale(self.key) is q1
+        assert resolver.cache.get(self.key) is None
+
+        assert resolver.resolve("example.") is q1
+
+    def test_serve_stale_expired(self):
+        resolver = self.get_test_resolver()
+
+        q1 = resolver.resolve("example.")
+        q1.expiration = time.time() - SECONDS_PER_DAY - 1
+
+        self.server.drop = True
+
+        with self.assertRaises(Timeout):
+            resolver.resolve("example.")
+
+
+class TestStaleLRUCache(TestStaleCache):
+
+    cache_cls = StaleLRUCache
+
+
+class TestServeStaleCachingResolver(TestStaleCache):
+
+    resolver_cls = ServeStaleCachingResolver
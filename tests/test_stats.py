@@ -0,0 +1,239 @@
+"""Tests for cache and resolver statistics."""
+import socket
+import threading
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A, AAAA, CNAME, NS
+from dns.resolver import NXDOMAIN, Answer
+
+from dns_cache import Resolver
+from dns_cache.resolver import ExceptionCachingResolver
+from dns_cache.stats import (
+    Stats,
+    StatsCache,
+    StatsdExporter,
+    StatsLRUCache,
+    StatsResolver,
+    prometheus_text,
+)
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class StatsCachingResolver(StatsResolver, Resolver):
+    pass
+
+
+class TestStats(unittest.TestCase):
+    def test_counters(self):
+        stats = Stats()
+        stats.increment("hits", A)
+        stats.increment("hits", A, 2)
+        stats.increment("evictions")
+
+        assert stats.counters() == {"hits": {"A": 3}, "evictions": {None: 1}}
+
+        stats.reset()
+        assert stats.counters() == {}
+
+    def test_histograms(self):
+        stats = Stats(buckets=(0.001, 0.01))
+        stats.observe("lookup_latency", AAAA, 0.0005, "hits")
+        stats.observe("lookup_latency", AAAA, 0.005)
+        stats.observe("lookup_latency", AAAA, 1)
+
+        histogram = stats.histograms()["lookup_latency"]["AAAA"]
+        assert histogram["buckets"] == [(0.001, 1), (0.01, 2), (float("inf"), 3)]
+        assert histogram["count"] == 3
+        assert histogram["sum"] == 1.0055
+        assert stats.counters() == {"hits": {"AAAA": 1}}
+
+    def test_threads(self):
+        stats = Stats()
+
+        def worker():
+            for i in range(100):
+                stats.increment("hits", A)
+                stats.observe("lookup_latency", A, 0.001)
+
+        for i in range(3):
+            threads = [threading.Thread(target=worker) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert stats.counters() == {"hits": {"A": 1200}}
+        assert stats.histograms()["lookup_latency"]["A"]["count"] == 1200
+        # The shards of finished threads are merged
+        assert len(stats._shards) <= 5
+
+        stats.reset()
+        assert stats.counters() == {}
+
+    def test_prometheus_text(self):
+        stats = Stats(buckets=(0.001, ))
+        stats.increment("evictions")
+        stats.observe("lookup_latency", A, 0.0005, "hits")
+
+        assert prometheus_text(stats).splitlines() == [
+            "# TYPE dns_cache_evictions_total counter",
+            "dns_cache_evictions_total 1",
+            "# TYPE dns_cache_hits_total counter",
+            'dns_cache_hits_total{rdtype="A"} 1',
+            "# TYPE dns_cache_lookup_latency_seconds histogram",
+            'dns_cache_lookup_latency_seconds_bucket{rdtype="A",le="0.001"} 1',
+            'dns_cache_lookup_latency_seconds_bucket{rdtype="A",le="+Inf"} 1',
+            'dns_cache_lookup_latency_seconds_sum{rdtype="A"} 0.0005',
+            'dns_cache_lookup_latency_seconds_count{rdtype="A"} 1',
+        ]
+
+    def test_statsd(self):
+        stats = Stats()
+        stats.increment("hits", A, 2)
+        stats.observe("lookup_latency", A, 0.002)
+
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(("127.0.0.1", 0))
+        server.settimeout(2)
+        exporter = StatsdExporter(port=server.getsockname()[1])
+        try:
+            exporter.send(stats)
+            packet = server.recv(65535).decode("ascii")
+            assert packet.splitlines() == [
+                "dns_cache.hits.A:2|c",
+                "dns_cache.lookup_latency.A.count:1|c",
+                "dns_cache.lookup_latency.A.sum_ms:2.0|c",
+            ]
+
+            # Only changes are sent
+            stats.increment("hits", A)
+            assert exporter.lines(stats) == ["dns_cache.hits.A:1|c"]
+        finally:
+            exporter.close()
+            server.close()
+
+
+class TestStatsCache(unittest.TestCase):
+
+    cache_cls = StatsCache
+
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.", ttl=300, minimum=60)
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.add("www.example.", 300, CNAME, "example.")
+        self.server.add("example.", 300, NS, "ns1.example.")
+        self.server.add("ns1.example.", 300, A, "192.0.2.53")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_test_resolver(self, cls=StatsResolver):
+        return get_stub_resolver(cls, self.server, cache=self.cache_cls())
+
+    def test_hits(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("example.")
+        resolver.resolve("example.")
+        resolver.resolve("example.")
+
+        counters = resolver.stats.counters()
+        assert counters["hits"] == {"A": 2}
+        assert counters["misses"]["A"] == 1
+
+        histograms = resolver.stats.histograms()
+        assert histograms["resolve_latency"]["A"]["count"] == 3
+        assert histograms["upstream_latency"]["A"]["count"] == 1
+        assert histograms["lookup_latency"]["A"]["count"] == 3
+
+    def test_shared_stats(self):
+        resolver = self.get_test_resolver()
+        assert resolver.stats is resolver.cache.stats
+
+        stats = Stats()
+        resolver = get_stub_resolver(StatsResolver, self.server, cache=None)
+        resolver._stats = stats
+        assert resolver.stats is stats
+
+    def test_negative_hits(self):
+        resolver = self.get_test_resolver(ExceptionCachingResolver)
+
+        for i in range(2):
+            with self.assertRaises(NXDOMAIN):
+                resolver.resolve("missing.example.")
+
+        assert resolver.cache.stats.counters()["negative_hits"] == {"A": 1}
+
+    def test_exception_hits(self):
+        resolver = self.get_test_resolver(ExceptionCachingResolver)
+        exception = NXDOMAIN()
+        exception.expiration = time.time() + 300
+        resolver.cache.put((from_text("broken.example."), A, IN), exception)
+
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("broken.example.")
+
+        assert resolver.cache.stats.counters()["exception_hits"] == {"A": 1}
+
+    def test_counted_once(self):
+        resolver = self.get_test_resolver(StatsCachingResolver)
+
+        resolver.resolve("example.")
+        resolver.resolve("example.")
+
+        counters = resolver.stats.counters()
+        assert counters["hits"] == {"A": 1}
+        assert counters["misses"] == {"A": 1}
+
+        # Lookups of the cache outside a resolver lookup
+        resolver.cache.get((from_text("example."), A, IN))
+        assert resolver.stats.counters()["hits"] == {"A": 2}
+
+    def test_resolver(self):
+        resolver = self.get_test_resolver(StatsCachingResolver)
+
+        resolver.resolve("example.", NS)
+        answer = resolver.resolve("ns1.example.")
+        assert isinstance(answer, Answer)
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("below.missing.example.")
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("more.below.missing.example.")
+        resolver.resolve("www.example.", CNAME)
+        resolver.resolve("www.example.")
+
+        counters = resolver.stats.counters()
+        # The glue of the NS answer, and the SOA of the CNAME answer
+        assert counters["injected"] == {"A": 1, "SOA": 1}
+        # ns1.example. from the injected glue, which is cached
+        assert counters["hits"] == {"A": 1}
+        assert "synthesized" not in counters
+        assert counters["nxdomain_index_hits"] == {"A": 1}
+
+        histograms = resolver.stats.histograms()
+        assert histograms["resolve_latency"]["A"]["count"] == 4
+        # below.missing.example. and www.example., as example. A is not cached
+        assert histograms["upstream_latency"]["A"]["count"] == 2
+        assert self.server.query_count() == 4
+
+
+class TestStatsLRUCache(TestStatsCache):
+
+    cache_cls = StatsLRUCache
+
+    def test_evictions(self):
+        resolver = get_stub_resolver(
+            StatsResolver, self.server, cache=StatsLRUCache(max_size=1)
+        )
+
+        resolver.resolve("example.")
+        resolver.resolve("ns1.example.")
+        resolver.resolve("ns1.example.")
+
+        assert resolver.stats.counters()["evictions"] == {None: 1}
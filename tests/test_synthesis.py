@@ -0,0 +1,185 @@
+"""Tests for answers synthesized from cached CNAME and DNAME chains."""
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A, AAAA, CNAME, DNAME
+from dns.resolver import Cache
+
+from dns_cache import Resolver
+from dns_cache.resolver import AggressiveCachingResolver
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class _CountingCache(Cache):
+    def __init__(self, *args, **kwargs):
+        super(_CountingCache, self).__init__(*args, **kwargs)
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return super(_CountingCache, self).get(key)
+
+
+class TestSynthesis(unittest.TestCase):
+
+    resolver_cls = AggressiveCachingResolver
+    # dnspython also looks up the ANY rdtype of a miss
+    miss_gets = 2
+
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.", ttl=300, minimum=60)
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.add("example.", 300, AAAA, "2001:db8::1")
+        self.server.add("www.example.", 600, CNAME, "example.")
+        self.server.add("cdn.example.", 100, CNAME, "www.example.")
+        self.server.add("www.example.net.", 300, A, "192.0.2.2")
+        self.server.add("old.example.", 300, DNAME, "example.net.")
+        self.server.add("a.b.c.d.example.", 300, A, "192.0.2.3")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_test_resolver(self):
+        return get_stub_resolver(
+            self.resolver_cls, self.server, cache=_CountingCache()
+        )
+
+    def test_other_rdtype(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("www.example.", A)
+        resolver.resolve("example.", AAAA)
+        assert self.server.query_count() == 2
+
+        answer = resolver.resolve("www.example.", AAAA)
+        assert self.server.query_count() == 2
+        assert answer.qname == from_text("www.example.")
+        assert answer.canonical_name == from_text("example.")
+        assert [rdata.address for rdata in answer] == ["2001:db8::1"]
+        assert answer.response.answer[0].rdtype == CNAME
+
+        # The synthesized answer is cached
+        assert resolver.cache.get((from_text("www.example."), AAAA, IN)) is answer
+
+    def test_cname_query(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("www.example.", CNAME)
+        resolver.resolve("example.", A)
+        assert self.server.query_count() == 2
+
+        answer = resolver.resolve("www.example.", A)
+        assert self.server.query_count() == 2
+        assert [rdata.address for rdata in answer] == ["192.0.2.1"]
+
+    def test_chain(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("cdn.example.", A)
+        resolver.resolve("example.", AAAA)
+        assert self.server.query_count() == 2
+
+        answer = resolver.resolve("cdn.example.", AAAA)
+        assert self.server.query_count() == 2
+        assert answer.canonical_name == from_text("example.")
+        assert [rrset.name for rrset in answer.response.answer] == [
+            from_text("cdn.example."),
+            from_text("www.example."),
+            from_text("example."),
+        ]
+
+    def test_dname(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("old.example.", DNAME)
+        resolver.resolve("www.example.net.", A)
+        assert self.server.query_count() == 2
+
+        answer = resolver.resolve("www.old.example.", A)
+        assert self.server.query_count() == 2
+        assert answer.canonical_name == from_text("www.example.net.")
+        assert [rdata.address for rdata in answer] == ["192.0.2.2"]
+        assert [rrset.rdtype for rrset in answer.response.answer] == [
+            DNAME, CNAME, A,
+        ]
+
+    def test_unindexed(self):
+        resolver = self.get_test_resolver()
+        resolver.resolve("www.example.", A)
+        resolver.resolve("old.example.", DNAME)
+
+        # Only the links indexed by the resolver are looked up
+        resolver.cache.gets = 0
+        resolver.resolve("a.b.c.d.example.", A)
+        assert resolver.cache.gets == self.miss_gets
+
+    def test_hit(self):
+        resolver = self.get_test_resolver()
+        resolver.resolve("www.example.", A)
+
+        # The lookup of the resolver finds the answer, despite the CNAME
+        resolver.cache.gets = 0
+        resolver.resolve("www.example.", A)
+        assert resolver.cache.gets == 2
+
+    def test_chain_index_size(self):
+        resolver = self.get_test_resolver()
+        resolver.chain_index_size = 1
+
+        resolver.resolve("cdn.example.", A)
+        assert list(resolver._chain_index[CNAME]) == [(from_text("www.example."), IN)]
+
+    def test_expiration(self):
+        resolver = self.get_test_resolver()
+
+        start = time.time()
+        resolver.resolve("cdn.example.", A)
+        resolver.resolve("example.", AAAA)
+
+        answer = resolver.resolve("cdn.example.", AAAA)
+        assert self.server.query_count() == 2
+        # The expiration of the cdn.example. CNAME
+        assert start + 100 <= answer.expiration <= time.time() + 100
+
+    def test_missing_target(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("www.example.", A)
+        answer = resolver.resolve("www.example.", AAAA)
+        assert self.server.query_count() == 2
+        assert [rdata.address for rdata in answer] == ["2001:db8::1"]
+
+    def test_expired_link(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("www.example.", A)
+        resolver.resolve("example.", AAAA)
+
+        cname = resolver.cache.data[(from_text("www.example."), CNAME, IN)]
+        cname.expiration = time.time() - 1
+
+        resolver.resolve("www.example.", AAAA)
+        assert self.server.query_count() == 3
+
+    def test_cname_not_synthesized(self):
+        resolver = self.get_test_resolver()
+
+        resolver.resolve("cdn.example.", A)
+        assert self.server.query_count() == 1
+
+        # The CNAME for the qname is answered from the cache
+        resolver.resolve("cdn.example.", CNAME)
+        assert self.server.query_count() == 1
+        assert self.server.query_count(rdtype=CNAME) == 0
+
+
+class TestResolver(TestSynthesis):
+
+    resolver_cls = Resolver
+    # Also the lookup of CoalescingResolver
+    miss_gets = 3
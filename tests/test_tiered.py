@@ -0,0 +1,206 @@
+"""Tests for the cache in memory in front of a persistent cache."""
+import gc
+import os
+import tempfile
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+from dns.resolver import Cache, LRUCache
+
+from dns_cache import Resolver
+from dns_cache.pickle import JournaledPickableCache
+from dns_cache.tiered import TieredCache, _close_writing_behind
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class _Value(object):
+    def __init__(self, ttl=300):
+        self.expiration = time.time() + ttl
+
+
+class _CountingCache(Cache):
+    def __init__(self, *args, **kwargs):
+        super(_CountingCache, self).__init__(*args, **kwargs)
+        self.gets = 0
+        self.puts = 0
+
+    def get(self, key):
+        self.gets += 1
+        return super(_CountingCache, self).get(key)
+
+    def put(self, key, value):
+        self.puts += 1
+        super(_CountingCache, self).put(key, value)
+
+
+def _key(i):
+    return (from_text("host{}.example.".format(i)), A, IN)
+
+
+class TestTieredCache(unittest.TestCase):
+    def test_l1_hit(self):
+        l2 = _CountingCache()
+        cache = TieredCache(l2)
+        value = _Value()
+        cache.put(_key(0), value)
+        assert l2.puts == 1
+
+        assert cache.get(_key(0)) is value
+        assert l2.gets == 0
+
+    def test_promote(self):
+        l2 = _CountingCache()
+        cache = TieredCache(l2, l1=LRUCache(max_size=1))
+        first = _Value()
+        cache.put(_key(0), first)
+        cache.put(_key(1), _Value())
+        assert cache.l1.get(_key(0)) is None
+
+        assert cache.get(_key(0)) is first
+        assert l2.gets == 1
+        # Promoted with the expiration it was stored with
+        assert cache.l1.get(_key(0)).expiration == first.expiration
+        assert cache.get(_key(0)) is first
+        assert l2.gets == 1
+
+    def test_expired(self):
+        l2 = _CountingCache()
+        cache = TieredCache(l2, l1=LRUCache(max_size=1))
+        cache.put(_key(0), _Value(-1))
+        cache.put(_key(1), _Value())
+
+        assert cache.get(_key(0)) is None
+        assert cache.l1.get(_key(0)) is None
+
+    def test_flush(self):
+        cache = TieredCache(_CountingCache())
+        cache.put(_key(0), _Value())
+        cache.put(_key(1), _Value())
+
+        cache.flush(_key(0))
+        assert cache.get(_key(0)) is None
+        assert cache.l2.get(_key(0)) is None
+        assert cache.get(_key(1)) is not None
+
+        cache.flush()
+        assert cache.get(_key(1)) is None
+        assert cache.l2.get(_key(1)) is None
+
+    def test_min_ttl(self):
+        cache = TieredCache(Cache())
+        assert cache.min_ttl is None
+        cache.l2.min_ttl = 300
+        assert cache.min_ttl == 300
+
+
+class TestWriteBehind(unittest.TestCase):
+    def get_cache(self, **kwargs):
+        kwargs.setdefault("interval", 60)
+        return TieredCache(
+            _CountingCache(), l1=LRUCache(max_size=1), write_behind=True, **kwargs
+        )
+
+    def test_pending(self):
+        cache = self.get_cache()
+        first = _Value()
+        cache.put(_key(0), first)
+        cache.put(_key(1), _Value())
+        assert cache.l2.puts == 0
+
+        # Evicted from L1, and not yet written to L2
+        assert cache.get(_key(0)) is first
+        assert cache.l2.gets == 0
+
+        cache.flush_pending()
+        assert cache.l2.puts == 2
+        assert cache.l2.get(_key(0)) is first
+        cache.close()
+
+    def test_batch_size(self):
+        cache = self.get_cache(batch_size=2)
+        cache.put(_key(0), _Value())
+        cache.put(_key(1), _Value())
+
+        for i in range(100):
+            if cache.l2.puts == 2:
+                break
+            time.sleep(0.01)
+        assert cache.l2.puts == 2
+        cache.close()
+
+    def test_interval(self):
+        cache = self.get_cache(interval=0.05)
+        cache.put(_key(0), _Value())
+        time.sleep(0.2)
+        assert cache.l2.puts == 1
+        cache.close()
+
+    def test_flush(self):
+        cache = self.get_cache()
+        cache.put(_key(0), _Value())
+        cache.flush(_key(0))
+        cache.flush_pending()
+        assert cache.l2.puts == 0
+
+    def test_close(self):
+        cache = self.get_cache()
+        cache.put(_key(0), _Value())
+        cache.close()
+        assert cache.l2.puts == 1
+        assert cache._writer is None
+
+        # Written through once closed
+        cache.put(_key(1), _Value())
+        assert cache.l2.puts == 2
+
+    def test_collected(self):
+        cache = self.get_cache()
+        cache.put(_key(0), _Value())
+        l2 = cache.l2
+        writer = cache._writer
+
+        del cache
+        gc.collect()
+        writer.join(1)
+        assert not writer.is_alive()
+        assert l2.puts == 1
+
+    def test_exit(self):
+        cache = self.get_cache()
+        cache.put(_key(0), _Value())
+
+        _close_writing_behind()
+        assert cache.l2.puts == 1
+        assert cache._closed
+
+
+class TestTieredResolver(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        self.server.add("example.", 300, A, "192.0.2.1")
+        self.server.start()
+        self.filename = os.path.join(tempfile.mkdtemp(), "cache.pickle")
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_persisted(self):
+        l2 = JournaledPickableCache(filename=self.filename)
+        cache = TieredCache(l2, write_behind=True)
+        resolver = get_stub_resolver(Resolver, self.server, cache=cache)
+        answer = resolver.resolve("example.")
+        cache.close()
+        l2.close()
+
+        l2 = JournaledPickableCache(filename=self.filename)
+        cache = TieredCache(l2)
+        resolver = get_stub_resolver(Resolver, self.server, cache=cache)
+        assert resolver.resolve("example.").expiration == answer.expiration
+        assert self.server.query_count() == 1
+        assert cache.l1.get((from_text("example."), A, IN)) is not None
+        l2.close()
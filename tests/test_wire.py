@@ -0,0 +1,244 @@
+"""Tests for the wire format serialization of cache entries."""
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+
+from dns.exception import Timeout
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A, AAAA, CNAME
+from dns.resolver import NXDOMAIN, Cache, LRUCacheNode
+
+from dns_cache import Resolver
+from dns_cache.diskcache import DiskCache
+from dns_cache.expiration import StaleEntry
+from dns_cache.mmap import MmapCache
+from dns_cache.pickle import JournaledPickableCache, PickableCache, PickableLRUCache
+from dns_cache.resolver import NXAnswer
+from dns_cache.sqlitedict import SqliteDictCache
+from dns_cache.wire import LazyAnswer, dumps, loads
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class _TestStubServerBase(object):
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        self.server.add("example.", 300, A, "192.0.2.1", "192.0.2.2")
+        self.server.add("www.example.", 300, CNAME, "example.")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+
+class TestSerialization(_TestStubServerBase, unittest.TestCase):
+    def get_test_resolver(self):
+        return get_stub_resolver(Resolver, self.server, cache=Cache())
+
+    def test_answer(self):
+        resolver = self.get_test_resolver()
+        answer = resolver.resolve("www.example.")
+
+        data = dumps(answer)
+        assert data[:1] == b"W"
+
+        loaded = loads(data)
+        assert isinstance(loaded, LazyAnswer)
+        assert "response" not in loaded.__dict__
+        assert loaded.qname == answer.qname
+        assert loaded.rdtype == answer.rdtype
+        assert loaded.rdclass == answer.rdclass
+        assert loaded.canonical_name == answer.canonical_name
+        assert loaded.rrset == answer.rrset
+        assert loaded.response == answer.response
+        assert loaded.expiration == answer.expiration
+
+        loaded = loads(dumps(StaleEntry(answer, answer.expiration + 10)))
+        assert isinstance(loaded, StaleEntry)
+        assert loaded.expiration == answer.expiration + 10
+        assert loaded.answer.expiration == answer.expiration
+
+    def test_lazy_answer(self):
+        resolver = self.get_test_resolver()
+        answer = resolver.resolve("www.example.")
+        data = dumps(answer)
+
+        loaded = loads(data)
+        assert sorted(loaded.addresses()) == ["192.0.2.1", "192.0.2.2"]
+        assert loaded.canonical_name == answer.canonical_name
+        assert dumps(loaded) == data
+        assert "response" not in loaded.__dict__
+
+        assert len(loaded) == 2
+        assert "response" in loaded.__dict__
+        assert loaded.expiration == answer.expiration
+        assert loaded.name == answer.name
+
+    def test_lazy_answer_no_data(self):
+        resolver = self.get_test_resolver()
+        answer = resolver.resolve("example.", AAAA, raise_on_no_answer=False)
+        assert answer.rrset is None
+
+        loaded = loads(dumps(answer))
+        assert loaded.addresses() == []
+        assert loaded.rrset is None
+        assert list(loaded) == []
+
+    def test_lazy_answer_other_rdtype(self):
+        resolver = self.get_test_resolver()
+        answer = resolver.resolve("www.example.", CNAME)
+
+        loaded = loads(dumps(answer))
+        assert loaded.canonical_name == answer.canonical_name
+        assert loaded.rrset == answer.rrset
+
+    def test_nxanswer(self):
+        resolver = self.get_test_resolver()
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("missing.example.")
+
+        answer = resolver.cache.data[(from_text("missing.example."), A, IN)]
+        assert isinstance(answer, NXAnswer)
+
+        loaded = loads(dumps(answer))
+        assert isinstance(loaded, NXAnswer)
+        assert loaded.expiration == answer.expiration
+        assert loaded.response == answer.response
+
+    def test_other(self):
+        e = Timeout(timeout=1)
+        e.expiration = 10.0
+
+        data = dumps(e)
+        assert data[:1] == b"P"
+
+        loaded = loads(bytearray(data))
+        assert isinstance(loaded, Timeout)
+        assert loaded.expiration == 10.0
+
+
+class _TestWireCacheBase(_TestStubServerBase):
+
+    cache_cls = None
+
+    def setUp(self):
+        super(_TestWireCacheBase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(_TestWireCacheBase, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def get_cache(self):
+        raise NotImplementedError
+
+    def close_cache(self, cache):
+        pass
+
+    def test_reload(self):
+        cache = self.get_cache()
+        resolver = get_stub_resolver(Resolver, self.server, cache=cache)
+
+        answer = resolver.resolve("www.example.")
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("missing.example.")
+
+        self.close_cache(cache)
+        del resolver, cache
+        gc.collect()
+
+        cache = self.get_cache()
+        resolver = get_stub_resolver(Resolver, self.server, cache=cache)
+
+        loaded = resolver.resolve("www.example.")
+        assert loaded.rrset == answer.rrset
+        assert loaded.expiration == answer.expiration
+        with self.assertRaises(NXDOMAIN):
+            resolver.resolve("missing.example.")
+
+        assert self.server.query_count() == 2
+        self.close_cache(cache)
+
+
+class TestPickableCache(_TestWireCacheBase, unittest.TestCase):
+    def get_cache(self):
+        return PickableCache(
+            filename=os.path.join(self.directory, "dns.pickle"), wire=True
+        )
+
+    def test_stored_as_wire(self):
+        cache = self.get_cache()
+        get_stub_resolver(Resolver, self.server, cache=cache).resolve("example.")
+
+        state = cache.__getstate__()
+        assert all(isinstance(value, bytes) for value in state["data"].values())
+        assert not any(
+            isinstance(value, bytes) for value in cache.data.values()
+        )
+
+    def test_saved_twice(self):
+        cache = self.get_cache()
+        get_stub_resolver(Resolver, self.server, cache=cache).resolve("example.")
+
+        # Such as by atexit, and then garbage collection
+        cache.__del__()
+        cache.__del__()
+
+        assert len(self.get_cache().data) == 1
+
+
+class TestPickableLRUCache(TestPickableCache):
+    def get_cache(self):
+        return PickableLRUCache(
+            filename=os.path.join(self.directory, "dns-lru.pickle"), wire=True
+        )
+
+    def test_stored_as_wire(self):
+        cache = self.get_cache()
+        get_stub_resolver(Resolver, self.server, cache=cache).resolve("example.")
+
+        state = cache.__getstate__()
+        assert all(isinstance(value, bytes) for value in state["data"].values())
+        assert all(isinstance(node, LRUCacheNode) for node in cache.data.values())
+
+
+class TestJournaledPickableCache(_TestWireCacheBase, unittest.TestCase):
+    def get_cache(self):
+        return JournaledPickableCache(
+            filename=os.path.join(self.directory, "dns.pickle"), wire=True
+        )
+
+    def close_cache(self, cache):
+        cache.close()
+
+
+class TestSqliteDictCache(_TestWireCacheBase, unittest.TestCase):
+    def get_cache(self):
+        return SqliteDictCache(
+            filename=os.path.join(self.directory, "dns.sqlite"), wire=True
+        )
+
+    def close_cache(self, cache):
+        cache.data.close()
+
+
+class TestDiskCache(_TestWireCacheBase, unittest.TestCase):
+    def get_cache(self):
+        return DiskCache(directory=os.path.join(self.directory, "dc"), wire=True)
+
+    def close_cache(self, cache):
+        cache.data.close()
+
+
+class TestMmapCache(_TestWireCacheBase, unittest.TestCase):
+    def get_cache(self):
+        return MmapCache(
+            filename=os.path.join(self.directory, "dns.mmap"), slots=64, wire=True
+        )
+
+    def close_cache(self, cache):
+        cache.data.close()
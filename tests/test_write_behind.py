@@ -0,0 +1,156 @@
+"""Tests for buffering the writes to persistent key stores."""
+import os
+import tempfile
+import time
+import unittest
+
+from dns.name import from_text
+from dns.rdataclass import IN
+from dns.rdatatype import A
+
+from dns_cache import Resolver
+from dns_cache.sqlitedict import SqliteDictCache, SqliteDictLRUCache
+from dns_cache.write_behind import WriteBehindDict
+
+from tests.stub_server import StubServer, get_stub_resolver
+
+
+class _Store(dict):
+    def __init__(self):
+        super(_Store, self).__init__()
+        self.writes = 0
+        self.on_write = None
+
+    def __setitem__(self, key, value):
+        self.writes += 1
+        if self.on_write:
+            self.on_write()
+        super(_Store, self).__setitem__(key, value)
+
+
+class TestWriteBehindDict(unittest.TestCase):
+    def setUp(self):
+        self.store = _Store()
+        self.commits = []
+        self.data = WriteBehindDict(
+            self.store, commit=self.commits.append, batch_size=3, interval=60
+        )
+
+    def test_pending(self):
+        self.data["a"] = 1
+        self.data["b"] = 2
+        assert self.store.writes == 0
+        assert self.data.pending == 2
+
+        assert self.data["a"] == 1
+        assert self.data.get("b") == 2
+        assert "a" in self.data
+        assert self.data.get("c") is None
+
+    def test_writing(self):
+        self.data["a"] = 1
+        self.data["b"] = 2
+        seen = []
+        self.store.on_write = lambda: seen.append(
+            (self.data.get("a"), self.data.get("b"))
+        )
+
+        self.data.flush_pending()
+        assert seen == [(1, 2), (1, 2)]
+        assert self.data.get("b") == 2
+
+    def test_batch_size(self):
+        for key in "abc":
+            self.data[key] = 1
+        assert self.store.writes == 3
+        assert len(self.commits) == 1
+        assert self.data.pending == 0
+
+    def test_interval(self):
+        self.data._interval = 0.05
+        self.data["a"] = 1
+        time.sleep(0.1)
+        assert self.store.writes == 0
+
+        self.data["b"] = 1
+        assert self.store.writes == 2
+        assert len(self.commits) == 1
+
+    def test_delete(self):
+        self.data["a"] = 1
+        self.data.flush_pending()
+
+        del self.data["a"]
+        assert "a" not in self.data
+        assert self.data.get("a") is None
+        with self.assertRaises(KeyError):
+            self.data["a"]
+        assert "a" in self.store
+
+        with self.assertRaises(KeyError):
+            del self.data["b"]
+
+        self.data.flush_pending()
+        assert "a" not in self.store
+
+    def test_iterate(self):
+        self.data["a"] = 1
+        assert list(self.data.items()) == [("a", 1)]
+        assert self.store.writes == 1
+        assert len(self.data) == 1
+
+    def test_close(self):
+        self.data["a"] = 1
+        self.data.close()
+        assert self.store.writes == 1
+        assert len(self.commits) == 1
+
+
+class TestSqliteDictWriteBehind(unittest.TestCase):
+
+    cache_cls = SqliteDictCache
+
+    def setUp(self):
+        self.server = StubServer()
+        self.server.add_zone("example.")
+        for i in range(3):
+            self.server.add("host{}.example.".format(i), 300, A, "192.0.2.1")
+        self.server.start()
+        self.filename = os.path.join(tempfile.mkdtemp(), "cache.sqlite")
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_reload(self):
+        cache = self.cache_cls(
+            filename=self.filename, write_behind=True, write_behind_batch_size=100
+        )
+        resolver = get_stub_resolver(Resolver, self.server, cache=cache)
+        for i in range(3):
+            resolver.resolve("host{}.example.".format(i))
+        assert cache.data.pending > 0
+
+        # Hits are answered from the pending puts
+        resolver.resolve("host0.example.")
+        assert self.server.query_count() == 3
+
+        cache.close()
+
+        cache = self.cache_cls(filename=self.filename)
+        key = (from_text("host2.example."), A, IN)
+        assert key in cache.data
+        cache.close()
+
+    def test_batch_size(self):
+        cache = self.cache_cls(
+            filename=self.filename, write_behind=True, write_behind_batch_size=1
+        )
+        resolver = get_stub_resolver(Resolver, self.server, cache=cache)
+        resolver.resolve("host0.example.")
+        assert cache.data.pending == 0
+        cache.close()
+
+
+class TestSqliteDictLRUWriteBehind(TestSqliteDictWriteBehind):
+
+    cache_cls = SqliteDictLRUCache